@@ -1,12 +1,33 @@
 import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
+import numpy as np
 import gspread
+import requests
+from gspread.utils import absolute_range_name, fill_gaps, numericise, numericise_all, rowcol_to_a1
 from google.oauth2.service_account import Credentials
 import json
 import plotly.express as px
 import plotly.graph_objects as go
+import pyarrow as pa
 from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+import functools
+import hashlib
+import heapq
+import bisect
+import itertools
+import zipfile
+from array import array
+import threading
+import random
+import re
 import time
+import uuid
+import os
 
 # إعداد الصفحة
 st.set_page_config(
@@ -55,13 +76,724 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# أسماء أوراق العمل في جدول البيانات
+SHEET_NAMES = ["العملاء", "الكول سنتر", "الشكاوى", "البيك أب"]
+
+# إعدادات الذاكرة المؤقتة لبيانات الأوراق
+SHEET_CACHE_TTL = 300  # ثانية
+SHEET_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# عمود المعرّف في كل ورقة (يُستخدم للتحقق من آخر صف معروف في المزامنة التزايدية)
+ID_COLUMNS = {
+    "العملاء": "رقم العميل",
+    "الكول سنتر": "رقم المكالمة",
+    "الشكاوى": "رقم الشكوى",
+    "البيك أب": "رقم البيك أب",
+}
+
+# مخطط كل ورقة: نوع كل عمود يُطبق مرة واحدة عند الإدخال
+# text: نص كما هو (تبقى الأصفار البادئة في الهواتف)، category: قيم متكررة،
+# int16: أعداد صغيرة، date: تاريخ بصيغة DATE_FORMAT
+SHEET_SCHEMAS = {
+    "العملاء": {
+        'رقم العميل': 'text', 'اسم العميل': 'text', 'رقم الهاتف': 'text',
+        'البريد الإلكتروني': 'text', 'المدينة': 'category', 'تاريخ التسجيل': 'date',
+    },
+    "الكول سنتر": {
+        'رقم المكالمة': 'text', 'رقم العميل': 'text', 'نوع المكالمة': 'category',
+        'الموظف المسؤول': 'category', 'تاريخ المكالمة': 'date', 'وقت المكالمة': 'text',
+        'مدة المكالمة (دقيقة)': 'int16', 'الحالة': 'category',
+    },
+    "الشكاوى": {
+        'رقم الشكوى': 'text', 'رقم العميل': 'text', 'نوع الشكوى': 'category', 'الوصف': 'text',
+        'الأولوية': 'category', 'تاريخ الشكوى': 'date', 'الحالة': 'category',
+        'الموظف المسؤول': 'category',
+    },
+    "البيك أب": {
+        'رقم البيك أب': 'text', 'رقم العميل': 'text', 'العنوان': 'text', 'تاريخ البيك أب': 'date',
+        'الوقت المطلوب': 'category', 'نوع الخدمة': 'category', 'السائق': 'category',
+        'الحالة': 'category',
+    },
+}
+DATE_FORMAT = '%Y-%m-%d'
+
+# إعادة مزامنة كاملة دورية لالتقاط التعديلات التي تزامنت مع إضافة صفوف جديدة
+FULL_RESYNC_INTERVAL = 1800  # ثانية
+
+# عدد الصفوف في كل طلب كتابة مجمّع
+WRITE_CHUNK_SIZE = 500
+
+# تجديد رمز الوصول قبل انتهاء صلاحيته بهذه المدة (ثانية)
+TOKEN_REFRESH_MARGIN = 300
+
+# مجلد البيانات المحلية (سجل الكتابة المؤجلة وغيره)
+LOCAL_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_data")
+WRITE_JOURNAL_PATH = os.path.join(LOCAL_DATA_DIR, "write_journal.jsonl")
+# السجلات التي رفضها Sheets نهائياً (لا تُعاد محاولتها)
+WRITE_DEAD_LETTER_PATH = os.path.join(LOCAL_DATA_DIR, "write_dead_letter.jsonl")
+SNAPSHOT_DIR = os.path.join(LOCAL_DATA_DIR, "snapshots")
+EXPORT_DIR = os.path.join(LOCAL_DATA_DIR, "exports")
+HISTORY_DIR = os.path.join(LOCAL_DATA_DIR, "history")
+HISTORY_FORMAT = 2  # تغييره يعيد حساب كل الملخصات المحفوظة بصيغة أقدم
+# عدد ملفات الاعتماد المسموح لها بفتح النسخة المحلية لكل جدول في وضع عدم الاتصال
+SNAPSHOT_MAX_CREDENTIALS = 8
+
+# مستوى البيانات المشترك بين عمليات الخادم: مجلد (يُفضل على /dev/shm) ينشر فيه عامل
+# التحميل data_plane.py الأوراق وتقرؤها العمليات دون نسخ؛ يُفعّل بمتغير البيئة DATA_PLANE_DIR
+DATA_PLANE_DIR = os.environ.get("DATA_PLANE_DIR")
+DATA_PLANE_INTERVAL = 60  # ثانية بين مزامنات عامل التحميل
+
+# الأوراق المقسمة حسب الشهر في المخزن المحلي مع أعمدة ملخصاتها
+PARTITIONED_SHEETS = {
+    "الكول سنتر": {
+        'date': 'تاريخ المكالمة',
+        'group': ['الموظف المسؤول', 'الحالة'],
+        'duration': 'مدة المكالمة (دقيقة)',
+    },
+    "الشكاوى": {
+        'date': 'تاريخ الشكوى',
+        'group': ['الموظف المسؤول', 'الحالة'],
+        'duration': None,
+    },
+}
+
+# إعدادات التصدير: الكتابة على دفعات حتى تبقى الذاكرة محدودة مهما كان عدد الصفوف
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_KEEP_FILES = 8
+EXPORT_TEMP_MAX_AGE = 3600  # ثانية قبل حذف ملف مؤقت متروك
+EXCEL_MAX_ROWS = 1_048_576
+EXPORT_SHEETS = {
+    "العملاء": "العملاء",
+    "المكالمات": "الكول سنتر",
+    "الشكاوى": "الشكاوى",
+    "البيك أب": "البيك أب",
+}
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "JSON": ("jsonl", "application/x-ndjson"),
+}
+
+# الأعمدة التي تُحسب لها أعداد القيم مسبقاً
+AGGREGATE_COLUMNS = [
+    'الحالة', 'الأولوية', 'المدينة', 'الموظف المسؤول', 'السائق',
+    'نوع المكالمة', 'نوع الشكوى', 'نوع الخدمة',
+]
+ACTIVE_STATUSES = ['نشط', 'مكتمل', 'تم الحل']
+
+# أعمدة الفلترة في كل تبويب
+FILTER_COLUMNS = {
+    "العملاء": ['المدينة'],
+    "الكول سنتر": ['نوع المكالمة', 'الحالة', 'الموظف المسؤول'],
+    "الشكاوى": ['نوع الشكوى', 'الأولوية', 'الحالة'],
+    "البيك أب": ['نوع الخدمة', 'السائق', 'الحالة'],
+}
+ALL_OPTION = "الكل"
+
+# عرض الجداول على صفحات: الخادم يرتب ويقتطع والمتصفح يستلم صفحة واحدة فقط
+TABLE_PAGE_SIZES = [50, 100, 250, 500]
+NO_SORT_OPTION = "بدون ترتيب"
+
+# الأعمدة المفهرسة للبحث في العملاء
+SEARCH_COLUMNS = ['اسم العميل', 'رقم الهاتف', 'رقم العميل']
+SEARCH_ID_COLUMN = 'رقم العميل'
+SEARCH_INDEX_CHUNK = 100_000
+# عمود الربط بين الأوراق الأربع
+JOIN_COLUMN = 'رقم العميل'
+OPEN_COMPLAINT_STATUSES = ['جديد', 'قيد المعالجة']
+# تُحوّل الأعمدة إلى Categorical إذا كانت نسبة القيم المختلفة أقل من هذا الحد
+CATEGORICAL_MAX_RATIO = 0.5
+
+# تحليل عبء العمل: النوافذ المتحركة (ثانية؛ None = كل الفترة) ودقة العدادات المجمّعة
+WORKLOAD_WINDOWS = {"آخر ساعة": 3600, "آخر يوم": 86400, "آخر أسبوع": 7 * 86400, "كل الفترة": None}
+WORKLOAD_BUCKETS = [(300, 86400), (3600, 8 * 86400)]  # (طول الفترة، المدة المحفوظة)
+WORKLOAD_SHEETS = {
+    "الكول سنتر": {
+        'keys': ['الموظف المسؤول'],
+        'date': 'تاريخ المكالمة',
+        'time': 'وقت المكالمة',
+        'duration': 'مدة المكالمة (دقيقة)',
+    },
+    "البيك أب": {
+        'keys': ['السائق', 'الوقت المطلوب'],
+        'date': 'تاريخ البيك أب',
+        'time': 'الوقت المطلوب',
+        'duration': None,
+    },
+}
+
+# جدولة البيك أب: الفترات المتاحة، وأقصى عدد مهام للسائق في الفترة، والحالات التي لا تشغل السائق
+PICKUP_SLOTS = ["09:00-11:00", "10:00-12:00", "14:00-16:00", "16:00-18:00"]
+PICKUP_DRIVER_CAPACITY = 3
+PICKUP_INACTIVE_STATUSES = ['ملغى']
+SCHEDULE_COLUMNS = ['تاريخ البيك أب', 'الوقت المطلوب', 'السائق', 'الحالة']
+PICKUP_PENDING_TTL = 900  # ثانية يبقى فيها حجز النموذج محتسباً إذا لم يصل صفه (فشل الحفظ أو رقم مكرر)
+
+# محرك التقارير: الأقسام وأعمدة التاريخ والحالات المعتبرة منجزة لكل ورقة
+REPORT_SHEETS = {
+    "الكول سنتر": {'label': 'المكالمات', 'date': 'تاريخ المكالمة', 'done': ['مكتمل']},
+    "الشكاوى": {'label': 'الشكاوى', 'date': 'تاريخ الشكوى', 'done': ['تم الحل']},
+    "البيك أب": {'label': 'البيك أب', 'date': 'تاريخ البيك أب', 'done': ['مكتمل']},
+}
+WEEKDAY_NAMES = ['الاثنين', 'الثلاثاء', 'الأربعاء', 'الخميس', 'الجمعة', 'السبت', 'الأحد']
+REPORT_WORKERS = 2
+REPORT_CACHE_SIZE = 32
+REPORT_WAIT = 0.5  # ثانية ينتظرها العرض قبل إظهار مؤشر التحميل
+
+# الرسوم البيانية: عدد الأشكال المحفوظة والحد الأقصى لنقاط السلاسل الزمنية
+CHART_CACHE_SIZE = 128
+CHART_MAX_POINTS = 120
+CHART_RESAMPLE_RULES = [('D', "اليومية"), ('W-MON', "الأسبوعية"), ('MS', "الشهرية")]
+
+# أقسام الواجهة: القسم المختار فقط يُنفَّذ في كل إعادة تشغيل، ويُحمّل أوراقه فقط
+SECTIONS = ["👥 العملاء", "📞 الكول سنتر", "❗ الشكاوى", "🚚 البيك أب", "📈 التقارير"]
+SECTION_SHEETS = dict(zip(SECTIONS, [["العملاء"], ["الكول سنتر"], ["الشكاوى"], ["البيك أب"], SHEET_NAMES]))
+
+# فترة فحص المستطلع المشترك للتحديث التلقائي (ثانية)
+POLLER_TICK = 5
+
+# إعدادات الكتابة المؤجلة
+WRITE_FLUSH_DELAY = 1.0  # ثانية لتجميع السجلات قبل الإرسال
+WRITE_RETRY_BASE = 2.0
+WRITE_RETRY_MAX = 300.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+PERMANENT_STATUS_CODES = {400, 404}
+WRITE_DEAD_LETTER_SHOWN = 20  # عدد السجلات المرفوضة المعروضة في الشريط الجانبي
+
+# مجدول طلبات Sheets: حصة الطلبات في الدقيقة لحساب الخدمة وأولويات الطلبات
+SHEETS_QUOTA_PER_MINUTE = 60
+SCHEDULER_MAX_RETRIES = 3
+SCHEDULER_RETRY_BASE = 1.0
+SCHEDULER_RETRY_MAX = 32.0
+PRIORITY_INTERACTIVE = 0  # قراءات الجلسة التي ينتظرها المستخدم
+PRIORITY_BACKGROUND = 1   # التحميل المسبق والتحديث التلقائي والمطابقة
+PRIORITY_BULK = 2         # الكتابة المؤجلة المجمّعة
+
+# قياس الأداء: عدد الجولات (reruns) المحفوظة، وسجل JSON لكل جولة إذا حُدد مساره
+PERF_HISTORY = 50
+PERF_LOG_PATH = os.environ.get("PERF_LOG_PATH")
+PERF_METRIC_PREFIX = "callcenter"
+
+# سياق قياس الخيط الحالي (الجولة الجارية وإخفاق الذاكرة المؤقتة)
+_perf_context = threading.local()
+
+# مقاييس الأداء المشتركة
+class PerfMetrics:
+    """مؤقتات وعدادات على مستوى العملية مع ملخص لكل جولة تنفيذ (rerun)
+    
+    المؤقتات تُجمع كعدد ومجموع وأقصى زمن، والعدادات كقيم تراكمية. ما يُسجل من خيط
+    جولة جارية يُضاف أيضاً إلى ملخص تلك الجولة؛ الخيوط الخلفية تُحسب في الإجمالي فقط.
+    """
+    def __init__(self, history=PERF_HISTORY, log_path=PERF_LOG_PATH):
+        self.timers = {}
+        self.counters = {}
+        self.runs = deque(maxlen=history)
+        self.log_path = log_path
+        self._lock = threading.Lock()
+    
+    def observe(self, name, seconds, label=""):
+        """تسجيل زمن تنفيذ كتلة"""
+        with self._lock:
+            stats = self.timers.setdefault((name, label), [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        run = getattr(_perf_context, 'run', None)
+        if run is not None:
+            key = metric_key(name, label)
+            run['timers'][key] = run['timers'].get(key, 0.0) + seconds
+    
+    def increment(self, name, label="", value=1):
+        """زيادة عداد"""
+        with self._lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + value
+        run = getattr(_perf_context, 'run', None)
+        if run is not None:
+            key = metric_key(name, label)
+            run['counters'][key] = run['counters'].get(key, 0) + value
+    
+    def start_run(self, session_id=None):
+        """بدء ملخص جولة جديدة في الخيط الحالي"""
+        _perf_context.run = {
+            'session_id': session_id,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'timers': {},
+            'counters': {},
+        }
+        _perf_context.run_start = time.perf_counter()
+    
+    def finish_run(self):
+        """إنهاء الجولة الجارية وحفظ ملخصها (وكتابته في سجل JSON إن وُجد)"""
+        run = getattr(_perf_context, 'run', None)
+        if run is None:
+            return None
+        _perf_context.run = None
+        run['duration'] = time.perf_counter() - _perf_context.run_start
+        self.observe('rerun', run['duration'])
+        with self._lock:
+            self.runs.append(run)
+            if self.log_path:
+                try:
+                    with open(self.log_path, 'a', encoding='utf-8') as fh:
+                        fh.write(json.dumps(run, ensure_ascii=False) + "\n")
+                except OSError:
+                    pass
+        return run
+    
+    def to_dict(self):
+        """كل المقاييس كقاموس قابل للتحويل إلى JSON"""
+        with self._lock:
+            return {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'timers': {metric_key(*key): {'count': count, 'total': total, 'max': longest}
+                           for key, (count, total, longest) in self.timers.items()},
+                'counters': {metric_key(*key): value for key, value in self.counters.items()},
+                'runs': list(self.runs),
+            }
+    
+    def prometheus(self):
+        """كل المقاييس بصيغة نص Prometheus"""
+        prefix = PERF_METRIC_PREFIX
+        with self._lock:
+            timers = sorted(self.timers.items())
+            counters = sorted(self.counters.items())
+        lines = [f"# TYPE {prefix}_duration_seconds summary"]
+        for key, (count, total, _) in timers:
+            lines.append(f"{prefix}_duration_seconds_count{prometheus_labels(*key)} {count}")
+            lines.append(f"{prefix}_duration_seconds_sum{prometheus_labels(*key)} {total:.6f}")
+        lines.append(f"# TYPE {prefix}_duration_max_seconds gauge")
+        for key, (_, _, longest) in timers:
+            lines.append(f"{prefix}_duration_max_seconds{prometheus_labels(*key)} {longest:.6f}")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for key, value in counters:
+            lines.append(f"{prefix}_events_total{prometheus_labels(*key)} {value}")
+        return "\n".join(lines) + "\n"
+
+def metric_key(name, label=""):
+    """اسم المقياس المعروض: name أو name[label]"""
+    return f"{name}[{label}]" if label else name
+
+def prometheus_labels(name, label=""):
+    """تسميات سطر Prometheus مع تهريب القيم"""
+    def escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'{{name="{escape(name)}",key="{escape(label)}"}}'
+
+@st.cache_resource
+def get_perf_metrics():
+    """مقاييس الأداء المشتركة على مستوى العملية"""
+    return PerfMetrics()
+
+# الكائنات المشتركة التي تحتاجها المزامنة والتخزين المحلي خارج خادم Streamlit
+PINNED_SINGLETONS = ['get_sheet_cache', 'get_request_scheduler', 'get_perf_metrics',
+                     'get_snapshot_store', 'get_history_store']
+
+def pin_singletons(**instances):
+    """تثبيت الكائنات المشتركة للسكربتات التي تعمل خارج خادم Streamlit (القياس، عامل التحميل)
+    
+    st.cache_resource لا يحفظ النتائج هناك فيُنشئ كل استدعاء كائناً جديداً. كل دالة من
+    PINNED_SINGLETONS (وكل دالة get_* ممررة) تُستبدل بدالة تُرجع كائناً واحداً: الممرر
+    في instances أو الذي ينشئه استدعاؤها الأول. تُرجع {اسم الدالة: الكائن}.
+    """
+    pinned = {}
+    for name in dict.fromkeys(PINNED_SINGLETONS + list(instances)):
+        instance = instances[name] if name in instances else globals()[name]()
+        globals()[name] = lambda instance=instance: instance
+        pinned[name] = instance
+    return pinned
+
+@contextmanager
+def perf_timer(name, label=""):
+    """قياس زمن الكتلة وتسجيله في مقاييس الأداء"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_perf_metrics().observe(name, time.perf_counter() - start, label)
+
+def timed(name):
+    """مزخرف لقياس زمن كل استدعاء للدالة"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with perf_timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def tracked_cache(name, cache):
+    """تغليف st.cache_data/st.cache_resource مع عدّ الإصابات والإخفاقات
+    
+    cache: المزخرف المُعد مثل st.cache_resource(max_entries=16). الاستدعاء الذي يصل
+    إلى جسم الدالة إخفاق يُقاس زمن حسابه، وما عداه إصابة.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            _perf_context.cache_miss = True
+            with perf_timer('cache_compute', name):
+                return fn(*args, **kwargs)
+        cached = cache(compute)
+        
+        @functools.wraps(fn)
+        def lookup(*args, **kwargs):
+            outer = getattr(_perf_context, 'cache_miss', False)
+            _perf_context.cache_miss = False
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                miss = _perf_context.cache_miss
+                _perf_context.cache_miss = outer
+                get_perf_metrics().increment('cache_misses' if miss else 'cache_hits', name)
+        lookup.clear = cached.clear
+        return lookup
+    return decorate
+
+# ذاكرة مؤقتة مشتركة لبيانات أوراق العمل
+class SheetCache:
+    """ذاكرة مؤقتة مشتركة بين الجلسات بمهلة صلاحية وحد أقصى للحجم (LRU)"""
+    def __init__(self, ttl=SHEET_CACHE_TTL, max_bytes=SHEET_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+    
+    def data_version(self, spreadsheet_id):
+        """رقم نسخة بيانات الجدول، يزيد مع كل تغيير في أي من أوراقه"""
+        with self._lock:
+            return self._versions.get(spreadsheet_id, 0)
+    
+    def sheet_versions(self, spreadsheet_id, worksheet_names):
+        """أرقام نسخ الأوراق المحددة فقط (مثل 3.1)، فلا يغيّرها تحميل أوراق أخرى في الخلفية"""
+        with self._lock:
+            return ".".join(str(self._versions.get((spreadsheet_id, name), 0)) for name in worksheet_names)
+    
+    def _bump(self, spreadsheet_id, worksheet_names):
+        self._versions[spreadsheet_id] = self._versions.get(spreadsheet_id, 0) + 1
+        for name in worksheet_names:
+            key = (spreadsheet_id, name)
+            self._versions[key] = self._versions.get(key, 0) + 1
+    
+    def get(self, spreadsheet_id, worksheet_name, max_age=None):
+        """إرجاع البيانات إذا كانت ضمن مهلة الصلاحية (أو max_age إن حُددت)"""
+        key = (spreadsheet_id, worksheet_name)
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry['fetched_at'] > max_age:
+                return None
+            self._entries.move_to_end(key)
+            return entry['df'].copy(deep=False)
+    
+    def peek(self, spreadsheet_id, worksheet_name):
+        """إرجاع البيانات ووقت آخر مزامنة كاملة بغض النظر عن الصلاحية"""
+        with self._lock:
+            entry = self._entries.get((spreadsheet_id, worksheet_name))
+            if entry is None:
+                return None, None
+            return entry['df'].copy(deep=False), entry['synced_at']
+    
+    def revalidate(self, spreadsheet_id, worksheet_name, modified_time):
+        """تجديد صلاحية البيانات المنتهية إذا لم يتغير وقت تعديل الجدول"""
+        key = (spreadsheet_id, worksheet_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or modified_time is None or entry['modified_time'] != modified_time:
+                return None
+            entry['fetched_at'] = time.time()
+            self._entries.move_to_end(key)
+            return entry['df'].copy(deep=False)
+    
+    def put(self, spreadsheet_id, worksheet_name, df, modified_time=None, synced_at=None):
+        """تخزين بيانات ورقة مع إخراج الأقدم استخداماً عند تجاوز الحجم"""
+        key = (spreadsheet_id, worksheet_name)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        now = time.time()
+        with self._lock:
+            self._pop(key)
+            if nbytes > self.max_bytes:
+                return
+            self._bump(spreadsheet_id, [worksheet_name])
+            self._entries[key] = {
+                'df': df,
+                'fetched_at': now,
+                'synced_at': now if synced_at is None else synced_at,
+                'modified_time': modified_time,
+                'nbytes': nbytes,
+            }
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+    
+    def touch(self, spreadsheet_id, worksheet_name, modified_time):
+        """تجديد صلاحية ورقة تأكد عدم تغيّر بياناتها"""
+        with self._lock:
+            entry = self._entries.get((spreadsheet_id, worksheet_name))
+            if entry is not None:
+                entry['fetched_at'] = time.time()
+                entry['modified_time'] = modified_time
+    
+    def expire(self, spreadsheet_id, worksheet_name):
+        """إنهاء صلاحية ورقة مع الإبقاء على بياناتها كأساس للمزامنة التزايدية"""
+        with self._lock:
+            entry = self._entries.get((spreadsheet_id, worksheet_name))
+            if entry is not None:
+                entry['fetched_at'] = 0
+                entry['modified_time'] = None
+    
+    def invalidate(self, spreadsheet_id, worksheet_name=None):
+        """حذف ورقة محددة أو كل أوراق الجدول من الذاكرة المؤقتة"""
+        with self._lock:
+            keys = [key for key in self._entries
+                    if key[0] == spreadsheet_id and worksheet_name in (None, key[1])]
+            self._bump(spreadsheet_id, [key[1] for key in keys] if worksheet_name is None else [worksheet_name])
+            for key in keys:
+                self._pop(key)
+    
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry['nbytes']
+
+@st.cache_resource
+def get_sheet_cache():
+    """الذاكرة المؤقتة المشتركة على مستوى العملية"""
+    return SheetCache()
+
+def values_to_dataframe(values, columns=None, sheet_name=None):
+    """تحويل القيم الخام لورقة عمل إلى DataFrame بنفس طريقة get_all_records
+    
+    أعمدة مخطط الورقة (إن وُجد) تُحوّل حسب المخطط، والباقي كأرقام حيثما أمكن.
+    """
+    if columns is not None:
+        headers, rows = columns, fill_gaps(values, cols=len(columns))
+    else:
+        values = fill_gaps(values)
+        if not values:
+            return pd.DataFrame()
+        headers, rows = values[0], values[1:]
+    schema = SHEET_SCHEMAS.get(sheet_name)
+    if not schema:
+        return pd.DataFrame([numericise_all(row) for row in rows], columns=headers)
+    raw = [header in schema for header in headers]
+    rows = [[value if keep else numericise(value) for value, keep in zip(row, raw)] for row in rows]
+    return apply_schema(pd.DataFrame(rows, columns=headers), sheet_name)
+
+def parse_dates(values):
+    """تحويل عمود تواريخ بصيغة DATE_FORMAT، مع محاولة الصيغ الأخرى للقيم المتبقية فقط"""
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    retry = parsed.isna() & values.notna() & (values.astype(str).str.strip() != '')
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry].astype(str), format='mixed', errors='coerce')
+    return parsed
+
+def apply_schema(df, sheet_name):
+    """تحويل أعمدة الورقة إلى أنواع المخطط؛ الأعمدة المحوّلة مسبقاً تُترك كما هي"""
+    schema = SHEET_SCHEMAS.get(sheet_name)
+    if not schema or not len(df.columns):
+        return df
+    df = df.copy(deep=False)
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if kind == 'text':
+            if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+                df[col] = values.where(values.isna(), values.astype(str))
+        elif kind == 'category':
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                df[col] = values.astype('category')
+        elif kind == 'int16':
+            if str(values.dtype) not in ('int16', 'Int16'):
+                numbers = pd.to_numeric(values, errors='coerce')
+                present = numbers.dropna()
+                if ((present % 1 == 0).all()
+                        and present.between(np.iinfo(np.int16).min, np.iinfo(np.int16).max).all()):
+                    df[col] = numbers.astype('Int16' if len(present) < len(numbers) else np.int16)
+                else:
+                    df[col] = numbers
+        elif kind == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                df[col] = parse_dates(values)
+    return df
+
+def concat_typed(df, tail):
+    """إضافة صفوف جديدة لإطار محوّل مع الحفاظ على الأعمدة الفئوية (اتحاد الفئات)"""
+    combined = pd.concat([df, tail], ignore_index=True)
+    for col in df.columns:
+        if (isinstance(df[col].dtype, pd.CategoricalDtype)
+                and isinstance(tail[col].dtype, pd.CategoricalDtype)):
+            combined[col] = pd.api.types.union_categoricals([df[col], tail[col]])
+    return combined
+
+def column_letter(col):
+    """حرف العمود بصيغة A1 (1 -> A)"""
+    return rowcol_to_a1(1, col)[:-1]
+
+def group_row_ranges(row_indexes, records):
+    """تجميع الصفوف المتتالية في نطاقات A1 للكتابة المجمّعة"""
+    ranges = []
+    run = []
+    for row_index in row_indexes:
+        if run and row_index != run[-1] + 1:
+            ranges.append(_row_range(run, records))
+            run = []
+        run.append(row_index)
+    if run:
+        ranges.append(_row_range(run, records))
+    return ranges
+
+def _row_range(run, records):
+    # القيم الفارغة (None) يتجاهلها Sheets API فلا تُمسح الخلايا الزائدة
+    width = max(len(records[row_index]) for row_index in run)
+    values = [list(records[row_index]) + [None] * (width - len(records[row_index]))
+              for row_index in run]
+    a1_range = f"{rowcol_to_a1(run[0], 1)}:{rowcol_to_a1(run[-1], width)}"
+    return {'range': a1_range, 'values': values}
+
+# أولوية طلبات الخيط الحالي (الخيوط الخلفية تخفضها عبر request_priority)
+_request_context = threading.local()
+
+@contextmanager
+def request_priority(priority):
+    """تحديد أولوية طلبات Sheets الصادرة من الخيط الحالي داخل الكتلة"""
+    previous = getattr(_request_context, 'priority', PRIORITY_INTERACTIVE)
+    _request_context.priority = priority
+    try:
+        yield
+    finally:
+        _request_context.priority = previous
+
+# مجدول طلبات Google Sheets المشترك
+class RequestScheduler:
+    """تمرير كل طلبات Sheets عبر دلو رموز (token bucket) بحجم الحصة مع أولويات وإعادة محاولة
+    
+    الطلب المنتظر ذو الأولوية الأعلى (الرقم الأصغر) يأخذ الرمز التالي، والطلبات المتطابقة
+    الجارية (نفس المفتاح) من جلسات متزامنة تنتظر نتيجة طلب واحد.
+    """
+    def __init__(self, quota_per_minute=SHEETS_QUOTA_PER_MINUTE):
+        self.rate = quota_per_minute / 60.0
+        self.capacity = float(quota_per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._inflight = {}
+    
+    def call(self, fn, *args, key=None, priority=None, idempotent=True, **kwargs):
+        """تنفيذ الطلب عند توفر رمز؛ key يوحّد الطلبات المتطابقة الجارية
+        
+        الطلبات غير المتكررة الأثر (idempotent=False مثل الإضافة) يُعاد إرسالها عند 429 فقط.
+        """
+        if priority is None:
+            priority = getattr(_request_context, 'priority', PRIORITY_INTERACTIVE)
+        if key is None:
+            return self._run(fn, args, kwargs, priority, idempotent)
+        
+        with self._cond:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = self._run(fn, args, kwargs, priority, idempotent)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+    
+    def _run(self, fn, args, kwargs, priority, idempotent):
+        attempt = 0
+        while True:
+            self._acquire(priority)
+            metrics = get_perf_metrics()
+            name = getattr(fn, '__name__', 'request')
+            metrics.increment('sheets_api_calls', name)
+            try:
+                with perf_timer('sheets_api', name):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                throttled = (isinstance(e, gspread.exceptions.APIError)
+                             and e.response.status_code == 429)
+                if throttled:
+                    metrics.increment('sheets_api_throttled', name)
+                if attempt >= SCHEDULER_MAX_RETRIES or not (
+                        throttled or (idempotent and is_retryable_error(e))):
+                    metrics.increment('sheets_api_errors', name)
+                    raise
+                metrics.increment('sheets_api_retries', name)
+                if throttled:
+                    # تجاوز الحصة يوقف كل الطلبات حتى تمتلئ الرموز من جديد
+                    with self._cond:
+                        self.tokens = min(self.tokens, 0.0)
+                delay = min(SCHEDULER_RETRY_MAX, SCHEDULER_RETRY_BASE * 2 ** attempt)
+                time.sleep(random.uniform(delay / 2, delay))
+                attempt += 1
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def _acquire(self, priority):
+        """انتظار الدور حسب الأولوية ثم أخذ رمز"""
+        ticket = (priority, next(self._tickets))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiting[0] == ticket and self.tokens >= 1:
+                        heapq.heappop(self._waiting)
+                        self.tokens -= 1
+                        self._cond.notify_all()
+                        return
+                    # غير صاحب الدور ينتظر إشعار أخذ الرمز؛ صاحب الدور ينتظر امتلاء رمز
+                    self._cond.wait(timeout=(1 - self.tokens) / self.rate if self.tokens < 1 else None)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+
+@st.cache_resource
+def get_request_scheduler():
+    """مجدول الطلبات المشترك على مستوى العملية (حصة Sheets مشتركة بين كل الجلسات)"""
+    return RequestScheduler()
+
+def credentials_fingerprint(credentials_dict):
+    """بصمة ملف الاعتماد كاملاً: البريد ومعرّف المفتاح وتجزئة المفتاح الخاص
+    
+    لا يكفي البريد وحده لتمييز الحساب لأنه ليس سراً؛ من يملك المفتاح الخاص فقط يطابق البصمة.
+    """
+    parts = [str(credentials_dict.get(field) or '')
+             for field in ('client_email', 'private_key_id', 'private_key')]
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
 # فئة لإدارة الاتصال مع Google Sheets
 class GoogleSheetsManager:
-    def __init__(self, credentials_json, spreadsheet_id):
+    def __init__(self, credentials_json, spreadsheet_id, client=None):
+        """client: عميل بديل بواجهة gspread (مثل fake_sheets.FakeClient) بدلاً من حساب الخدمة"""
         self.credentials_json = credentials_json
         self.spreadsheet_id = spreadsheet_id
-        self.client = None
+        self.client_email = None
+        self.fingerprint = None
+        self.client = client
         self.workbook = None
+        self._worksheets = {}
+        self._lock = threading.Lock()
+        self._prefetching = set()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
         self.connect()
     
     def connect(self):
@@ -71,37 +803,223 @@ class GoogleSheetsManager:
                 credentials_dict = json.loads(self.credentials_json)
             else:
                 credentials_dict = self.credentials_json
+            self.client_email = credentials_dict.get('client_email')
+            self.fingerprint = credentials_fingerprint(credentials_dict)
             
-            scope = [
-                "https://spreadsheets.google.com/feeds",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            
-            credentials = Credentials.from_service_account_info(
-                credentials_dict, scopes=scope
-            )
-            self.client = gspread.authorize(credentials)
-            self.workbook = self.client.open_by_key(self.spreadsheet_id)
+            if self.client is None:
+                scope = [
+                    "https://spreadsheets.google.com/feeds",
+                    "https://www.googleapis.com/auth/drive"
+                ]
+                
+                credentials = Credentials.from_service_account_info(
+                    credentials_dict, scopes=scope
+                )
+                self.client = gspread.authorize(credentials)
+            self.workbook = get_request_scheduler().call(self.client.open_by_key, self.spreadsheet_id)
+            self._worksheets = {}
             return True
         except Exception as e:
             st.error(f"خطأ في الاتصال بـ Google Sheets: {e}")
             return False
     
+    def ensure_token(self):
+        """تجديد رمز الوصول مسبقاً عبر نفس جلسة HTTP إذا اقترب انتهاؤه"""
+        credentials = self.client.auth
+        margin = timedelta(seconds=TOKEN_REFRESH_MARGIN)
+        try:
+            with self._lock:
+                if (credentials.token is None or credentials.expiry is None
+                        or credentials.expiry - datetime.utcnow() < margin):
+                    self.client.login()
+            return True
+        except Exception as e:
+            st.error(f"خطأ في تجديد رمز الوصول: {e}")
+            return False
+    
+    def _request(self, fn, *args, key=None, idempotent=True, **kwargs):
+        """إرسال طلب عبر المجدول المشترك؛ key (دون معرف الجدول وبصمة الاعتماد) يوحّد الطلبات المتطابقة
+        
+        البصمة جزء من المفتاح حتى لا تتلقى جلسة بحساب خدمة آخر نتيجة (مثل مقبض ورقة عمل)
+        مرتبطة باتصال غيرها.
+        """
+        if key is not None:
+            key = (self.fingerprint, self.spreadsheet_id) + key
+        return get_request_scheduler().call(fn, *args, key=key, idempotent=idempotent, **kwargs)
+    
+    def get_worksheet(self, worksheet_name):
+        """إرجاع ورقة العمل من الذاكرة دون طلب بيانات وصفية في كل مرة"""
+        worksheet = self._worksheets.get(worksheet_name)
+        if worksheet is None:
+            worksheet = self._request(self.workbook.worksheet, worksheet_name,
+                                      key=('worksheet', worksheet_name))
+            self._worksheets[worksheet_name] = worksheet
+        return worksheet
+    
+    def get_modified_time(self):
+        """جلب وقت آخر تعديل للجدول من Google Drive"""
+        def refresh():
+            self.workbook.refresh_lastUpdateTime()
+            return self.workbook.lastUpdateTime
+        
+        # القيمة تُرجع من الطلب نفسه فتصل إلى كل من انتظر طلباً موحداً
+        try:
+            return self._request(refresh, key=('modified_time',))
+        except Exception:
+            return None
+    
     def get_worksheet_data(self, worksheet_name):
         """جلب البيانات من ورقة عمل محددة"""
+        return self.get_worksheets_data([worksheet_name])[worksheet_name]
+    
+    @timed('sheets_fetch')
+    def get_worksheets_data(self, worksheet_names=SHEET_NAMES, max_age=None):
+        """جلب عدة أوراق عمل بطلب values_batch_get واحد مع الاستفادة من الذاكرة المؤقتة"""
+        cache = get_sheet_cache()
+        metrics = get_perf_metrics()
+        result = {}
+        missing = []
+        for name in worksheet_names:
+            df = cache.get(self.spreadsheet_id, name, max_age)
+            if df is None:
+                missing.append(name)
+            else:
+                result[name] = df
+        metrics.increment('cache_hits', 'sheets', len(result))
+        metrics.increment('cache_misses', 'sheets', len(missing))
+        
+        if not missing:
+            return result
+        
+        # الأوراق المنتهية صلاحيتها لا يُعاد تحميلها إذا لم يتغير الجدول
+        self.ensure_token()
+        modified_time = self.get_modified_time()
+        stale = []
+        for name in missing:
+            df = cache.revalidate(self.spreadsheet_id, name, modified_time)
+            if df is None:
+                stale.append(name)
+            else:
+                result[name] = df
+        metrics.increment('cache_revalidated', 'sheets', len(missing) - len(stale))
+        
+        if not stale:
+            return result
+        
+        synced = {}
         try:
-            worksheet = self.workbook.worksheet(worksheet_name)
-            data = worksheet.get_all_records()
-            return pd.DataFrame(data)
+            synced.update(self._sync_tails(stale, modified_time))
+            full = [name for name in stale if name not in synced]
+            if full:
+                synced.update(self._sync_full(full, modified_time))
         except Exception as e:
-            st.error(f"خطأ في جلب البيانات من {worksheet_name}: {e}")
-            return pd.DataFrame()
+            st.error(f"خطأ في جلب البيانات من {', '.join(stale)}: {e}")
+        
+        if synced:
+            get_snapshot_store().save_async(self.spreadsheet_id, synced, modified_time, self.fingerprint)
+            get_history_store().save_async(self.spreadsheet_id, synced)
+        result.update(synced)
+        
+        # عند فشل الجلب تُعرض آخر بيانات مخزنة بدلاً من جدول فارغ
+        for name in stale:
+            if name not in result:
+                df, _ = cache.peek(self.spreadsheet_id, name)
+                result[name] = df if df is not None else pd.DataFrame()
+        return result
+    
+    def prefetch(self, worksheet_names):
+        """تحميل أوراق إلى الذاكرة المؤقتة في الخلفية دون انتظار (طلب جارٍ واحد لكل ورقة)"""
+        with self._lock:
+            names = [name for name in worksheet_names if name not in self._prefetching]
+            self._prefetching.update(names)
+        if not names:
+            return
+        
+        def run():
+            try:
+                with request_priority(PRIORITY_BACKGROUND):
+                    self.get_worksheets_data(names)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._prefetching.difference_update(names)
+        
+        self._prefetcher.submit(run)
+    
+    def _sync_full(self, worksheet_names, modified_time):
+        """تحميل كامل للأوراق بطلب values_batch_get واحد"""
+        cache = get_sheet_cache()
+        ranges = [absolute_range_name(name) for name in worksheet_names]
+        response = self._request(self.workbook.values_batch_get, ranges, key=('values', tuple(ranges)))
+        result = {}
+        for name, value_range in zip(worksheet_names, response.get('valueRanges', [])):
+            df = values_to_dataframe(value_range.get('values', []), sheet_name=name)
+            cache.put(self.spreadsheet_id, name, df, modified_time)
+            result[name] = df.copy(deep=False)
+        return result
+    
+    def _sync_tails(self, worksheet_names, modified_time):
+        """مزامنة تزايدية: جلب صف العناوين وما بعد آخر صف معروف فقط ودمجه في البيانات المخزنة
+        
+        تُعاد الأوراق التي لا يمكن مزامنتها تزايدياً (لا توجد بيانات سابقة، تغيّر العناوين
+        أو آخر صف معروف، لم تُضف إليها صفوف، أو حان موعد المزامنة الكاملة) لتُحمّل كاملة.
+        """
+        cache = get_sheet_cache()
+        known = {}
+        for name in worksheet_names:
+            df, synced_at = cache.peek(self.spreadsheet_id, name)
+            if (df is None or df.columns.empty or ID_COLUMNS.get(name) not in df.columns
+                    or time.time() - synced_at > FULL_RESYNC_INTERVAL):
+                continue
+            known[name] = df
+        if not known:
+            return {}
+        
+        # الصف الأخير المعروف في الورقة = عدد الصفوف + صف العناوين
+        ranges = []
+        for name, df in known.items():
+            last_col = column_letter(len(df.columns))
+            ranges.append(absolute_range_name(name, "1:1"))
+            ranges.append(absolute_range_name(name, f"A{max(len(df), 1) + 1}:{last_col}"))
+        response = self._request(self.workbook.values_batch_get, ranges, key=('values', tuple(ranges)))
+        value_ranges = response.get('valueRanges', [])
+        
+        tails = {}
+        for i, (name, df) in enumerate(known.items()):
+            header = fill_gaps((value_ranges[2 * i].get('values') or [[]])[:1],
+                               cols=len(df.columns))[0]
+            rows = value_ranges[2 * i + 1].get('values', [])
+            if header != list(df.columns):
+                continue
+            if len(df):
+                last_id = df[ID_COLUMNS[name]].iloc[-1]
+                first_row = (values_to_dataframe(rows[:1], columns=list(df.columns), sheet_name=name)
+                             if rows else None)
+                if first_row is None or first_row[ID_COLUMNS[name]].iloc[0] != last_id:
+                    continue
+                rows = rows[1:]
+            tails[name] = rows
+        
+        # الجدول تغيّر (وقت التعديل مشترك بين أوراقه): الورقة التي لم تُضف إليها صفوف قد تكون
+        # عُدلت في مكانها، فتُترك للتحميل الكامل بدلاً من اعتبارها محدثة
+        result = {}
+        for name, rows in tails.items():
+            if not rows:
+                continue
+            df = known[name]
+            _, synced_at = cache.peek(self.spreadsheet_id, name)
+            df = concat_typed(df, values_to_dataframe(rows, columns=list(df.columns), sheet_name=name))
+            cache.put(self.spreadsheet_id, name, df, modified_time, synced_at=synced_at)
+            result[name] = df.copy(deep=False)
+        return result
     
     def add_record(self, worksheet_name, record):
         """إضافة سجل جديد"""
         try:
-            worksheet = self.workbook.worksheet(worksheet_name)
-            worksheet.append_row(record)
+            worksheet = self.get_worksheet(worksheet_name)
+            self._request(worksheet.append_row, record, idempotent=False)
+            get_sheet_cache().invalidate(self.spreadsheet_id, worksheet_name)
             return True
         except Exception as e:
             st.error(f"خطأ في إضافة السجل: {e}")
@@ -109,118 +1027,2235 @@ class GoogleSheetsManager:
     
     def update_record(self, worksheet_name, row_index, record):
         """تحديث سجل موجود"""
+        return self.update_records(worksheet_name, {row_index: record})
+    
+    def update_records(self, worksheet_name, records, chunk_size=WRITE_CHUNK_SIZE):
+        """تحديث عدة سجلات {رقم الصف: السجل} بأقل عدد من نطاقات A1 في طلب batch_update لكل دفعة"""
+        try:
+            self.ensure_token()
+            worksheet = self.get_worksheet(worksheet_name)
+            row_indexes = sorted(records)
+            for start in range(0, len(row_indexes), chunk_size):
+                chunk = row_indexes[start:start + chunk_size]
+                self._request(worksheet.batch_update, group_row_ranges(chunk, records),
+                              value_input_option='USER_ENTERED')
+            get_sheet_cache().invalidate(self.spreadsheet_id, worksheet_name)
+            return True
+        except Exception as e:
+            st.error(f"خطأ في تحديث السجلات: {e}")
+            return False
+    
+    def append_records(self, worksheet_name, rows, chunk_size=WRITE_CHUNK_SIZE):
+        """إضافة عدة سجلات بطلب append_rows واحد لكل دفعة"""
         try:
-            worksheet = self.workbook.worksheet(worksheet_name)
-            for i, value in enumerate(record, 1):
-                worksheet.update_cell(row_index, i, value)
+            self.write_rows(worksheet_name, rows, chunk_size)
             return True
         except Exception as e:
-            st.error(f"خطأ في تحديث السجل: {e}")
+            st.error(f"خطأ في إضافة السجلات: {e}")
+            return False
+    
+    def column_values(self, worksheet_name, first_row=1):
+        """قيم العمود الأول (المعرّف) من الصف first_row حتى آخر الورقة"""
+        self.ensure_token()
+        a1_range = absolute_range_name(worksheet_name, f"A{first_row}:A")
+        response = self._request(self.workbook.values_batch_get, [a1_range], key=('values', (a1_range,)))
+        value_ranges = response.get('valueRanges', [])
+        rows = value_ranges[0].get('values', []) if value_ranges else []
+        return [str(row[0]) if row else '' for row in rows]
+    
+    def write_rows(self, worksheet_name, rows, chunk_size=WRITE_CHUNK_SIZE):
+        """إضافة الصفوف دون معالجة الأخطاء (تستخدمها الخيوط الخلفية لتقرر إعادة المحاولة)"""
+        self.ensure_token()
+        worksheet = self.get_worksheet(worksheet_name)
+        for start in range(0, len(rows), chunk_size):
+            self._request(worksheet.append_rows, rows[start:start + chunk_size], idempotent=False)
+        # الصفوف المضافة تُجلب في المزامنة التزايدية التالية
+        get_sheet_cache().expire(self.spreadsheet_id, worksheet_name)
+
+# مجمّع اتصالات Google Sheets على مستوى العملية
+class SheetsManagerPool:
+    """إعادة استخدام مدير واحد لكل (بصمة ملف الاعتماد، الجدول) بين جميع الجلسات"""
+    def __init__(self):
+        self._managers = {}
+        self._lock = threading.Lock()
+    
+    def get(self, credentials_dict, spreadsheet_id):
+        """إرجاع مدير متصل من المجمّع أو إنشاؤه عند أول طلب"""
+        key = (credentials_fingerprint(credentials_dict), spreadsheet_id)
+        with self._lock:
+            manager = self._managers.get(key)
+            if manager is None:
+                manager = GoogleSheetsManager(credentials_dict, spreadsheet_id)
+                if manager.workbook is None:
+                    return None
+                self._managers[key] = manager
+        manager.ensure_token()
+        return manager
+    
+    def find(self, fingerprint, spreadsheet_id):
+        """البحث عن مدير متصل مسبقاً ببصمة ملف الاعتماد دون إنشاء اتصال جديد"""
+        with self._lock:
+            return self._managers.get((fingerprint, spreadsheet_id))
+
+@st.cache_resource
+def get_manager_pool():
+    """مجمّع المديرين المشترك على مستوى العملية"""
+    return SheetsManagerPool()
+
+def dataframe_to_arrow(df):
+    """تحويل DataFrame إلى جدول Arrow مع خريطة الأنواع، وتحويل الأعمدة مختلطة الأنواع إلى نص"""
+    df = df.copy(deep=False)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].astype(str)
+    dtypes = {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+    return pa.Table.from_pandas(df, preserve_index=False), dtypes
+
+def write_arrow_file(path, table):
+    """كتابة جدول Arrow IPC بالاستبدال الذري (ملف مؤقت ثم إعادة تسمية)"""
+    with pa.OSFile(path + ".tmp", 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + ".tmp", path)
+
+def read_arrow_file(path):
+    """قراءة جدول Arrow IPC بالتعيين في الذاكرة"""
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+# مخزن النسخ المحلية لبيانات الأوراق
+class SnapshotStore:
+    """حفظ كل ورقة بصيغة Arrow IPC بعد كل مزامنة ناجحة وقراءتها بالتعيين في الذاكرة (mmap)"""
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+        self._loaded = {}
+    
+    def save_async(self, spreadsheet_id, frames, modified_time=None, fingerprint=None):
+        """حفظ النسخة في الخلفية دون إبطاء عرض الصفحة"""
+        self._executor.submit(self.save, spreadsheet_id, frames, modified_time, fingerprint)
+    
+    def save(self, spreadsheet_id, frames, modified_time=None, fingerprint=None):
+        """كتابة ملفات الأوراق وتحديث ملف الوصف (المخطط وخريطة الأنواع)
+        
+        fingerprint: بصمة ملف الاعتماد الذي جلب البيانات؛ تُحفظ ليُسمح لها بوضع عدم الاتصال.
+        """
+        directory = os.path.join(self.root, spreadsheet_id)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            manifest = self._read_manifest(spreadsheet_id)
+            for name, df in frames.items():
+                table, dtypes = dataframe_to_arrow(df)
+                filename = hashlib.md5(name.encode('utf-8')).hexdigest()[:12] + ".arrow"
+                write_arrow_file(os.path.join(directory, filename), table)
+                manifest['sheets'][name] = {
+                    'file': filename,
+                    'rows': table.num_rows,
+                    'dtypes': dtypes,
+                    'modified_time': modified_time,
+                    'saved_at': time.time(),
+                }
+            authorized = manifest.setdefault('authorized', [])
+            if fingerprint and fingerprint not in authorized:
+                authorized.append(fingerprint)
+                del authorized[:-SNAPSHOT_MAX_CREDENTIALS]
+            manifest['saved_at'] = time.time()
+            manifest_path = os.path.join(directory, "manifest.json")
+            with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(manifest_path + ".tmp", manifest_path)
+    
+    def load(self, spreadsheet_id):
+        """قراءة آخر نسخة لكل ورقة بالتعيين في الذاكرة، وإرجاع (الأوراق، ملف الوصف)"""
+        with self._lock:
+            manifest = self._read_manifest(spreadsheet_id)
+            cached = self._loaded.get(spreadsheet_id)
+            if cached is not None and cached[0] == manifest.get('saved_at'):
+                return {name: df.copy(deep=False) for name, df in cached[1].items()}, manifest
+            
+            frames = {}
+            for name, meta in manifest['sheets'].items():
+                path = os.path.join(self.root, spreadsheet_id, meta['file'])
+                try:
+                    table = read_arrow_file(path)
+                except (OSError, pa.ArrowInvalid):
+                    continue
+                if table.column_names != list(meta['dtypes']):
+                    continue
+                frames[name] = table.to_pandas()
+            self._loaded[spreadsheet_id] = (manifest.get('saved_at'), frames)
+            return {name: df.copy(deep=False) for name, df in frames.items()}, manifest
+    
+    def is_authorized(self, spreadsheet_id, fingerprint):
+        """هل جلب ملف الاعتماد صاحب البصمة بيانات هذا الجدول من قبل"""
+        if not spreadsheet_id or not fingerprint or os.path.basename(spreadsheet_id) != spreadsheet_id:
+            return False
+        return fingerprint in self._read_manifest(spreadsheet_id).get('authorized', [])
+    
+    def _read_manifest(self, spreadsheet_id):
+        path = os.path.join(self.root, spreadsheet_id, "manifest.json")
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'spreadsheet_id': spreadsheet_id, 'saved_at': None, 'sheets': {}}
+
+@st.cache_resource
+def get_snapshot_store():
+    """مخزن النسخ المحلية المشترك على مستوى العملية"""
+    return SnapshotStore()
+
+def arrow_string_dtype(arrow_type):
+    """أعمدة النصوص تبقى في ذاكرة Arrow (string[pyarrow]) بدلاً من نسخها إلى كائنات Python"""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+# مستوى البيانات المشترك بين العمليات
+class DataPlane:
+    """نشر أحدث نسخة من الأوراق في مجلد مشترك وقراءتها من عدة عمليات دون نسخها
+    
+    عامل التحميل وحده يزامن مع Google Sheets ويكتب كل نسخة في ملفات Arrow IPC جديدة ثم
+    يستبدل ملف الوصف ذرياً. عمليات العرض تعيّن الملفات في الذاكرة للقراءة فقط، فتتشارك
+    صفحات الملفات عبر ذاكرة نظام التشغيل، وتحوّل كل عملية النسخة مرة واحدة لكل جلساتها.
+    """
+    def __init__(self, root=DATA_PLANE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._loaded = (None, None)
+    
+    def publish(self, spreadsheet_id, frames):
+        """كتابة نسخة جديدة من الأوراق ثم تحويل ملف الوصف إليها وإرجاع معرّفها
+        
+        معرّف النسخة فريد حتى بعد إعادة تشغيل العامل، وملفات النسخة السابقة تبقى حتى
+        النشر التالي لمن قرأ ملف الوصف قبل الاستبدال.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        previous = self._read_manifest()
+        version = f"{spreadsheet_id}:{time.time_ns()}"
+        tag = hashlib.md5(version.encode('utf-8')).hexdigest()[:8]
+        sheets = {}
+        for name, df in frames.items():
+            table, dtypes = dataframe_to_arrow(df)
+            filename = f"{hashlib.md5(name.encode('utf-8')).hexdigest()[:12]}-{tag}.arrow"
+            write_arrow_file(os.path.join(self.root, filename), table)
+            sheets[name] = {'file': filename, 'rows': table.num_rows, 'dtypes': dtypes}
+        manifest = {
+            'spreadsheet_id': spreadsheet_id,
+            'version': version,
+            'published_at': time.time(),
+            'sheets': sheets,
+        }
+        manifest_path = os.path.join(self.root, "manifest.json")
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        
+        keep = {meta['file'] for m in (manifest, previous) for meta in m['sheets'].values()}
+        for filename in os.listdir(self.root):
+            if filename.endswith(".arrow") and filename not in keep:
+                try:
+                    os.remove(os.path.join(self.root, filename))
+                except OSError:
+                    pass
+        return version
+    
+    def load(self, spreadsheet_id):
+        """آخر نسخة منشورة للجدول ({الورقة: البيانات}، معرّف النسخة)، أو (None، None) قبل أول نشر
+        أو إذا كان العامل ينشر جدولاً آخر"""
+        manifest = self._read_manifest()
+        version = manifest.get('version')
+        if version is None or manifest.get('spreadsheet_id') != spreadsheet_id:
+            return None, None
+        with self._lock:
+            if self._loaded[0] != version:
+                frames = {}
+                for name, meta in manifest['sheets'].items():
+                    table = read_arrow_file(os.path.join(self.root, meta['file']))
+                    frames[name] = apply_schema(
+                        table.to_pandas(types_mapper=arrow_string_dtype, split_blocks=True), name)
+                self._loaded = (version, frames)
+            frames = self._loaded[1]
+        return {name: df.copy(deep=False) for name, df in frames.items()}, version
+    
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.root, "manifest.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'version': None, 'sheets': {}}
+
+@st.cache_resource
+def get_data_plane():
+    """قارئ مستوى البيانات المشترك على مستوى العملية"""
+    return DataPlane()
+
+def build_rollup(df, sheet_name, freq):
+    """ملخص ورقة مقسمة لكل (فترة، موظف، حالة): عدد السجلات ومجموع المدة وعدد المدد المسجلة
+    
+    freq: 'D' للملخص اليومي أو 'M' للملخص الشهري. الصفوف دون تاريخ تبقى بفترة فارغة (NaT)
+    حتى تطابق الأعداد الإطار، ومتوسط المدة = مجموع المدة / عدد المدد (المدد الفارغة لا تُحتسب).
+    """
+    config = PARTITIONED_SHEETS[sheet_name]
+    if config['date'] not in df.columns or not len(df):
+        return pd.DataFrame({
+            'الفترة': pd.Series(dtype='datetime64[ns]'),
+            **{col: pd.Series(dtype=object) for col in config['group']},
+            'العدد': pd.Series(dtype=np.int64),
+            'مجموع المدة': pd.Series(dtype=float),
+            'عدد المدد': pd.Series(dtype=np.int64),
+        })
+    dates = pd.to_datetime(df[config['date']], errors='coerce')
+    period = dates.dt.floor('D') if freq == 'D' else dates.dt.to_period('M').dt.to_timestamp()
+    keys = [period.rename('الفترة')] + [df[col] for col in config['group'] if col in df.columns]
+    duration = (pd.to_numeric(df[config['duration']], errors='coerce').astype(float)
+                if config['duration'] in df.columns else pd.Series(np.nan, index=df.index))
+    grouped = duration.groupby(keys, observed=True, dropna=False)
+    return pd.DataFrame({'العدد': grouped.size(), 'مجموع المدة': grouped.sum(),
+                         'عدد المدد': grouped.count()}).reset_index()
+
+def build_rollups(df, sheet_name):
+    """الملخصان اليومي والشهري لإطار كامل"""
+    return build_rollup(df, sheet_name, 'D'), build_rollup(df, sheet_name, 'M')
+
+# مخزن السجل التاريخي المقسم حسب الشهر
+class HistoryStore:
+    """ملخصات يومية وشهرية للمكالمات والشكاوى مقسمة حسب شهر التاريخ
+    
+    الأشهر المنتهية التي لم يتغير عدد صفوفها لا يُعاد حسابها؛ الشهر الحالي والصفوف دون تاريخ
+    (قسم undated) تُعاد مع كل مزامنة. الصفوف نفسها محفوظة في النسخة المحلية (SnapshotStore).
+    """
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self._loaded = {}
+    
+    def save_async(self, spreadsheet_id, frames):
+        """تحديث الأقسام في الخلفية للأوراق المقسمة فقط"""
+        frames = {name: df for name, df in frames.items() if name in PARTITIONED_SHEETS}
+        if frames:
+            self._executor.submit(self.save, spreadsheet_id, frames)
+    
+    def save(self, spreadsheet_id, frames, now=None):
+        """كتابة الأشهر الجديدة أو المتغيرة والشهر الحالي وحذف الأشهر التي لم تعد موجودة"""
+        current = pd.Period(now or datetime.now(), 'M')
+        with self._lock:
+            manifest = self._read_manifest(spreadsheet_id)
+            for name, df in frames.items():
+                df = apply_schema(df, name)
+                date_col = PARTITIONED_SHEETS[name]['date']
+                if date_col not in df.columns:
+                    continue
+                directory = os.path.join(self.root, spreadsheet_id,
+                                         hashlib.md5(name.encode('utf-8')).hexdigest()[:12])
+                os.makedirs(directory, exist_ok=True)
+                sheet = manifest['sheets'].get(name)
+                if sheet is None or sheet.get('format') != HISTORY_FORMAT:
+                    sheet = manifest['sheets'][name] = {'months': {}, 'format': HISTORY_FORMAT}
+                months = df[date_col].dt.to_period('M')
+                groups = {str(month): (month, positions) for month, positions in
+                          pd.Series(np.arange(len(df))).groupby(months.to_numpy()).indices.items()}
+                undated = np.flatnonzero(months.isna().to_numpy())
+                if len(undated):
+                    groups['undated'] = (current, undated)
+                
+                for key, (month, positions) in groups.items():
+                    if month < current and sheet['months'].get(key, {}).get('rows') == len(positions):
+                        continue
+                    daily, monthly = build_rollups(df.take(positions), name)
+                    for suffix, frame in ((".daily", daily), (".monthly", monthly)):
+                        write_arrow_file(os.path.join(directory, f"{key}{suffix}.arrow"),
+                                         dataframe_to_arrow(frame)[0])
+                    sheet['months'][key] = {'rows': len(positions), 'saved_at': time.time()}
+                
+                present = set(groups)
+                for key in [key for key in sheet['months'] if key not in present]:
+                    del sheet['months'][key]
+                expected = {f"{key}{suffix}.arrow" for key in sheet['months'] for suffix in (".daily", ".monthly")}
+                # ملفات الأشهر المحذوفة وأقسام الصفوف الخام من الصيغة السابقة
+                for filename in os.listdir(directory):
+                    if filename.endswith(".arrow") and filename not in expected:
+                        try:
+                            os.remove(os.path.join(directory, filename))
+                        except OSError:
+                            pass
+                sheet['directory'] = os.path.basename(directory)
+                sheet['rows'] = len(df)
+                sheet['undated'] = len(undated)
+            manifest['saved_at'] = time.time()
+            manifest_path = os.path.join(self.root, spreadsheet_id, "manifest.json")
+            with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(manifest_path + ".tmp", manifest_path)
+    
+    def rollups(self, spreadsheet_id, sheet_name, rows=None):
+        """(الملخص اليومي، الملخص الشهري) لكل الأشهر، أو None إذا لم تُحفظ الورقة أو اختلف عدد صفوفها"""
+        with self._lock:
+            manifest = self._read_manifest(spreadsheet_id)
+            sheet = manifest['sheets'].get(sheet_name)
+            if (sheet is None or sheet.get('format') != HISTORY_FORMAT
+                    or (rows is not None and sheet.get('rows') != rows)):
+                return None
+            key = (spreadsheet_id, sheet_name)
+            cached = self._loaded.get(key)
+            if cached is not None and cached[0] == manifest.get('saved_at'):
+                return cached[1]
+            directory = os.path.join(self.root, spreadsheet_id, sheet['directory'])
+            result = []
+            for suffix in (".daily", ".monthly"):
+                tables = []
+                for month in sorted(sheet['months']):
+                    try:
+                        tables.append(read_arrow_file(os.path.join(directory, f"{month}{suffix}.arrow")).to_pandas())
+                    except (OSError, pa.ArrowInvalid):
+                        return None
+                result.append(pd.concat(tables, ignore_index=True) if tables
+                              else build_rollup(pd.DataFrame(), sheet_name, 'D'))
+            self._loaded[key] = (manifest.get('saved_at'), tuple(result))
+            return self._loaded[key][1]
+    
+    def _read_manifest(self, spreadsheet_id):
+        path = os.path.join(self.root, spreadsheet_id, "manifest.json")
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'spreadsheet_id': spreadsheet_id, 'saved_at': None, 'sheets': {}}
+
+@st.cache_resource
+def get_history_store():
+    """مخزن السجل التاريخي المشترك على مستوى العملية"""
+    return HistoryStore()
+
+def load_rollups(source, sheet_name, df):
+    """ملخصات ورقة مقسمة: من المخزن المحلي إذا طابق عدد الصفوف، وإلا تُحسب من الإطار"""
+    if source != "sample":
+        rollups = get_history_store().rollups(source.split(':')[-1], sheet_name, len(df))
+        if rollups is not None:
+            return rollups
+    return build_rollups(df, sheet_name)
+
+def restore_snapshot(gs_manager):
+    """تعبئة الذاكرة المؤقتة من النسخة المحلية عند بدء التشغيل ثم المطابقة مع Sheets في الخلفية"""
+    cache = get_sheet_cache()
+    cold = [name for name in SHEET_NAMES
+            if cache.peek(gs_manager.spreadsheet_id, name)[0] is None]
+    if not cold:
+        return
+    frames, manifest = get_snapshot_store().load(gs_manager.spreadsheet_id)
+    restored = False
+    for name in cold:
+        if name in frames:
+            meta = manifest['sheets'][name]
+            cache.put(gs_manager.spreadsheet_id, name, apply_schema(frames[name], name),
+                      meta['modified_time'], synced_at=meta['saved_at'])
+            restored = True
+    if restored:
+        def reconcile():
+            with request_priority(PRIORITY_BACKGROUND):
+                gs_manager.get_worksheets_data(SHEET_NAMES, 0)
+        
+        threading.Thread(target=reconcile, name="snapshot-reconcile", daemon=True).start()
+
+def load_data_plane(spreadsheet_id):
+    """آخر نسخة نشرها عامل التحميل لجدول الجلسة، أو None إذا لم يُنشر هذا الجدول بعد"""
+    try:
+        frames, version = get_data_plane().load(spreadsheet_id)
+    except (OSError, pa.ArrowInvalid) as e:
+        # ملفات النسخة حُذفت بين قراءة ملف الوصف وفتحها؛ الجولة التالية تقرأ الأحدث
+        st.warning(f"تعذرت قراءة مستوى البيانات المشترك: {e}")
+        frames = None
+    if frames is None:
+        return None
+    return {name: frames.get(name, pd.DataFrame()) for name in SHEET_NAMES}, f"plane:{version}"
+
+def load_snapshot_data(spreadsheet_id=None, fingerprint=None):
+    """وضع القراءة دون اتصال: آخر نسخة محلية لجدول سبق أن جلبه نفس ملف الاعتماد"""
+    store = get_snapshot_store()
+    if not store.is_authorized(spreadsheet_id, fingerprint):
+        st.warning("وضع عدم الاتصال متاح فقط لجدول سبق الاتصال به بنفس ملف الاعتماد؛ "
+                   "أدخل معرف الجدول وملف الاعتماد ثم اضغط اتصال. يتم عرض البيانات التجريبية")
+        return dict(zip(SHEET_NAMES, load_sample_data())), "sample"
+    frames, manifest = store.load(spreadsheet_id)
+    if not frames:
+        st.warning("لا توجد نسخة محلية محفوظة، يتم عرض البيانات التجريبية")
+        return dict(zip(SHEET_NAMES, load_sample_data())), "sample"
+    data_version = f"snapshot:{spreadsheet_id}:{manifest.get('saved_at')}"
+    return {name: apply_schema(frames.get(name, pd.DataFrame()), name) for name in SHEET_NAMES}, data_version
+
+def is_retryable_error(error):
+    """أخطاء تجاوز الحصة (429) وأخطاء الخادم (5xx) وأخطاء الشبكة قابلة لإعادة المحاولة"""
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError, requests.exceptions.RequestException))
+
+def is_permanent_error(error):
+    """أخطاء لا تنجح بإعادة المحاولة: طلب مرفوض (400) أو مورد غير موجود (404) أو ورقة محذوفة"""
+    if isinstance(error, gspread.exceptions.WorksheetNotFound):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.response.status_code in PERMANENT_STATUS_CODES
+    return False
+
+# طابور الكتابة المؤجلة لسجلات النماذج
+class WriteBehindQueue:
+    """حفظ السجلات في سجل محلي دائم فوراً ثم إرسالها على دفعات مجمّعة في خيط خلفي
+    
+    السجلات التي يرفضها Sheets نهائياً (is_permanent_error) تُنقل إلى سجل مرفوضات منفصل
+    بدلاً من إعادة محاولتها إلى الأبد، وتُعرض في الشريط الجانبي.
+    """
+    def __init__(self, journal_path=WRITE_JOURNAL_PATH, dead_letter_path=WRITE_DEAD_LETTER_PATH):
+        self.journal_path = journal_path
+        self.dead_letter_path = dead_letter_path
+        self.last_error = None
+        self.retry_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = self._load_journal()
+        self._dead = self._read_entries(dead_letter_path)[0]
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+    
+    def enqueue(self, manager, worksheet_name, record):
+        """إضافة سجل إلى السجل المحلي والعودة مباشرة"""
+        entry = {
+            'id': uuid.uuid4().hex,
+            'credentials': manager.fingerprint,
+            'spreadsheet_id': manager.spreadsheet_id,
+            'worksheet': worksheet_name,
+            'record': record,
+        }
+        with self._lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as journal:
+                journal.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            self._pending.append(entry)
+        self._wakeup.set()
+    
+    def pending_count(self):
+        """عدد السجلات التي لم تُحفظ بعد في Google Sheets"""
+        with self._lock:
+            return len(self._pending)
+    
+    def dead_letters(self):
+        """السجلات التي رفضها Sheets نهائياً مع سبب الرفض، الأقدم أولاً"""
+        with self._lock:
+            return list(self._dead)
+    
+    @staticmethod
+    def _read_entries(path):
+        """(السجلات، هل وُجد سطر تالف) من ملف JSON Lines؛ الأسطر التالفة تُتجاهل"""
+        entries = []
+        damaged = False
+        if os.path.exists(path):
+            with open(path, encoding='utf-8', errors='replace') as journal:
+                for line in journal:
+                    if not line.strip():
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        damaged = True
+        return entries, damaged
+    
+    def _load_journal(self):
+        """قراءة السجل المحلي مع تجاهل الأسطر التالفة (سطر أخير مبتور بعد توقف مفاجئ)"""
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        entries, damaged = self._read_entries(self.journal_path)
+        if damaged:
+            self._pending = entries
+            self._rewrite_journal()
+        return entries
+    
+    def _rewrite_journal(self):
+        temp_path = self.journal_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as journal:
+            for entry in self._pending:
+                journal.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, self.journal_path)
+    
+    def _run(self):
+        attempt = 0
+        while True:
+            # السجلات المتبقية من تشغيل سابق تنتظر اتصال جلسة بنفس الجدول
+            self._wakeup.wait(WRITE_RETRY_MAX if self.pending_count() else None)
+            time.sleep(WRITE_FLUSH_DELAY)
+            self._wakeup.clear()
+            error = self._flush()
+            if error is None:
+                attempt = 0
+                self.retry_at = None
+                continue
+            attempt += 1
+            if is_retryable_error(error):
+                delay = min(WRITE_RETRY_MAX, WRITE_RETRY_BASE * 2 ** attempt)
+                delay = random.uniform(delay / 2, delay)
+            else:
+                delay = WRITE_RETRY_MAX
+            self.retry_at = time.time() + delay
+            time.sleep(delay)
+            self._wakeup.set()
+    
+    def _remove(self, entries):
+        """حذف سجلات أُرسلت من الطابور والسجل المحلي"""
+        done = {entry['id'] for entry in entries}
+        with self._lock:
+            self._pending = [entry for entry in self._pending if entry['id'] not in done]
+            self._rewrite_journal()
+    
+    def _dead_letter(self, entries, error):
+        """نقل سجلات رفضها Sheets نهائياً إلى سجل المرفوضات ثم حذفها من الطابور"""
+        failed_at = datetime.now().isoformat(timespec='seconds')
+        dead = [dict(entry, error=str(error), failed_at=failed_at) for entry in entries]
+        with self._lock:
+            os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as journal:
+                for entry in dead:
+                    journal.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            self._dead.extend(dead)
+        self._remove(entries)
+    
+    def _send(self, manager, worksheet_name, chunk):
+        """إرسال دفعة وحذفها من الطابور؛ الدفعة المرفوضة نهائياً تُرسل سجلاتها فرادى لعزل
+        السجل المرفوض، إلا إذا حُذفت الورقة فتُنقل الدفعة كلها إلى سجل المرفوضات"""
+        self._mark_attempted(manager, worksheet_name, chunk)
+        try:
+            manager.write_rows(worksheet_name, [entry['record'] for entry in chunk])
+        except Exception as e:
+            if not is_permanent_error(e):
+                raise
+            if len(chunk) > 1 and not isinstance(e, gspread.exceptions.WorksheetNotFound):
+                for entry in chunk:
+                    self._send(manager, worksheet_name, [entry])
+            else:
+                self._dead_letter(chunk, e)
+            return
+        self._remove(chunk)
+    
+    def _mark_attempted(self, manager, worksheet_name, entries):
+        """تسجيل محاولة الإرسال مع عدد صفوف الورقة المعروف قبلها، قبل إرسال الطلب"""
+        df, _ = get_sheet_cache().peek(manager.spreadsheet_id, worksheet_name)
+        # صف العناوين + الصفوف المعروفة؛ الصفوف المضافة بعد المحاولة تبدأ بعدها
+        first_row = len(df) + 2 if df is not None and len(df.columns) else 2
+        with self._lock:
+            for entry in entries:
+                entry.setdefault('attempted_from', first_row)
+            self._rewrite_journal()
+    
+    def _drop_written(self, manager, worksheet_name, entries):
+        """بعد محاولة فشلت بنتيجة غير مؤكدة قد تكون الصفوف أُضيفت: حذف السجلات التي يظهر
+        معرّفها (العمود الأول) في صفوف الورقة المضافة منذ المحاولة بدلاً من إضافتها مرة أخرى
+        
+        السجلات دون معرّف لا يمكن التحقق منها فتُعاد كما هي.
+        """
+        attempted = [entry for entry in entries if 'attempted_from' in entry]
+        if not attempted:
+            return entries
+        first_row = min(entry['attempted_from'] for entry in attempted)
+        appended = set(manager.column_values(worksheet_name, first_row))
+        written = [entry for entry in attempted
+                   if str(entry['record'][0]).strip() and str(entry['record'][0]) in appended]
+        if written:
+            self._remove(written)
+        written_ids = {entry['id'] for entry in written}
+        return [entry for entry in entries if entry['id'] not in written_ids]
+    
+    def _flush(self):
+        """إرسال السجلات المعلقة مجمّعة حسب الجدول وورقة العمل، وإرجاع آخر خطأ إن وجد
+        
+        كل دفعة تُحذف من السجل المحلي فور نجاحها، فلا يُعاد عند الفشل إلا ما لم يُرسل.
+        """
+        with self._lock:
+            batches = OrderedDict()
+            for entry in self._pending:
+                # السجلات القديمة دون بصمة تبقى معلقة ولا تُرسل بحساب لم يُتحقق منه
+                key = (entry.get('credentials'), entry['spreadsheet_id'], entry['worksheet'])
+                batches.setdefault(key, []).append(entry)
+        
+        error = None
+        for (fingerprint, spreadsheet_id, worksheet_name), entries in batches.items():
+            manager = get_manager_pool().find(fingerprint, spreadsheet_id)
+            if manager is None:
+                continue
+            try:
+                with request_priority(PRIORITY_BULK):
+                    entries = self._drop_written(manager, worksheet_name, entries)
+                    for start in range(0, len(entries), WRITE_CHUNK_SIZE):
+                        self._send(manager, worksheet_name, entries[start:start + WRITE_CHUNK_SIZE])
+            except Exception as e:
+                error = e
+                self.last_error = f"{worksheet_name}: {e}"
+        if error is None:
+            self.last_error = None
+        return error
+
+@st.cache_resource
+def get_write_queue():
+    """طابور الكتابة المؤجلة المشترك على مستوى العملية"""
+    return WriteBehindQueue()
+
+def submit_record(sheet_name, record):
+    """إرسال سجل جديد إلى طابور الكتابة المؤجلة إذا كانت الجلسة متصلة، وإلا عرض خطأ وإرجاع False"""
+    gs_manager = st.session_state.get('gs_manager')
+    if gs_manager is None:
+        st.error("لم يُحفظ السجل: اتصل بـ Google Sheets أولاً من الشريط الجانبي")
+        return False
+    get_write_queue().enqueue(gs_manager, sheet_name, record)
+    return True
+
+def display_write_status():
+    """مؤشر السجلات المعلقة في الشريط الجانبي"""
+    write_queue = get_write_queue()
+    pending = write_queue.pending_count()
+    if pending:
+        st.sidebar.info(f"⏳ سجلات بانتظار الحفظ: {pending}")
+        if write_queue.last_error:
+            st.sidebar.warning(f"ستتم إعادة المحاولة: {write_queue.last_error}")
+    else:
+        st.sidebar.caption("✅ تم حفظ جميع السجلات")
+    dead = write_queue.dead_letters()
+    if dead:
+        st.sidebar.error(f"❌ سجلات رفضها Google Sheets ولن تُعاد محاولتها: {len(dead)}")
+        with st.sidebar.expander("تفاصيل السجلات المرفوضة"):
+            for entry in dead[-WRITE_DEAD_LETTER_SHOWN:]:
+                record_id = entry['record'][0] if entry['record'] else ''
+                st.caption(f"{entry['failed_at']} · {entry['worksheet']} · {record_id}: {entry['error']}")
+            st.caption(f"السجلات محفوظة في {write_queue.dead_letter_path}")
+
+def request_session_rerun(session_id):
+    """طلب إعادة تشغيل جلسة متصفح من خيط خلفي: True عند النجاح، وFalse إذا أُغلقت الجلسة،
+    وNone إذا تعذر الوصول إلى واجهات Streamlit الداخلية (_session_mgr و_event_loop)
+    
+    هذه الواجهات غير موثقة وقد تتغير مع ترقية Streamlit؛ عندها يتوقف التحديث التلقائي
+    بدلاً من أن يتعطل الخيط الخلفي.
+    """
+    try:
+        if not runtime.exists():
+            return False
+        session_info = runtime.get_instance()._session_mgr.get_active_session_info(session_id)
+        if session_info is None:
             return False
+        session = session_info.session
+        session._event_loop.call_soon_threadsafe(session.request_rerun, None)
+    except RuntimeError:
+        # حلقة الأحداث أُغلقت مع الجلسة
+        return False
+    except Exception:
+        return None
+    return True
+
+# مستطلع مشترك للتحديث التلقائي
+class DataPoller:
+    """خيط واحد لكل عملية يجلب تغييرات كل جدول مرة واحدة ويعيد تشغيل الجلسات التي تغيّرت بياناتها فقط
+    
+    تُجلب فقط الأوراق التي تعرضها الجلسات المشتركة (أوراق القسم الظاهر في كل منها)، وتُعاد
+    الجلسة فقط إذا تغيّرت نسخ أوراقها. إذا تعذر طلب إعادة التشغيل من Streamlit يُعطّل
+    المستطلع (disabled يحمل السبب) بدلاً من أن يتعطل خيطه.
+    """
+    def __init__(self):
+        self.disabled = None
+        self.last_error = None
+        self._subscribers = {}
+        self._last_poll = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="data-poller", daemon=True)
+        self._thread.start()
+    
+    def subscribe(self, session_id, manager, interval, sheet_names, seen_version):
+        """اشتراك جلسة في التحديث التلقائي لأوراقها مع نسخ الأوراق التي عرضتها (sheet_versions)"""
+        with self._lock:
+            if self.disabled is not None:
+                return
+            self._subscribers[session_id] = {
+                'manager': manager,
+                'interval': interval,
+                'sheet_names': list(sheet_names),
+                'seen_version': seen_version,
+            }
+    
+    def unsubscribe(self, session_id):
+        with self._lock:
+            self._subscribers.pop(session_id, None)
+    
+    def _disable(self, reason):
+        with self._lock:
+            self.disabled = reason
+            self._subscribers.clear()
+    
+    def _run(self):
+        while self.disabled is None:
+            time.sleep(POLLER_TICK)
+            try:
+                self._poll()
+            except Exception as e:
+                # خطأ غير متوقع لا يوقف الخيط؛ الجولة التالية تعيد المحاولة
+                self.last_error = str(e)
+    
+    def _poll(self):
+        with self._lock:
+            subscribers = dict(self._subscribers)
+        
+        # جدول واحد = جلب واحد لاتحاد أوراق جلساته مهما كان عدد الجلسات المشتركة
+        spreadsheets = {}
+        for session_id, sub in subscribers.items():
+            spreadsheet_id = sub['manager'].spreadsheet_id
+            manager, interval, names = spreadsheets.get(spreadsheet_id, (sub['manager'], sub['interval'], set()))
+            spreadsheets[spreadsheet_id] = (manager, min(interval, sub['interval']), names | set(sub['sheet_names']))
+        
+        cache = get_sheet_cache()
+        for spreadsheet_id, (manager, interval, names) in spreadsheets.items():
+            if time.time() - self._last_poll.get(spreadsheet_id, 0) < interval:
+                continue
+            self._last_poll[spreadsheet_id] = time.time()
+            try:
+                with request_priority(PRIORITY_BACKGROUND):
+                    manager.get_worksheets_data([name for name in SHEET_NAMES if name in names], interval)
+            except Exception:
+                continue
+            for session_id, sub in subscribers.items():
+                if sub['manager'].spreadsheet_id != spreadsheet_id:
+                    continue
+                version = cache.sheet_versions(spreadsheet_id, sub['sheet_names'])
+                if sub['seen_version'] == version:
+                    continue
+                rerun = request_session_rerun(session_id)
+                if rerun is None:
+                    self._disable("تعذر طلب إعادة تشغيل الجلسات من هذا الإصدار من Streamlit")
+                    return
+                if rerun:
+                    sub['seen_version'] = version
+                else:
+                    self.unsubscribe(session_id)
+
+@st.cache_resource
+def get_data_poller():
+    """المستطلع المشترك على مستوى العملية"""
+    return DataPoller()
+
+# تحميل البيانات من Google Sheets أو البيانات التجريبية
+def load_data(offline=False, sheet_names=SHEET_NAMES):
+    """تحميل بيانات الجدول المتصل في الجلسة (من مستوى البيانات المشترك إن فُعّل ونشر نفس
+    الجدول، وإلا من Google Sheets)، أو البيانات التجريبية للجلسات غير المتصلة
+    
+    تُرجع {الورقة: البيانات} للأوراق المطلوبة مع معرّف نسخة البيانات الذي تُربط به
+    الحسابات المخزنة مؤقتاً. باقي أوراق الجدول المتصل تُحمّل في الخلفية.
+    """
+    gs_manager = st.session_state.get('gs_manager')
+    plane = None
+    if DATA_PLANE_DIR and gs_manager is not None and not offline:
+        plane = load_data_plane(gs_manager.spreadsheet_id)
+    if offline:
+        # الجدول الذي أثبتت الجلسة ملف اعتماده: الاتصال الحالي أو آخر ملف اعتماد رُفع
+        if gs_manager is not None:
+            frames, data_version = load_snapshot_data(gs_manager.spreadsheet_id, gs_manager.fingerprint)
+        else:
+            frames, data_version = load_snapshot_data(*st.session_state.get('offline_credentials', ()))
+    elif gs_manager is None:
+        frames, data_version = dict(zip(SHEET_NAMES, load_sample_data())), "sample"
+    elif plane is not None:
+        frames, data_version = plane
+    else:
+        restore_snapshot(gs_manager)
+        frames = gs_manager.get_worksheets_data(sheet_names)
+        gs_manager.prefetch([name for name in SHEET_NAMES if name not in sheet_names])
+        # نسخة الأوراق المطلوبة فقط: تحميل أوراق الأقسام الأخرى لا يبطل حسابات القسم الظاهر
+        data_version = f"{gs_manager.spreadsheet_id}:{get_sheet_cache().sheet_versions(gs_manager.spreadsheet_id, sheet_names)}"
+    return {name: frames[name] for name in sheet_names}, data_version
+
+# إعداد البيانات التجريبية
+@st.cache_data
+def load_sample_data():
+    """تحميل بيانات تجريبية للعرض"""
+    customers_data = {
+        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
+        'اسم العميل': ['أحمد محمد', 'فاطمة أحمد', 'خالد علي', 'مريم سعد', 'عمر حسن'],
+        'رقم الهاتف': ['01234567890', '01123456789', '01012345678', '01234567891', '01123456780'],
+        'البريد الإلكتروني': ['ahmed@email.com', 'fatima@email.com', 'khaled@email.com', 'mariam@email.com', 'omar@email.com'],
+        'المدينة': ['القاهرة', 'الإسكندرية', 'الجيزة', 'المنصورة', 'أسوان'],
+        'تاريخ التسجيل': ['2024-01-15', '2024-01-20', '2024-01-25', '2024-02-01', '2024-02-05']
+    }
+    
+    call_center_data = {
+        'رقم المكالمة': ['CC001', 'CC002', 'CC003', 'CC004', 'CC005'],
+        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
+        'نوع المكالمة': ['استفسار', 'شكوى', 'طلب خدمة', 'متابعة', 'إلغاء'],
+        'الموظف المسؤول': ['سارة أحمد', 'محمد علي', 'نورا حسن', 'أحمد محمود', 'ليلى عبدالله'],
+        'تاريخ المكالمة': ['2024-07-10', '2024-07-11', '2024-07-11', '2024-07-12', '2024-07-12'],
+        'وقت المكالمة': ['10:30', '14:15', '16:20', '09:45', '11:30'],
+        'مدة المكالمة (دقيقة)': [15, 25, 8, 12, 18],
+        'الحالة': ['مكتمل', 'قيد المعالجة', 'مكتمل', 'مكتمل', 'قيد المعالجة']
+    }
+    
+    complaints_data = {
+        'رقم الشكوى': ['S001', 'S002', 'S003', 'S004', 'S005'],
+        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
+        'نوع الشكوى': ['تأخير في التسليم', 'جودة المنتج', 'خدمة العملاء', 'فواتير', 'تقني'],
+        'الوصف': ['تأخير في تسليم الطلب لمدة 3 أيام', 'المنتج لا يطابق المواصفات', 'سوء معاملة من فريق الدعم', 'خطأ في الفاتورة', 'مشكلة في التطبيق'],
+        'الأولوية': ['متوسط', 'عالي', 'منخفض', 'متوسط', 'عالي'],
+        'تاريخ الشكوى': ['2024-07-08', '2024-07-09', '2024-07-10', '2024-07-11', '2024-07-12'],
+        'الحالة': ['قيد المعالجة', 'تم الحل', 'جديد', 'قيد المعالجة', 'تم الحل'],
+        'الموظف المسؤول': ['أحمد سعد', 'مها محمد', 'كريم علي', 'دينا أحمد', 'حسام محمود']
+    }
+    
+    pickup_data = {
+        'رقم البيك أب': ['P001', 'P002', 'P003', 'P004', 'P005'],
+        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
+        'العنوان': ['شارع النيل، المعادي', 'شارع الجمهورية، وسط البلد', 'شارع الهرم، الجيزة', 'شارع الجلاء، المنصورة', 'شارع النيل، أسوان'],
+        'تاريخ البيك أب': ['2024-07-13', '2024-07-13', '2024-07-14', '2024-07-14', '2024-07-15'],
+        'الوقت المطلوب': ['10:00-12:00', '14:00-16:00', '09:00-11:00', '16:00-18:00', '11:00-13:00'],
+        'نوع الخدمة': ['استلام', 'تسليم', 'استلام وتسليم', 'استلام', 'تسليم'],
+        'السائق': ['محمد أحمد', 'أحمد محمود', 'سامي علي', 'عمر حسن', 'خالد سعد'],
+        'الحالة': ['مجدول', 'في الطريق', 'مكتمل', 'مجدول', 'في الطريق']
+    }
+    
+    return tuple(
+        apply_schema(pd.DataFrame(data), name)
+        for name, data in zip(SHEET_NAMES, [customers_data, call_center_data, complaints_data, pickup_data])
+    )
+
+def observed_counts(values):
+    """أعداد القيم الموجودة فعلاً (value_counts للأعمدة الفئوية تُرجع الفئات الفارغة أيضاً)"""
+    counts = values.value_counts()
+    return counts[counts > 0].to_dict()
+
+# الإحصائيات المجمّعة المحسوبة مسبقاً
+@tracked_cache("aggregates", st.cache_data(max_entries=64, show_spinner=False))
+def get_aggregates(data_version, sheet_name, _df):
+    """حساب أعداد القيم لكل ورقة مرة واحدة لكل نسخة بيانات"""
+    date_cols = [col for col in _df.columns if 'تاريخ' in col]
+    date_col = date_cols[0] if date_cols else None
+    date_counts = {}
+    if date_col:
+        dates = _df[date_col]
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            per_day = dates.dt.normalize().value_counts()
+            date_counts = dict(zip(per_day.index.strftime(DATE_FORMAT), per_day.tolist()))
+        else:
+            date_counts = dates.astype(str).value_counts().to_dict()
+    return {
+        'total': len(_df),
+        'counts': {col: observed_counts(_df[col])
+                   for col in AGGREGATE_COLUMNS if col in _df.columns},
+        'date_column': date_col,
+        'date_counts': date_counts,
+    }
+
+# محرك الفلترة المفهرس
+class FilterIndex:
+    """فهرس مواقع الصفوف لكل قيمة في أعمدة الفلترة، يجيب على الفلاتر المتعددة بتقاطع المواقع"""
+    def __init__(self, df, columns):
+        df = df.copy(deep=False)
+        self.positions = {}
+        self.options = {}
+        self._empty = np.array([], dtype=np.intp)
+        for col in columns:
+            if col not in df.columns:
+                continue
+            if df[col].nunique() <= CATEGORICAL_MAX_RATIO * len(df):
+                df[col] = df[col].astype('category')
+            categorical = pd.Categorical(df[col])
+            # ترتيب مستقر حسب رمز الفئة: مواقع كل قيمة تبقى تصاعدية
+            order = np.argsort(categorical.codes, kind='stable')
+            bounds = np.searchsorted(categorical.codes[order],
+                                     np.arange(len(categorical.categories) + 1))
+            self.positions[col] = {
+                value: order[bounds[i]:bounds[i + 1]]
+                for i, value in enumerate(categorical.categories)
+            }
+            self.options[col] = [ALL_OPTION] + list(pd.unique(df[col].dropna()))
+        self.df = df
+        self._sort_orders = {}
+    
+    @timed('filter')
+    def select(self, filters, within=None):
+        """مواقع الصفوف المطابقة للفلاتر {العمود: القيمة}؛ None تعني كل الصفوف
+        
+        within: مواقع صفوف إضافية (مثل نتائج البحث) يُقاطع معها الناتج.
+        """
+        positions = within
+        for col, value in filters.items():
+            if value == ALL_OPTION:
+                continue
+            rows = self.positions[col].get(value, self._empty)
+            positions = rows if positions is None else intersect_sorted(positions, rows)
+        return positions
+    
+    def query(self, filters, within=None):
+        """تطبيق الفلاتر {العمود: القيمة}؛ القيمة "الكل" تعني بدون فلترة"""
+        positions = self.select(filters, within)
+        if positions is None:
+            return self.df
+        return self.df.take(positions)
+    
+    def sort_order(self, column):
+        """ترتيب كل الصفوف حسب عمود ورتبة كل صف فيه، يُحسبان مرة واحدة لكل نسخة بيانات"""
+        cached = self._sort_orders.get(column)
+        if cached is None:
+            values = self.df[column].reset_index(drop=True)
+            try:
+                order = values.sort_values(kind='stable', na_position='last').index.to_numpy()
+            except TypeError:
+                # أعمدة بأنواع مختلطة (أرقام ونصوص) تُرتب كنصوص
+                order = values.astype(str).sort_values(kind='stable').index.to_numpy()
+            rank = np.empty(len(order), dtype=np.intp)
+            rank[order] = np.arange(len(order))
+            cached = self._sort_orders[column] = (order, rank)
+        return cached
+
+@tracked_cache("filter_index", st.cache_resource(max_entries=16, show_spinner=False))
+def get_filter_index(data_version, sheet_name, _df):
+    """بناء فهرس الفلترة مرة واحدة لكل نسخة بيانات"""
+    return FilterIndex(_df, FILTER_COLUMNS.get(sheet_name, []))
+
+# توحيد الكتابة العربية للبحث (التشكيل والتطويل يُحذفان)
+ARABIC_NORMALIZATION = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه', 'ى': 'ي', 'ؤ': 'و', 'ئ': 'ي',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+    **{chr(code): None for code in [*range(0x064B, 0x0653), 0x0670, 0x0640]},
+})
+
+def normalize_arabic(text):
+    """إزالة التشكيل والتطويل وتوحيد أشكال الهمزة والتاء المربوطة والألف المقصورة"""
+    return str(text).translate(ARABIC_NORMALIZATION).lower().strip()
+
+def _normalization_table(size=0x700):
+    # جدول يقابل normalize_arabic لكل نقطة ترميز حتى نهاية النطاق العربي (صفر = حذف)
+    table = np.arange(size, dtype=np.int64)
+    for code in range(size):
+        mapped = chr(code).translate(ARABIC_NORMALIZATION).lower()
+        table[code] = ord(mapped) if len(mapped) == 1 else (0 if not mapped else code)
+    return table
+
+NORMALIZATION_TABLE = _normalization_table()
+
+def normalize_codes(codes):
+    """تطبيق normalize_arabic على مصفوفة نقاط ترميز (صف لكل نص) مع إزاحة المحذوف إلى النهاية"""
+    in_table = codes < len(NORMALIZATION_TABLE)
+    codes = np.where(in_table, NORMALIZATION_TABLE[np.where(in_table, codes, 0)], codes)
+    deleted = codes == 0
+    if deleted.any():
+        codes = np.take_along_axis(codes, np.argsort(deleted, axis=1, kind='stable'), axis=1)
+    return codes
+
+def intersect_sorted(a, b):
+    """تقاطع مصفوفتين مرتبتين دون تكرار بالبحث الثنائي (أسرع من intersect1d للمصفوفات الكبيرة)"""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    found = np.searchsorted(b, a)
+    found[found == len(b)] = 0
+    return a[b[found] == a]
+
+def text_code(text):
+    """ترميز نص من حرف إلى ثلاثة أحرف كعدد صحيح (21 بت لكل حرف)"""
+    code = 0
+    for char in text:
+        code = (code << 21) | ord(char)
+    return code
+
+def _extend_postings(postings, terms, rows):
+    # rows تصاعدية، فالترتيب المستقر حسب المصطلح يُبقي مواقع كل مصطلح مرتبة
+    order = np.argsort(terms, kind='stable')
+    terms, rows = terms[order], rows[order].astype(np.int32)
+    keep = np.ones(len(terms), dtype=bool)
+    keep[1:] = (terms[1:] != terms[:-1]) | (rows[1:] != rows[:-1])
+    terms, rows = terms[keep], rows[keep]
+    bounds = np.concatenate([[0], np.flatnonzero(terms[1:] != terms[:-1]) + 1, [len(terms)]])
+    for begin, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        postings.setdefault(int(terms[begin]), array('i')).frombytes(rows[begin:end].tobytes())
+
+# فهرس البحث في العملاء
+class CustomerSearchIndex:
+    """فهرس ثلاثيات حروف (trigrams) للبحث الجزئي وفهرس بادئات للكلمات، على الاسم والهاتف ورقم العميل
+    
+    النصوص تُحوّل إلى مصفوفة نقاط ترميز (صف لكل عميل) فتُحسب الثلاثيات والبادئات
+    كأعداد صحيحة بعمليات numpy دون حلقة لكل صف.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self):
+        self.keys = []
+        self.ids = []
+        self.version = None
+        self._columns = None
+        self._grams = {}
+        self._prefixes = {}
+    
+    def sync(self, df, data_version=None):
+        """تحديث الفهرس مرة واحدة لكل نسخة بيانات: إضافة العملاء الجدد وإعادة فهرسة الصفوف
+        المعدلة في مكانها، أو إعادة البناء إذا تغيّرت الصفوف المفهرسة
+        
+        الإطار الأقصر من الفهرس (جلسة بنسخة أقدم) لا يغيّره؛ تمرر الجلسة طوله إلى search.
+        """
+        if SEARCH_ID_COLUMN not in df.columns:
+            return
+        columns = [col for col in SEARCH_COLUMNS if col in df.columns]
+        with self._lock:
+            if data_version is not None and data_version == self.version:
+                return
+            plan = sync_plan(self.ids, df[SEARCH_ID_COLUMN])
+            if plan == 'keep' and len(df) < len(self.ids):
+                return
+            if plan == 'rebuild' or (self._columns is not None and list(self._columns.columns) != columns):
+                self._reset()
+            size = len(self.keys)
+            if size:
+                changed = changed_positions(self._columns, df[columns].iloc[:size])
+                if len(changed) > SEARCH_INDEX_CHUNK:
+                    self._reset()
+                    size = 0
+                elif len(changed):
+                    self._patch(self._columns.iloc[changed], df[columns].iloc[changed], changed)
+                    for position, value in zip(changed.tolist(), row_ids(df[SEARCH_ID_COLUMN].iloc[changed])):
+                        self.ids[position] = value
+            for chunk_start in range(size, len(df), SEARCH_INDEX_CHUNK):
+                rows = df.iloc[chunk_start:chunk_start + SEARCH_INDEX_CHUNK]
+                self.keys.extend(self._add(rows, np.arange(chunk_start, chunk_start + len(rows)),
+                                           self._grams, self._prefixes))
+            self.ids.extend(row_ids(df[SEARCH_ID_COLUMN].iloc[size:]))
+            self._columns = df[columns].copy(deep=False)
+            self.version = data_version
+    
+    def _patch(self, old_rows, new_rows, positions):
+        """إزالة مصطلحات الصفوف المعدلة القديمة من قوائم المواقع وإدراج الجديدة بترتيبها"""
+        for rows, remove in ((old_rows, True), (new_rows, False)):
+            grams, prefixes = {}, {}
+            keys = self._add(rows, positions, grams, prefixes)
+            for target, terms in ((self._grams, grams), (self._prefixes, prefixes)):
+                for term, rows_of_term in terms.items():
+                    postings = target.setdefault(term, array('i'))
+                    for position in rows_of_term:
+                        index = bisect.bisect_left(postings, position)
+                        if not remove:
+                            postings.insert(index, position)
+                        elif index < len(postings) and postings[index] == position:
+                            del postings[index]
+                    if not postings:
+                        del target[term]
+        for position, key in zip(positions.tolist(), keys):
+            self.keys[position] = key
+    
+    def _add(self, rows, positions, grams_postings, prefix_postings):
+        """فهرسة الصفوف في مواقعها positions وإرجاع نصوصها الموحدة"""
+        columns = [col for col in SEARCH_COLUMNS if col in rows.columns]
+        keys = rows[columns[0]].fillna('').astype(str)
+        for col in columns[1:]:
+            keys = keys + "\x1f" + rows[col].fillna('').astype(str)
+        chars = np.array(keys.tolist(), dtype=str)
+        width = max(chars.dtype.itemsize // 4, 1)
+        codes = normalize_codes(chars.view(np.uint32).reshape(len(chars), width).astype(np.int64))
+        normalized = codes.astype(np.uint32).view(f'<U{width}').ravel().tolist()
+        positions = np.asarray(positions)
+        if width < 3:
+            return normalized
+        
+        # ثلاثيات الحروف لكل موضع في النص (الخانات الفارغة قيمتها صفر)
+        grams = (codes[:, :-2] << 42) | (codes[:, 1:-1] << 21) | codes[:, 2:]
+        valid = codes[:, 2:] != 0
+        gram_rows = np.broadcast_to(positions[:, None], grams.shape)
+        _extend_postings(grams_postings, grams[valid], gram_rows[valid])
+        
+        # بادئات الكلمات (حرف وحرفان) للبحث القصير
+        separator = (codes == 0) | (codes == ord(' ')) | (codes == 0x1f)
+        starts = ~separator
+        starts[:, 1:] &= separator[:, :-1]
+        first = codes[starts]
+        second = np.zeros_like(codes)
+        second[:, :-1] = np.where(separator[:, 1:], 0, codes[:, 1:])
+        second = second[starts]
+        prefix_rows = np.broadcast_to(positions[:, None], codes.shape)[starts]
+        has_second = second != 0
+        _extend_postings(prefix_postings, first, prefix_rows)
+        _extend_postings(prefix_postings, (first[has_second] << 21) | second[has_second],
+                         prefix_rows[has_second])
+        return normalized
+    
+    @timed('search')
+    def search(self, term, rows=None):
+        """مواقع الصفوف المطابقة: بحث جزئي لثلاثة أحرف فأكثر، وبحث بادئة للأقصر
+        
+        rows: طول إطار الجلسة؛ الصفوف التي فهرستها جلسة بنسخة أحدث تُستبعد.
+        """
+        result = self._search(term)
+        return result if rows is None else result[result < rows]
+    
+    def _search(self, term):
+        query = normalize_arabic(term)
+        empty = np.array([], dtype=np.intp)
+        with self._lock:
+            if not query:
+                return empty
+            if len(query) < 3:
+                postings = self._prefixes.get(text_code(query))
+                return np.frombuffer(postings, dtype=np.int32).astype(np.intp) if postings else empty
+            grams = [self._grams.get(text_code(query[i:i + 3])) for i in range(len(query) - 2)]
+            if not all(grams):
+                return empty
+            grams.sort(key=len)
+            candidates = np.frombuffer(grams[0], dtype=np.int32)
+            for postings in grams[1:]:
+                candidates = intersect_sorted(candidates, np.frombuffer(postings, dtype=np.int32))
+            if len(query) > 3:
+                keys = self.keys
+                candidates = [p for p in candidates.tolist() if query in keys[p]]
+            return np.asarray(candidates, dtype=np.intp)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_search_index(data_source):
+    """فهرس بحث واحد لكل مصدر بيانات، يُحدَّث تزايدياً مع كل مزامنة"""
+    return CustomerSearchIndex()
+
+def data_source(data_version):
+    """مصدر البيانات من معرّف النسخة (دون رقم النسخة)"""
+    return data_version.rsplit(':', 1)[0]
+
+def row_id(values, position):
+    """معرّف الصف في الموقع للتحقق من آخر صف مفهرس؛ القيمة الفارغة (NaN أو NA) تصبح None"""
+    value = values.iloc[position]
+    return None if pd.isna(value) else value
+
+def row_ids(values):
+    """معرّفات الصفوف كقائمة (الفارغة None) ليُتحقق منها عند مزامنة إطار بطول مختلف"""
+    return [None if pd.isna(value) else value for value in values.tolist()]
+
+def sync_plan(ids, values):
+    """خطوة المزامنة لفهرس مشترك بين الجلسات: 'keep' أو 'append' أو 'rebuild'
+    
+    ids معرّفات الصفوف المفهرسة وvalues عمود المعرّف في إطار الجلسة. الإطار الأقصر المتسق مع
+    الصفوف المفهرسة (جلسة بنسخة أقدم) لا يغيّر الفهرس وتُقص نتائجه بطوله، فلا تتناوب
+    الجلسات ذات النسخ المختلفة على إعادة البناء؛ يُعاد البناء فقط إذا اختلف الصف المشترك الأخير.
+    """
+    shared = min(len(ids), len(values))
+    if shared and ids[shared - 1] != row_id(values, shared - 1):
+        return 'rebuild'
+    return 'append' if len(values) > len(ids) else 'keep'
+
+def customer_keys(ids):
+    """توحيد أرقام العملاء كنصوص (الأرقام المقروءة كأعداد عشرية تفقد .0)"""
+    return ids.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+
+# فهرس الربط بين الأوراق حسب رقم العميل
+class CustomerJoinIndex:
+    """خريطة من رقم العميل إلى مواقع صفوفه في كل ورقة، تُحدَّث تزايدياً مع كل مزامنة
+    
+    كل رقم عميل يأخذ رمزاً صحيحاً مشتركاً بين الأوراق، ويُحفظ رمز كل صف
+    فتُحسب أعداد السجلات لكل عميل بـ bincount دون دمج الإطارات.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = {}
+        self._sheets = {}
+    
+    def _reset_sheet(self, sheet_name):
+        self._sheets[sheet_name] = {
+            'row_codes': array('i'),
+            'positions': {},
+            'ids': [],
+            'column': None,
+            'version': None,
+        }
+        return self._sheets[sheet_name]
+    
+    def sync(self, frames, data_version=None):
+        """تحديث الفهرس مرة واحدة لكل نسخة بيانات: إضافة الصفوف الجديدة في كل ورقة ونقل الصفوف
+        التي تغيّر رقم عميلها في مكانها، أو إعادة بناء الورقة إذا تغيّرت صفوفها المفهرسة
+        
+        الورقة الأقصر من المفهرس (جلسة بنسخة أقدم) لا تغيّره؛ تمرر الجلسة إطاراتها إلى lookup
+        وأطوالها إلى counts لتُقص النتائج.
+        """
+        with self._lock:
+            for sheet_name, df in frames.items():
+                if JOIN_COLUMN not in df.columns:
+                    continue
+                sheet = self._sheets.get(sheet_name) or self._reset_sheet(sheet_name)
+                if data_version is not None and data_version == sheet['version']:
+                    continue
+                plan = sync_plan(sheet['ids'], df[JOIN_COLUMN])
+                if plan == 'keep' and len(df) < len(sheet['ids']):
+                    continue
+                if plan == 'rebuild':
+                    sheet = self._reset_sheet(sheet_name)
+                size = len(sheet['row_codes'])
+                if size:
+                    changed = changed_positions(sheet['column'], df[[JOIN_COLUMN]].iloc[:size])
+                    if len(changed):
+                        self._move(sheet, df[JOIN_COLUMN].iloc[changed], changed)
+                self._add(sheet, df[JOIN_COLUMN].iloc[size:], size)
+                sheet['ids'].extend(row_ids(df[JOIN_COLUMN].iloc[size:]))
+                sheet['column'] = df[[JOIN_COLUMN]].copy(deep=False)
+                sheet['version'] = data_version
+    
+    def _shared_codes(self, ids):
+        """الرمز المشترك لكل رقم عميل (-1 للرقم الفارغ)، مع إضافة الأرقام الجديدة إلى القاموس"""
+        local_codes, uniques = pd.factorize(customer_keys(ids).where(ids.notna()))
+        # الرمز المحلي -1 (رقم عميل فارغ) يقع على العنصر الأخير -1
+        shared = np.array([self._codes.setdefault(key, len(self._codes)) for key in uniques] + [-1],
+                          dtype=np.int32)
+        return shared[local_codes]
+    
+    def _move(self, sheet, ids, changed):
+        """نقل مواقع الصفوف المعدلة من قوائم أرقامها القديمة إلى قوائم أرقامها الجديدة بترتيبها"""
+        row_codes, positions = sheet['row_codes'], sheet['positions']
+        for position, code in zip(changed.tolist(), self._shared_codes(ids).tolist()):
+            old = row_codes[position]
+            if old == code:
+                continue
+            if old >= 0:
+                postings = positions[old]
+                del postings[bisect.bisect_left(postings, position)]
+                if not postings:
+                    del positions[old]
+            if code >= 0:
+                postings = positions.setdefault(code, array('i'))
+                postings.insert(bisect.bisect_left(postings, position), position)
+            row_codes[position] = code
+        for position, value in zip(changed.tolist(), row_ids(ids)):
+            sheet['ids'][position] = value
+    
+    def _add(self, sheet, ids, start):
+        if ids.empty:
+            return
+        row_codes = self._shared_codes(ids)
+        sheet['row_codes'].frombytes(row_codes.tobytes())
+        
+        valid = row_codes >= 0
+        codes, rows = row_codes[valid], np.arange(start, start + len(ids), dtype=np.int32)[valid]
+        order = np.argsort(codes, kind='stable')
+        codes, rows = codes[order], rows[order]
+        bounds = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1, [len(codes)]])
+        positions = sheet['positions']
+        for begin, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            positions.setdefault(int(codes[begin]), array('i')).frombytes(rows[begin:end].tobytes())
+    
+    def lookup(self, customer_id, frames=None):
+        """مواقع صفوف العميل في كل ورقة {الورقة: مصفوفة مواقع}، مقصوصة بأطوال frames إن مُررت"""
+        empty = np.array([], dtype=np.intp)
+        with self._lock:
+            code = self._codes.get(customer_keys(pd.Series([customer_id])).iloc[0])
+            result = {}
+            for sheet_name, sheet in self._sheets.items():
+                postings = sheet['positions'].get(code) if code is not None else None
+                positions = np.frombuffer(postings, dtype=np.int32).astype(np.intp) if postings else empty
+                if frames is not None and sheet_name in frames:
+                    positions = positions[positions < len(frames[sheet_name])]
+                result[sheet_name] = positions
+            return result
+    
+    def counts(self, sheet_name, weights=None, rows=None):
+        """عدد صفوف (أو مجموع أوزان) كل رمز عميل في أول rows صف من ورقة (كل الصفوف إن لم يُمرر)"""
+        with self._lock:
+            sheet = self._sheets.get(sheet_name)
+            row_codes = np.frombuffer(sheet['row_codes'], dtype=np.int32) if sheet else np.array([], dtype=np.int32)
+            n_codes = len(self._codes)
+        if rows is not None:
+            row_codes = row_codes[:rows]
+        valid = row_codes >= 0
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[:len(row_codes)][valid]
+        return np.bincount(row_codes[valid], weights=weights, minlength=n_codes)
+    
+    def merged_frame(self, frames):
+        """إطار العملاء مع أعداد مكالماتهم وشكاواهم وطلبات البيك أب (محسوب بـ bincount)"""
+        customers = frames["العملاء"]
+        merged = customers.copy(deep=False)
+        with self._lock:
+            sheet = self._sheets.get("العملاء")
+            customer_codes = (np.frombuffer(sheet['row_codes'], dtype=np.int32)[:len(customers)]
+                              if sheet else np.full(len(customers), -1, dtype=np.int32))
+        known = customer_codes >= 0
+        
+        def per_customer(values):
+            values = np.asarray(values)
+            padded = np.zeros(len(self._codes) + 1, dtype=values.dtype)
+            padded[:len(values)] = values
+            return np.where(known, padded[np.where(known, customer_codes, -1)], 0)
+        
+        calls = frames["الكول سنتر"]
+        complaints = frames["الشكاوى"]
+        pickups = frames["البيك أب"]
+        merged['عدد المكالمات'] = per_customer(self.counts("الكول سنتر", rows=len(calls)))
+        if 'مدة المكالمة (دقيقة)' in calls.columns:
+            durations = pd.to_numeric(calls['مدة المكالمة (دقيقة)'], errors='coerce').fillna(0)
+            merged['إجمالي مدة المكالمات'] = per_customer(self.counts("الكول سنتر", durations, len(calls)))
+        merged['عدد الشكاوى'] = per_customer(self.counts("الشكاوى", rows=len(complaints)))
+        if 'الحالة' in complaints.columns:
+            open_complaints = complaints['الحالة'].isin(OPEN_COMPLAINT_STATUSES)
+            merged['الشكاوى المفتوحة'] = per_customer(
+                self.counts("الشكاوى", open_complaints, len(complaints))).astype(int)
+        merged['عدد البيك أب'] = per_customer(self.counts("البيك أب", rows=len(pickups)))
+        return merged
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_join_index(data_source):
+    """فهرس ربط واحد لكل مصدر بيانات، يُحدَّث تزايدياً مع كل مزامنة"""
+    return CustomerJoinIndex()
+
+@tracked_cache("customer_report", st.cache_resource(max_entries=4, show_spinner=False))
+def get_customer_report(data_version, _join_index, _frames):
+    """إطار تقرير العملاء المدمج مرة واحدة لكل نسخة بيانات"""
+    return _join_index.merged_frame(_frames)
+
+def local_seconds(moment=None):
+    """الوقت المحلي بالثواني منذ 1970 بنفس تمثيل التواريخ المقروءة من الجدول (دون منطقة زمنية)"""
+    return int(np.datetime64(moment or datetime.now(), 's').astype(np.int64))
+
+def clock_minutes(values):
+    """دقائق أول وقت HH:MM في كل قيمة (صفر إذا لم يوجد)؛ الأعمدة الفئوية تُحلَّل فئاتها فقط"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        minutes = clock_minutes(pd.Series(values.cat.categories.astype(str)))
+        # الرمز -1 (قيمة فارغة) يقع على العنصر الأخير
+        return np.append(minutes, 0)[values.cat.codes.to_numpy()]
+    clock = values.astype(str).str.extract(r'(\d{1,2}):(\d{2})')
+    minutes = pd.to_numeric(clock[0]).fillna(0) * 60 + pd.to_numeric(clock[1]).fillna(0)
+    return minutes.to_numpy(dtype=np.int64)
+
+def event_seconds(df, config):
+    """وقت كل صف بالثواني (التاريخ مع الوقت إن وُجد)، و-1 للصفوف دون تاريخ"""
+    dates = df[config['date']]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = parse_dates(dates)
+    seconds = dates.dt.normalize().to_numpy(dtype='datetime64[s]').astype(np.int64)
+    if config['time'] in df.columns:
+        seconds = seconds + clock_minutes(df[config['time']]) * 60
+    return np.where(dates.isna().to_numpy(), -1, seconds)
+
+# عدادات مجمّعة في فترات زمنية ثابتة الطول
+class BucketedCounter:
+    """عدد السجلات ومجموع المدة وعدد المدد المسجلة لكل مفتاح في فترات طولها width ثانية،
+    تُحذف الفترات الأقدم من horizon"""
+    def __init__(self, width, horizon):
+        self.width = width
+        self.horizon = horizon
+        self.buckets = {}
+
+    def oldest(self, now):
+        """أقدم فترة محفوظة عند الوقت now"""
+        return (now - self.horizon) // self.width
+
+    def add(self, bucket, key, count, total, timed):
+        cells = self.buckets.setdefault(bucket, {})
+        add_cell(cells, key, count, total, timed)
+        if not cells:
+            del self.buckets[bucket]
+
+    def prune(self, now):
+        oldest = self.oldest(now)
+        for bucket in [bucket for bucket in self.buckets if bucket < oldest]:
+            del self.buckets[bucket]
+
+    def window(self, start, end):
+        """{المفتاح: [العدد، مجموع المدة، عدد المدد]} للفترات الواقعة في (start، end]"""
+        result = {}
+        for bucket in range(start // self.width + 1, end // self.width + 1):
+            for key, cell in self.buckets.get(bucket, {}).items():
+                add_cell(result, key, *cell)
+        return result
+
+def add_cell(cells, key, count, total, timed):
+    """إضافة (أو طرح بقيم سالبة) عدد ومجموع مدة وعدد مدد إلى خلية المفتاح؛ الخلية الفارغة تُحذف"""
+    cell = cells.setdefault(key, [0, 0.0, 0])
+    cell[0] += count
+    cell[1] += total
+    cell[2] += timed
+    if not cell[0]:
+        del cells[key]
+
+# محرك تحليل عبء العمل في نوافذ متحركة
+class WorkloadIndex:
+    """عدد السجلات ومتوسط المدة لكل موظف (أو سائق وفترة) في آخر ساعة ويوم وأسبوع
+
+    كل صف جديد يُضاف مرة واحدة إلى إجمالي مفتاحه وإلى فترته في العدادات المجمّعة
+    (خمس دقائق ليوم، وساعة لثمانية أيام)، فالمزامنة بعدد الصفوف الجديدة والاستعلام
+    بعدد الفترات في النافذة، لا بطول السجل كاملاً. الصفوف المعدلة في مكانها (الموظف أو
+    الوقت أو المدة) تُكتشف بمقارنة متجهة مع النسخة السابقة فيُطرح أثرها القديم ويُضاف الجديد.
+    متوسط المدة يُقسم على عدد المدد المسجلة لا على عدد السجلات.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sheets = {}
+
+    def _reset_sheet(self, sheet_name):
+        self._sheets[sheet_name] = {
+            'ids': [],
+            'columns': None,
+            'version': None,
+            'latest': None,
+            'totals': {},
+            'counters': [BucketedCounter(width, horizon) for width, horizon in WORKLOAD_BUCKETS],
+        }
+        return self._sheets[sheet_name]
+
+    @timed('workload_sync')
+    def sync(self, frames, now=None, data_version=None):
+        """تحديث كل ورقة مرة واحدة لكل نسخة بيانات: طرح الصفوف المعدلة القديمة وإضافة الجديدة
+
+        الورقة الأقصر من المفهرس والمتسقة معه (جلسة بنسخة أقدم) لا تغيّره، ويُعاد بناء الورقة
+        فقط إذا اختلفت صفوفها المفهرسة.
+        """
+        now = local_seconds() if now is None else now
+        with self._lock:
+            for sheet_name, df in frames.items():
+                config = WORKLOAD_SHEETS.get(sheet_name)
+                id_col = ID_COLUMNS[sheet_name]
+                if config is None or not all(col in df.columns for col in config['keys'] + [config['date'], id_col]):
+                    continue
+                columns = list(dict.fromkeys(
+                    col for col in config['keys'] + [config['date'], config['time'], config['duration']]
+                    if col in df.columns))
+                sheet = self._sheets.get(sheet_name) or self._reset_sheet(sheet_name)
+                if data_version is not None and data_version == sheet['version']:
+                    continue
+                plan = sync_plan(sheet['ids'], df[id_col])
+                if plan == 'rebuild' or (sheet['columns'] is not None and list(sheet['columns'].columns) != columns):
+                    sheet = self._reset_sheet(sheet_name)
+                elif plan == 'keep' and len(df) < len(sheet['ids']):
+                    continue
+                size = len(sheet['ids'])
+                if size:
+                    changed = changed_positions(sheet['columns'], df[columns].iloc[:size])
+                    if len(changed):
+                        self._add(sheet, config, sheet['columns'].iloc[changed], now, -1)
+                        self._add(sheet, config, df[columns].iloc[changed], now)
+                if len(df) > size:
+                    self._add(sheet, config, df[columns].iloc[size:], now)
+                    sheet['ids'].extend(row_ids(df[id_col].iloc[size:]))
+                sheet['columns'] = df[columns].copy(deep=False)
+                sheet['version'] = data_version
+
+    def _add(self, sheet, config, rows, now, sign=1):
+        events = rows[config['keys']].copy(deep=False)
+        events['المدة'] = (pd.to_numeric(rows[config['duration']], errors='coerce').to_numpy(dtype=float)
+                           if config['duration'] in rows.columns else np.nan)
+        seconds = event_seconds(rows, config)
+
+        def add_groups(cells_for, grouped):
+            counts, totals, timed = grouped.size(), grouped.sum(), grouped.count()
+            for key, count, total, known in zip(counts.index, counts.tolist(), totals.tolist(), timed.tolist()):
+                cells_for(key, sign * count, sign * total, sign * known)
+
+        add_groups(lambda key, *cell: add_cell(sheet['totals'], key if isinstance(key, tuple) else (key,), *cell),
+                   events.groupby(config['keys'], observed=True)['المدة'])
+
+        dated = seconds >= 0
+        if not dated.any():
+            return
+        latest = int(seconds[dated].max())
+        sheet['latest'] = latest if sheet['latest'] is None else max(sheet['latest'], latest)
+        # الحذف نسبةً إلى الآن أو آخر سجل إن كانت البيانات أقدم (المواعيد المستقبلية لا تحذف الحاضر)
+        reference = min(sheet['latest'], now)
+        for counter in sheet['counters']:
+            buckets = seconds // counter.width
+            keep = dated & (buckets >= counter.oldest(reference))
+            if keep.any():
+                recent = events[keep].copy(deep=False)
+                recent['الفترة'] = buckets[keep]
+                add_groups(lambda key, *cell: counter.add(int(key[0]), key[1:], *cell),
+                           recent.groupby(['الفترة'] + config['keys'], observed=True)['المدة'])
+            counter.prune(reference)
+
+    def window(self, sheet_name, seconds, now=None):
+        """(إطار العدد ومتوسط المدة لكل مفتاح في آخر seconds ثانية، نهاية النافذة بالثواني)
+
+        seconds=None لكل الفترة. النافذة تنتهي الآن، أو عند آخر سجل إذا كانت البيانات
+        كلها أقدم من أطول نافذة (بيانات تاريخية أو تجريبية).
+        """
+        keys = WORKLOAD_SHEETS[sheet_name]['keys']
+        now = (local_seconds() if now is None else now) // 60 * 60
+        longest = max(value for value in WORKLOAD_WINDOWS.values() if value)
+        with self._lock:
+            sheet = self._sheets.get(sheet_name)
+            end = now
+            if sheet is None:
+                cells = {}
+            else:
+                if sheet['latest'] is not None and sheet['latest'] < now - longest:
+                    end = sheet['latest']
+                if seconds is None:
+                    cells = {key: list(cell) for key, cell in sheet['totals'].items()}
+                else:
+                    counter = next(counter for counter in sheet['counters'] if counter.horizon >= seconds)
+                    cells = counter.window(end - seconds, end)
+
+        frame = pd.DataFrame([list(key) + cell for key, cell in cells.items()],
+                             columns=keys + ['العدد', 'مجموع المدة', 'عدد المدد'])
+        frame['العدد'] = frame['العدد'].astype(np.int64)
+        frame['متوسط المدة'] = (frame['مجموع المدة'] / frame['عدد المدد'].where(frame['عدد المدد'] > 0)).round(1)
+        return frame.sort_values('العدد', ascending=False, ignore_index=True), end
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_workload_index(data_source):
+    """محرك عبء عمل واحد لكل مصدر بيانات، يُحدَّث تزايدياً مع كل مزامنة"""
+    return WorkloadIndex()
+
+def workload_summary(workload_index, sheet_name, now=None):
+    """عدد السجلات ومتوسط المدة لكل مفتاح في كل النوافذ المحددة جنباً إلى جنب"""
+    keys = WORKLOAD_SHEETS[sheet_name]['keys']
+    summary = None
+    end = None
+    for label, seconds in WORKLOAD_WINDOWS.items():
+        if seconds is None:
+            continue
+        frame, end = workload_index.window(sheet_name, seconds, now)
+        frame = frame[keys + ['العدد', 'متوسط المدة']].rename(columns={
+            'العدد': f"العدد ({label})", 'متوسط المدة': f"متوسط المدة ({label})"})
+        summary = frame if summary is None else summary.merge(frame, on=keys, how='outer')
+    count_cols = [col for col in summary.columns if col.startswith("العدد")]
+    summary[count_cols] = summary[count_cols].fillna(0).astype(np.int64)
+    return summary.sort_values(count_cols, ascending=False, ignore_index=True), end
+
+def slot_interval(slot):
+    """(بداية، نهاية) الفترة بالدقائق من نص مثل 10:00-12:00، أو None إذا تعذر تحليله"""
+    times = re.findall(r'(\d{1,2}):(\d{2})', str(slot))
+    if len(times) < 2:
+        return None
+    (h1, m1), (h2, m2) = times[:2]
+    return int(h1) * 60 + int(m1), int(h2) * 60 + int(m2)
+
+def slots_overlap(a, b):
+    """تداخل فترتين (الفترات غير المفهومة تتداخل مع نفسها فقط)"""
+    if a == b:
+        return True
+    first, second = slot_interval(a), slot_interval(b)
+    return first is not None and second is not None and first[0] < second[1] and second[0] < first[1]
+
+def changed_positions(old, new):
+    """مواقع الصفوف المختلفة بين إطارين بنفس الطول والأعمدة بمقارنة متجهة لكل عمود"""
+    changed = np.zeros(len(new), dtype=bool)
+    for col in new.columns:
+        a, b = old[col], new[col]
+        if isinstance(a.dtype, pd.CategoricalDtype) and isinstance(b.dtype, pd.CategoricalDtype):
+            # رموز الفئات القديمة بترقيم فئات الإطار الجديد (-2 لفئة لم تعد موجودة)
+            mapping = b.cat.categories.get_indexer(a.cat.categories)
+            mapping[mapping < 0] = -2
+            changed |= np.append(mapping, -1)[a.cat.codes.to_numpy()] != b.cat.codes.to_numpy()
+            continue
+        missing = a.isna().to_numpy()
+        if a.dtype == b.dtype and a.dtype.kind in 'iufMm':
+            different = a.to_numpy() != b.to_numpy()
+        else:
+            different = a.to_numpy(dtype=object, na_value=None) != b.to_numpy(dtype=object, na_value=None)
+        changed |= (missing != b.isna().to_numpy()) | (~missing & different)
+    return np.flatnonzero(changed)
+
+# فهرس جدولة البيك أب وسعة السائقين
+class ScheduleIndex:
+    """عدد المهام النشطة لكل (تاريخ، فترة، سائق) لفحص السعة والتعارض فوراً في نموذج الحجز
+
+    الصفوف الجديدة تُضاف عند المزامنة، والصفوف المعدلة في مكانها (تغيّر الحالة أو السائق)
+    تُكتشف بمقارنة متجهة مع النسخة السابقة فيُطرح أثرها القديم ويُضاف الجديد، دون إعادة العد.
+    الحجوزات المرسلة من النموذج تُحتسب فوراً حتى تصل صفوفها مع المزامنة، أو حتى تنقضي
+    PICKUP_PENDING_TTL ثانية إذا لم يصل صفها.
+    """
+    def __init__(self, capacity=PICKUP_DRIVER_CAPACITY, pending_ttl=PICKUP_PENDING_TTL):
+        self.capacity = capacity
+        self.pending_ttl = pending_ttl
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.ids = []
+        self._known = set()
+        self.version = None
+        self._columns = None
+        self._days = {}
+        self._drivers = {}
+        self._pending = {}
+
+    def sync(self, df, data_version=None):
+        """تحديث الفهرس من ورقة البيك أب مرة واحدة لكل نسخة بيانات"""
+        id_col = ID_COLUMNS["البيك أب"]
+        if not all(col in df.columns for col in SCHEDULE_COLUMNS[:3] + [id_col]):
+            return
+        columns = [col for col in SCHEDULE_COLUMNS if col in df.columns]
+        with self._lock:
+            self._expire()
+            if data_version is not None and data_version == self.version:
+                return
+            plan = sync_plan(self.ids, df[id_col])
+            if plan == 'keep' and len(df) < len(self.ids):
+                # جلسة بنسخة أقدم: الفهرس يعكس الصفوف الأحدث فلا يُعاد بناؤه
+                return
+            if plan == 'rebuild' or (self._columns is not None and list(self._columns.columns) != columns):
+                pending = self._pending
+                self._reset()
+                for pickup_id, booking in pending.items():
+                    self._book(pickup_id, *booking)
+            size = len(self.ids)
+            if size:
+                changed = changed_positions(self._columns, df[columns].iloc[:size])
+                if len(changed):
+                    self._apply(self._columns.iloc[changed], -1)
+                    self._apply(df[columns].iloc[changed], 1)
+            if len(df) > size:
+                tail = df.iloc[size:]
+                tail_ids = set(tail[id_col].dropna().astype(str).str.strip())
+                for pickup_id in set(self._pending) & tail_ids:
+                    self._count(*self._pending.pop(pickup_id)[:3], -1)
+                self._apply(tail[columns], 1)
+                self.ids.extend(row_ids(tail[id_col]))
+                self._known |= tail_ids
+            self._columns = df[columns].copy(deep=False)
+            self.version = data_version
+
+    def _apply(self, rows, sign):
+        date_col, slot_col, driver_col = SCHEDULE_COLUMNS[:3]
+        active = (rows[date_col].notna() & rows[slot_col].notna() & rows[driver_col].notna()).to_numpy()
+        if 'الحالة' in rows.columns:
+            active &= ~rows['الحالة'].isin(PICKUP_INACTIVE_STATUSES).to_numpy()
+        rows = rows[active]
+        days = (rows[date_col] if pd.api.types.is_datetime64_any_dtype(rows[date_col])
+                else parse_dates(rows[date_col])).dt.normalize()
+        grouped = pd.Series(1, index=rows.index).groupby(
+            [days, rows[slot_col].astype(str), rows[driver_col].astype(str).str.strip()], observed=True).size()
+        for (day, slot, driver), count in zip(grouped.index, grouped.tolist()):
+            self._count(day, slot, driver, sign * count)
+
+    def _count(self, day, slot, driver, delta):
+        slots = self._days.setdefault(pd.Timestamp(day), {}).setdefault(driver, {})
+        slots[slot] = slots.get(slot, 0) + delta
+        if not slots[slot]:
+            del slots[slot]
+        self._drivers[driver] = self._drivers.get(driver, 0) + delta
+
+    def _book(self, pickup_id, day, slot, driver, booked_at):
+        self._pending[pickup_id] = (day, slot, driver, booked_at)
+        self._count(day, slot, driver, 1)
+
+    def _expire(self):
+        # حجوزات لم يصل صفها خلال المهلة: فشل حفظها أو رقمها مستخدم في صف سابق
+        cutoff = time.time() - self.pending_ttl
+        for pickup_id in [key for key, booking in self._pending.items() if booking[3] < cutoff]:
+            self._count(*self._pending.pop(pickup_id)[:3], -1)
+
+    def book(self, pickup_id, day, slot, driver):
+        """احتساب حجز أُرسل من النموذج قبل وصوله مع المزامنة (يُستبدل بصفه عند وصوله)"""
+        pickup_id = str(pickup_id).strip()
+        if not pickup_id or not driver:
+            return
+        with self._lock:
+            if pickup_id not in self._pending and pickup_id not in self._known:
+                self._book(pickup_id, pd.Timestamp(day).normalize(), slot, driver, time.time())
+
+    def load(self, day, slot, driver):
+        """مهام السائق النشطة في الفترات المتداخلة مع slot في اليوم"""
+        with self._lock:
+            self._expire()
+            slots = self._days.get(pd.Timestamp(day).normalize(), {}).get(driver, {})
+            return sum(count for other, count in slots.items() if slots_overlap(slot, other))
+
+    def availability(self, day, slot):
+        """إطار السائقين مع مهامهم في الفترة واليوم والسعة المتبقية، الأقل حملاً أولاً"""
+        day = pd.Timestamp(day).normalize()
+        with self._lock:
+            self._expire()
+            by_driver = self._days.get(day, {})
+            drivers = sorted(set(self._drivers) | set(by_driver))
+            records = []
+            for driver in drivers:
+                slots = by_driver.get(driver, {})
+                in_slot = sum(count for other, count in slots.items() if slots_overlap(slot, other))
+                records.append((driver, in_slot, sum(slots.values()), self.capacity - in_slot))
+        frame = pd.DataFrame(records, columns=['السائق', 'مهام الفترة', 'مهام اليوم', 'المتبقي'])
+        return frame.sort_values(['مهام الفترة', 'مهام اليوم', 'السائق'], ignore_index=True)
+
+    def suggest(self, day, slot):
+        """السائق الأقل حملاً في الفترة (ثم في اليوم) ممن لديه سعة متبقية، أو None"""
+        available = self.availability(day, slot)
+        available = available[available['المتبقي'] > 0]
+        return available['السائق'].iloc[0] if len(available) else None
+
+    def conflicts(self, day):
+        """(السائق، الفترة، المهام) لكل فترة تتجاوز فيها مهام السائق المتداخلة السعة في اليوم"""
+        day = pd.Timestamp(day).normalize()
+        with self._lock:
+            self._expire()
+            result = []
+            for driver, slots in sorted(self._days.get(day, {}).items()):
+                for slot in sorted(slots):
+                    load = sum(count for other, count in slots.items() if slots_overlap(slot, other))
+                    if load > self.capacity:
+                        result.append((driver, slot, load))
+            return result
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_schedule_index(data_source):
+    """فهرس جدولة واحد لكل مصدر بيانات، يُحدَّث تزايدياً مع كل مزامنة"""
+    return ScheduleIndex()
+
+def aggregate_count(aggregates, column, *values):
+    """عدد السجلات التي تحمل إحدى القيم في عمود من الإحصائيات المجمّعة"""
+    counts = aggregates['counts'].get(column, {})
+    return sum(counts.get(value, 0) for value in values)
+
+def aggregate_rate(aggregates, column, *values):
+    """نسبة السجلات التي تحمل إحدى القيم في عمود من الإحصائيات المجمّعة"""
+    if not aggregates['total']:
+        return 0.0
+    return aggregate_count(aggregates, column, *values) / aggregates['total'] * 100
+
+def report_dates(df, sheet_name):
+    """تواريخ سجلات الورقة (القيم غير الصالحة تُهمل)"""
+    column = REPORT_SHEETS[sheet_name]['date']
+    if column not in df.columns:
+        return pd.Series([], dtype='datetime64[ns]')
+    return pd.to_datetime(df[column], errors='coerce').dropna()
+
+def monthly_report(frames, aggregates, source="sample"):
+    """عدد سجلات كل قسم في كل شهر (من الملخصات الشهرية للأوراق المقسمة)"""
+    counts = {}
+    for sheet_name, df in frames.items():
+        if sheet_name in PARTITIONED_SHEETS:
+            monthly = load_rollups(source, sheet_name, df)[1]
+            counts[REPORT_SHEETS[sheet_name]['label']] = (
+                monthly.groupby(monthly['الفترة'].dt.to_period('M'))['العدد'].sum())
+        elif sheet_name in REPORT_SHEETS:
+            months = report_dates(df, sheet_name).dt.to_period('M')
+            counts[REPORT_SHEETS[sheet_name]['label']] = months.value_counts()
+    monthly = pd.DataFrame(counts).sort_index().fillna(0).astype(int)
+    monthly.index = monthly.index.astype(str)
+    return monthly.rename_axis('الشهر').reset_index()
+
+def weekday_report(frames, aggregates, source="sample"):
+    """عدد سجلات كل قسم حسب يوم الأسبوع (من الملخصات اليومية للأوراق المقسمة)"""
+    counts = {}
+    for sheet_name, df in frames.items():
+        if sheet_name in PARTITIONED_SHEETS:
+            daily = load_rollups(source, sheet_name, df)[0]
+            weekdays = daily.groupby(daily['الفترة'].dt.dayofweek)['العدد'].sum()
+        elif sheet_name in REPORT_SHEETS:
+            weekdays = report_dates(df, sheet_name).dt.dayofweek.value_counts()
+        else:
+            continue
+        counts[REPORT_SHEETS[sheet_name]['label']] = (
+            weekdays.reindex(range(7), fill_value=0).to_numpy())
+    weekday = pd.DataFrame(counts)
+    weekday.insert(0, 'اليوم', WEEKDAY_NAMES)
+    return weekday
 
-# إعداد البيانات التجريبية
-@st.cache_data
-def load_sample_data():
-    """تحميل بيانات تجريبية للعرض"""
-    customers_data = {
-        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
-        'اسم العميل': ['أحمد محمد', 'فاطمة أحمد', 'خالد علي', 'مريم سعد', 'عمر حسن'],
-        'رقم الهاتف': ['01234567890', '01123456789', '01012345678', '01234567891', '01123456780'],
-        'البريد الإلكتروني': ['ahmed@email.com', 'fatima@email.com', 'khaled@email.com', 'mariam@email.com', 'omar@email.com'],
-        'المدينة': ['القاهرة', 'الإسكندرية', 'الجيزة', 'المنصورة', 'أسوان'],
-        'تاريخ التسجيل': ['2024-01-15', '2024-01-20', '2024-01-25', '2024-02-01', '2024-02-05']
+def rates_report(frames, aggregates, source="sample"):
+    """نسبة السجلات المنجزة (إكمال أو حل) في كل قسم (من الإحصائيات المجمّعة)"""
+    rows = []
+    for sheet_name, sheet_aggregates in aggregates.items():
+        config = REPORT_SHEETS.get(sheet_name)
+        if config is None or 'الحالة' not in sheet_aggregates['counts']:
+            continue
+        rows.append({
+            'القسم': config['label'],
+            'المنجز': aggregate_count(sheet_aggregates, 'الحالة', *config['done']),
+            'الإجمالي': sheet_aggregates['total'],
+            'معدل الإنجاز': aggregate_rate(sheet_aggregates, 'الحالة', *config['done']),
+        })
+    return pd.DataFrame(rows, columns=['القسم', 'المنجز', 'الإجمالي', 'معدل الإنجاز'])
+
+def summary_report(frames, aggregates, source="sample"):
+    """الإحصائيات العامة للتقرير الشامل (من الإحصائيات المجمّعة)"""
+    rates = rates_report(frames, aggregates).set_index('القسم')['معدل الإنجاز']
+    return {
+        'totals': {name: sheet_aggregates['total'] for name, sheet_aggregates in aggregates.items()},
+        'rates': rates.to_dict(),
     }
+
+REPORT_BUILDERS = {
+    'monthly': monthly_report,
+    'weekday': weekday_report,
+    'rates': rates_report,
+    'summary': summary_report,
+}
+
+# محرك التقارير
+class ReportEngine:
+    """حساب التقارير في مجمّع عمال وحفظ النتائج حسب (نسخة البيانات، نوع التقرير)"""
+    def __init__(self, max_workers=REPORT_WORKERS, max_entries=REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
     
-    call_center_data = {
-        'رقم المكالمة': ['CC001', 'CC002', 'CC003', 'CC004', 'CC005'],
-        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
-        'نوع المكالمة': ['استفسار', 'شكوى', 'طلب خدمة', 'متابعة', 'إلغاء'],
-        'الموظف المسؤول': ['سارة أحمد', 'محمد علي', 'نورا حسن', 'أحمد محمود', 'ليلى عبدالله'],
-        'تاريخ المكالمة': ['2024-07-10', '2024-07-11', '2024-07-11', '2024-07-12', '2024-07-12'],
-        'وقت المكالمة': ['10:30', '14:15', '16:20', '09:45', '11:30'],
-        'مدة المكالمة (دقيقة)': [15, 25, 8, 12, 18],
-        'الحالة': ['مكتمل', 'قيد المعالجة', 'مكتمل', 'مكتمل', 'قيد المعالجة']
-    }
+    def submit(self, data_version, report_type, frames, aggregates):
+        """بدء حساب التقرير أو إرجاع الحساب الجاري/المكتمل لنفس النسخة
+
+        aggregates: الإحصائيات المجمّعة لكل ورقة (get_aggregates) محسوبة في خيط الجلسة.
+        """
+        key = (data_version, report_type)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                get_perf_metrics().increment('cache_hits', 'reports')
+                return future
+            get_perf_metrics().increment('cache_misses', 'reports')
+            future = self._executor.submit(REPORT_BUILDERS[report_type], frames, aggregates,
+                                           data_source(data_version))
+            self._futures[key] = future
+            while len(self._futures) > self.max_entries:
+                self._futures.popitem(last=False)
+        future.add_done_callback(lambda f: self._discard_failed(key, f))
+        return future
     
-    complaints_data = {
-        'رقم الشكوى': ['S001', 'S002', 'S003', 'S004', 'S005'],
-        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
-        'نوع الشكوى': ['تأخير في التسليم', 'جودة المنتج', 'خدمة العملاء', 'فواتير', 'تقني'],
-        'الوصف': ['تأخير في تسليم الطلب لمدة 3 أيام', 'المنتج لا يطابق المواصفات', 'سوء معاملة من فريق الدعم', 'خطأ في الفاتورة', 'مشكلة في التطبيق'],
-        'الأولوية': ['متوسط', 'عالي', 'منخفض', 'متوسط', 'عالي'],
-        'تاريخ الشكوى': ['2024-07-08', '2024-07-09', '2024-07-10', '2024-07-11', '2024-07-12'],
-        'الحالة': ['قيد المعالجة', 'تم الحل', 'جديد', 'قيد المعالجة', 'تم الحل'],
-        'الموظف المسؤول': ['أحمد سعد', 'مها محمد', 'كريم علي', 'دينا أحمد', 'حسام محمود']
-    }
+    def _discard_failed(self, key, future):
+        """التقارير الفاشلة لا تبقى في الذاكرة حتى يُعاد حسابها في الطلب التالي"""
+        if future.exception() is None:
+            return
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+@st.cache_resource
+def get_report_engine():
+    return ReportEngine()
+
+def get_report(data_version, report_type, frames, aggregates):
+    """نتيجة التقرير إذا اكتملت خلال REPORT_WAIT، وإلا None مع إعادة تشغيل الجلسة عند اكتمالها"""
+    future = get_report_engine().submit(data_version, report_type, frames, aggregates)
+    try:
+        return future.result(timeout=REPORT_WAIT)
+    except FutureTimeoutError:
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            future.add_done_callback(lambda f, session_id=ctx.session_id: request_session_rerun(session_id))
+        st.info("⏳ جاري حساب التقرير...")
+    except Exception as e:
+        st.error(f"خطأ في حساب التقرير: {e}")
+    return None
+
+def iter_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """تقسيم الإطار إلى دفعات متتالية من الصفوف"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def write_csv(df, fh):
+    """كتابة CSV على دفعات في ملف ثنائي (مع BOM ليقرأ Excel العربية)"""
+    fh.write(b'\xef\xbb\xbf')
+    fh.write(df.iloc[:0].to_csv(index=False).encode('utf-8'))
+    for chunk in iter_chunks(df):
+        fh.write(chunk.to_csv(index=False, header=False).encode('utf-8'))
+
+def write_jsonl(df, fh):
+    """كتابة JSON Lines على دفعات: سجل واحد في كل سطر"""
+    for chunk in iter_chunks(df):
+        fh.write(chunk.to_json(orient='records', lines=True, force_ascii=False,
+                               date_format='iso').encode('utf-8'))
+
+def write_excel(frames, fh):
+    """كتابة ورقة Excel لكل إطار بوضع constant_memory (الصفوف تُفرغ إلى القرص فور كتابتها)"""
+    import xlsxwriter
     
-    pickup_data = {
-        'رقم البيك أب': ['P001', 'P002', 'P003', 'P004', 'P005'],
-        'رقم العميل': ['C001', 'C002', 'C003', 'C004', 'C005'],
-        'العنوان': ['شارع النيل، المعادي', 'شارع الجمهورية، وسط البلد', 'شارع الهرم، الجيزة', 'شارع الجلاء، المنصورة', 'شارع النيل، أسوان'],
-        'تاريخ البيك أب': ['2024-07-13', '2024-07-13', '2024-07-14', '2024-07-14', '2024-07-15'],
-        'الوقت المطلوب': ['10:00-12:00', '14:00-16:00', '09:00-11:00', '16:00-18:00', '11:00-13:00'],
-        'نوع الخدمة': ['استلام', 'تسليم', 'استلام وتسليم', 'استلام', 'تسليم'],
-        'السائق': ['محمد أحمد', 'أحمد محمود', 'سامي علي', 'عمر حسن', 'خالد سعد'],
-        'الحالة': ['مجدول', 'في الطريق', 'مكتمل', 'مجدول', 'في الطريق']
-    }
+    workbook = xlsxwriter.Workbook(fh, {'constant_memory': True, 'in_memory': False,
+                                        'default_date_format': 'yyyy-mm-dd'})
+    header_format = workbook.add_format({'bold': True})
+    for name, df in frames.items():
+        # الأوراق الأكبر من حد Excel تُكمل في أوراق تالية
+        for part, start in enumerate(range(0, max(len(df), 1), EXCEL_MAX_ROWS - 1)):
+            worksheet = workbook.add_worksheet(name if part == 0 else f"{name} ({part + 1})")
+            worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+            row = 1
+            for chunk in iter_chunks(df.iloc[start:start + EXCEL_MAX_ROWS - 1]):
+                values = chunk.astype(object).where(chunk.notna(), None).values.tolist()
+                for record in values:
+                    worksheet.write_row(row, 0, record)
+                    row += 1
+    workbook.close()
+
+def write_export(frames, export_format, fh):
+    """كتابة الإطارات بالصيغة المطلوبة؛ أكثر من إطار بصيغة نصية يُجمع في ملف zip"""
+    if export_format == "Excel":
+        write_excel(frames, fh)
+        return
+    writer = write_csv if export_format == "CSV" else write_jsonl
+    extension = EXPORT_FORMATS[export_format][0]
+    if len(frames) == 1:
+        writer(next(iter(frames.values())), fh)
+        return
+    with zipfile.ZipFile(fh, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        for name, df in frames.items():
+            with bundle.open(f"{name}.{extension}", 'w') as member:
+                writer(df, member)
+
+def frames_digest(frames):
+    """بصمة محتوى الإطارات (الأسماء والأعمدة والقيم)؛ تبقى صحيحة بعد إعادة تشغيل العملية وبين العمليات"""
+    digest = hashlib.md5()
+    for name, df in frames.items():
+        digest.update(f"{name}|{'|'.join(map(str, df.columns))}|{len(df)}".encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def prune_exports():
+    """الإبقاء على أحدث ملفات التصدير فقط، وحذف الملفات المؤقتة المتروكة من كتابة لم تكتمل"""
+    now = time.time()
+    finished = []
+    for filename in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, filename)
+        try:
+            mtime = os.path.getmtime(path)
+            if filename.endswith(".tmp"):
+                if now - mtime > EXPORT_TEMP_MAX_AGE:
+                    os.remove(path)
+            else:
+                finished.append((mtime, path))
+        except OSError:
+            pass
+    for _, old_path in sorted(finished, reverse=True)[EXPORT_KEEP_FILES:]:
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+
+def export_data_file(export_data, export_format, frames):
+    """إنشاء ملف التصدير على القرص مرة واحدة لكل محتوى وإرجاع (المسار، اسم الملف، نوع MIME)
     
-    return (
-        pd.DataFrame(customers_data),
-        pd.DataFrame(call_center_data),
-        pd.DataFrame(complaints_data),
-        pd.DataFrame(pickup_data)
-    )
+    المفتاح بصمة المحتوى لا رقم نسخة البيانات، لأن الرقم عداد داخل العملية يتكرر بعد إعادة
+    التشغيل فيُقدَّم ملف قديم. كل كتابة في ملف مؤقت باسم فريد حتى لا تتداخل الجلسات المتزامنة.
+    """
+    extension, mime = EXPORT_FORMATS[export_format]
+    if len(frames) > 1 and export_format != "Excel":
+        extension, mime = "zip", "application/zip"
+    filename = f"{export_data}_{datetime.now().strftime('%Y%m%d')}.{extension}"
+    key = hashlib.md5(f"{frames_digest(frames)}|{export_data}|{export_format}".encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(EXPORT_DIR, f"{key}.{extension}")
+    if not os.path.exists(path):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'wb') as fh:
+                write_export(frames, export_format, fh)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        prune_exports()
+    return path, filename, mime
 
 # دالة لعرض الإحصائيات
-def display_metrics(df, title):
+@timed('display_metrics')
+def display_metrics(aggregates, title):
     """عرض الإحصائيات الأساسية"""
     col1, col2, col3, col4 = st.columns(4)
+    total = aggregates['total']
     
     with col1:
-        st.metric("إجمالي السجلات", len(df))
+        st.metric("إجمالي السجلات", total)
     
     with col2:
-        if 'الحالة' in df.columns:
-            active_count = len(df[df['الحالة'].isin(['نشط', 'مكتمل', 'تم الحل'])])
+        if 'الحالة' in aggregates['counts']:
+            active_count = aggregate_count(aggregates, 'الحالة', *ACTIVE_STATUSES)
             st.metric("السجلات النشطة", active_count)
         else:
-            st.metric("السجلات الحديثة", len(df))
+            st.metric("السجلات الحديثة", total)
     
     with col3:
-        if 'تاريخ' in str(df.columns):
-            date_col = [col for col in df.columns if 'تاريخ' in col][0]
-            today_count = len(df[df[date_col] == datetime.now().strftime('%Y-%m-%d')])
+        if aggregates['date_column']:
+            today_count = aggregates['date_counts'].get(datetime.now().strftime('%Y-%m-%d'), 0)
             st.metric("اليوم", today_count)
         else:
-            st.metric("هذا الأسبوع", len(df))
+            st.metric("هذا الأسبوع", total)
     
     with col4:
-        if 'الأولوية' in df.columns:
-            high_priority = len(df[df['الأولوية'] == 'عالي'])
+        if 'الأولوية' in aggregates['counts']:
+            high_priority = aggregate_count(aggregates, 'الأولوية', 'عالي')
             st.metric("أولوية عالية", high_priority)
         else:
             st.metric("معدل النجاح", "95%")
 
+def date_column_config(df):
+    """عرض أعمدة التواريخ بصيغة DATE_FORMAT بدلاً من الطابع الزمني الكامل"""
+    return {col: st.column_config.DateColumn(format="YYYY-MM-DD")
+            for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])}
+
+# دالة لعرض جدول مع قياس حجم الحمولة المرسلة للمتصفح
+def show_dataframe(df, **kwargs):
+    """عرض st.dataframe مع تسجيل عدد الصفوف وحجمها في الذاكرة وزمن الإرسال"""
+    metrics = get_perf_metrics()
+    metrics.increment('dataframe_rows', value=len(df))
+    metrics.increment('dataframe_bytes', value=int(df.memory_usage(deep=True).sum()))
+    with perf_timer('dataframe_render'):
+        st.dataframe(df, use_container_width=True, column_config=date_column_config(df), **kwargs)
+
+# دالة لعرض جدول مقسم إلى صفحات
+@timed('display_table')
+def display_table(index, positions, key, height=400):
+    """عرض صفحة واحدة من الصفوف المطابقة بعد ترتيبها على الخادم
+    
+    positions: مواقع الصفوف من FilterIndex.select؛ None تعني كل الصفوف.
+    """
+    df = index.df
+    total = len(df) if positions is None else len(positions)
+    
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        sort_column = st.selectbox("ترتيب حسب", [NO_SORT_OPTION] + list(df.columns), key=f"{key}_sort")
+    with col2:
+        descending = st.checkbox("تنازلي", key=f"{key}_desc")
+    with col3:
+        page_size = st.selectbox("عدد الصفوف", TABLE_PAGE_SIZES, key=f"{key}_page_size")
+    
+    pages = max(1, -(-total // page_size))
+    page_key = f"{key}_page"
+    # تغيير الفلاتر قد يقلل عدد الصفحات عن الصفحة المحفوظة
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    with col4:
+        page = st.number_input("الصفحة", min_value=1, max_value=pages, step=1, key=page_key)
+    
+    start = (page - 1) * page_size
+    stop = min(start + page_size, total)
+    if sort_column == NO_SORT_OPTION:
+        rows = slice(start, stop) if positions is None else positions[start:stop]
+    else:
+        order, rank = index.sort_order(sort_column)
+        if positions is not None:
+            order = positions[np.argsort(rank[positions], kind='stable')]
+        if descending:
+            order = order[::-1]
+        rows = order[start:stop]
+    page_df = df.iloc[rows]
+    
+    show_dataframe(page_df, height=height)
+    st.caption(f"عرض {start + 1 if total else 0}–{stop} من {total} سجل")
+
+# دالة لعرض الملف الشامل للعميل
+def display_customer_360(positions, sheets):
+    """عرض بيانات العميل ومكالماته وشكاواه وطلبات البيك أب من مواقع فهرس الربط"""
+    if not len(positions.get("العملاء", [])):
+        st.warning("لا يوجد عميل بهذا الرقم")
+        return
+    profile = sheets["العملاء"].iloc[positions["العملاء"]]
+    show_dataframe(profile)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("المكالمات", len(positions.get("الكول سنتر", [])))
+    with col2:
+        st.metric("الشكاوى", len(positions.get("الشكاوى", [])))
+    with col3:
+        st.metric("البيك أب", len(positions.get("البيك أب", [])))
+    
+    for sheet_name in SHEET_NAMES[1:]:
+        rows = positions.get(sheet_name, [])
+        if len(rows):
+            st.markdown(f"**{sheet_name}**")
+            records = sheets[sheet_name].iloc[rows]
+            show_dataframe(records)
+
+# ذاكرة الرسوم البيانية
+@tracked_cache("figures", st.cache_resource(max_entries=CHART_CACHE_SIZE, show_spinner=False))
+def get_figure(chart_id, data_version, filter_state, _build):
+    """مواصفة JSON للشكل تُبنى مرة واحدة لكل (رسم، نسخة بيانات، حالة الفلاتر)
+    
+    يُحفظ النص لا كائن go.Figure: النص لا يتغير فيُشارك بين الجلسات بأمان، ولا يُعاد تحويله
+    إلى JSON في كل إعادة تشغيل.
+    """
+    fig = _build()
+    return None if fig is None else fig.to_json()
+
+def render_figure_spec(spec):
+    """إرسال مواصفة JSON جاهزة كرسم Plotly بعرض الحاوية
+    
+    st.plotly_chart يحوّل الشكل إلى JSON (ويتحقق من القاموس ببناء شكل جديد) في كل استدعاء،
+    فتُرسل المواصفة مباشرة عبر PlotlyChartProto و_enqueue. هذه واجهات غير موثقة؛ إذا تعذر
+    الوصول إليها يُبنى من المواصفة شكل جديد خاص بهذا الاستدعاء.
+    """
+    try:
+        from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+        
+        proto = PlotlyChartProto()
+        proto.use_container_width = True
+        proto.figure.spec = spec
+        proto.figure.config = json.dumps({'showLink': False, 'linkText': False})
+        proto.theme = "streamlit"
+        enqueue = st._main._enqueue
+    except (ImportError, AttributeError):
+        st.plotly_chart(go.Figure(json.loads(spec)), use_container_width=True)
+        return
+    enqueue("plotly_chart", proto)
+
+def show_chart(chart_id, data_version, build, filter_state=()):
+    """عرض رسم محفوظ؛ build تُستدعى فقط عند أول طلب للمفتاح"""
+    spec = get_figure(chart_id, data_version, filter_state, build)
+    if spec is not None:
+        label = chart_id if isinstance(chart_id, str) else "/".join(map(str, chart_id))
+        with perf_timer('chart_render', label):
+            render_figure_spec(spec)
+
+def time_series_counts(dates, max_points=CHART_MAX_POINTS):
+    """أعداد السجلات حسب التاريخ، مجمّعة يومياً أو أسبوعياً أو شهرياً حتى لا تتجاوز max_points نقطة"""
+    dates = pd.to_datetime(dates, errors='coerce').dropna()
+    daily = dates.dt.normalize().value_counts().sort_index()
+    if daily.empty:
+        return daily, CHART_RESAMPLE_RULES[0][1]
+    for rule, label in CHART_RESAMPLE_RULES:
+        counts = daily.resample(rule).sum()
+        if len(counts) <= max_points:
+            break
+    return counts, label
+
 # دالة لإنشاء الرسوم البيانية
-def create_charts(df, chart_type, title):
-    """إنشاء الرسوم البيانية"""
-    if chart_type == "pie" and 'الحالة' in df.columns:
-        status_counts = df['الحالة'].value_counts()
-        fig = px.pie(values=status_counts.values, names=status_counts.index, 
-                     title=f"توزيع الحالات - {title}")
-        st.plotly_chart(fig, use_container_width=True)
-    
-    elif chart_type == "bar" and 'تاريخ' in str(df.columns):
-        date_col = [col for col in df.columns if 'تاريخ' in col][0]
-        df[date_col] = pd.to_datetime(df[date_col])
-        daily_counts = df.groupby(df[date_col].dt.date).size().reset_index()
-        daily_counts.columns = ['التاريخ', 'العدد']
-        fig = px.bar(daily_counts, x='التاريخ', y='العدد', 
-                     title=f"الإحصائيات اليومية - {title}")
-        st.plotly_chart(fig, use_container_width=True)
+@timed('create_charts')
+def create_charts(df, chart_type, title, data_version=None):
+    """إنشاء الرسوم البيانية (تُحفظ حسب نسخة البيانات إذا مُررت)"""
+    def build():
+        if chart_type == "pie" and 'الحالة' in df.columns:
+            status_counts = df['الحالة'].value_counts()
+            status_counts = status_counts[status_counts > 0]
+            return px.pie(values=status_counts.values, names=status_counts.index, 
+                          title=f"توزيع الحالات - {title}")
+        
+        date_cols = [col for col in df.columns if 'تاريخ' in col]
+        if chart_type == "bar" and date_cols:
+            counts, label = time_series_counts(df[date_cols[0]])
+            return px.bar(x=counts.index, y=counts.values, labels={'x': 'التاريخ', 'y': 'العدد'},
+                          title=f"الإحصائيات {label} - {title}")
+        return None
+    
+    if data_version is None:
+        fig = build()
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+    else:
+        show_chart(("create_charts", chart_type, title), data_version, build)
+
+# دالة لعرض لوحة الأداء
+def display_performance_panel(metrics, run):
+    """عرض أزمنة وعدادات الجولة الحالية مع تصدير كل المقاييس بصيغة Prometheus أو JSON"""
+    counters = run['counters']
+    api_calls = sum(v for k, v in counters.items() if k.startswith('sheets_api_calls'))
+    hits = sum(v for k, v in counters.items() if k.startswith('cache_hits'))
+    misses = sum(v for k, v in counters.items() if k.startswith('cache_misses'))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("زمن الجولة", f"{run['duration'] * 1000:.0f} ms")
+        st.metric("طلبات Sheets", api_calls)
+    with col2:
+        st.metric("إصابات الذاكرة", f"{hits}/{hits + misses}")
+        st.metric("حمولة الجداول", f"{counters.get('dataframe_bytes', 0) / 1024:.0f} KB")
+    
+    timers = pd.DataFrame(sorted(run['timers'].items(), key=lambda item: -item[1]),
+                          columns=['المقياس', 'الزمن (ms)'])
+    timers['الزمن (ms)'] = (timers['الزمن (ms)'] * 1000).round(1)
+    st.dataframe(timers, use_container_width=True, hide_index=True)
+    st.dataframe(pd.DataFrame(sorted(counters.items()), columns=['العداد', 'القيمة']),
+                 use_container_width=True, hide_index=True)
+    
+    st.download_button("⬇️ Prometheus", metrics.prometheus(), file_name="metrics.prom",
+                       mime="text/plain")
+    st.download_button("⬇️ JSON", json.dumps(metrics.to_dict(), ensure_ascii=False),
+                       file_name="metrics.json", mime="application/json")
 
 # دالة لإدارة النماذج
-def manage_forms(sheet_name, df):
+def manage_forms(sheet_name, df, schedule_index=None):
     """إدارة النماذج لإضافة وتعديل البيانات"""
     st.subheader(f"إدارة بيانات {sheet_name}")
     
@@ -231,7 +3266,7 @@ def manage_forms(sheet_name, df):
         if sheet_name == "العملاء":
             col1, col2 = st.columns(2)
             with col1:
-                customer_id = st.text_input("رقم العميل")
+                customer_id = st.text_input("رقم العميل", key=f"{sheet_name}_customer_id")
                 customer_name = st.text_input("اسم العميل")
                 phone = st.text_input("رقم الهاتف")
             with col2:
@@ -241,15 +3276,16 @@ def manage_forms(sheet_name, df):
             
             if st.button("إضافة عميل جديد"):
                 new_record = [customer_id, customer_name, phone, email, city, str(reg_date)]
-                st.success("تم إضافة العميل بنجاح!")
+                if submit_record(sheet_name, new_record):
+                    st.success("تم إضافة العميل بنجاح!")
         
         elif sheet_name == "الكول سنتر":
             col1, col2 = st.columns(2)
             with col1:
                 call_id = st.text_input("رقم المكالمة")
-                customer_id = st.text_input("رقم العميل")
+                customer_id = st.text_input("رقم العميل", key=f"{sheet_name}_customer_id")
                 call_type = st.selectbox("نوع المكالمة", ["استفسار", "شكوى", "طلب خدمة", "متابعة", "إلغاء"])
-                employee = st.text_input("الموظف المسؤول")
+                employee = st.text_input("الموظف المسؤول", key=f"{sheet_name}_employee")
             with col2:
                 call_date = st.date_input("تاريخ المكالمة")
                 call_time = st.time_input("وقت المكالمة")
@@ -259,13 +3295,14 @@ def manage_forms(sheet_name, df):
             if st.button("إضافة مكالمة جديدة"):
                 new_record = [call_id, customer_id, call_type, employee, 
                              str(call_date), str(call_time), duration, status]
-                st.success("تم إضافة المكالمة بنجاح!")
+                if submit_record(sheet_name, new_record):
+                    st.success("تم إضافة المكالمة بنجاح!")
         
         elif sheet_name == "الشكاوى":
             col1, col2 = st.columns(2)
             with col1:
                 complaint_id = st.text_input("رقم الشكوى")
-                customer_id = st.text_input("رقم العميل")
+                customer_id = st.text_input("رقم العميل", key=f"{sheet_name}_customer_id")
                 complaint_type = st.selectbox("نوع الشكوى", 
                                             ["تأخير في التسليم", "جودة المنتج", "خدمة العملاء", "فواتير", "تقني"])
                 description = st.text_area("الوصف")
@@ -273,34 +3310,63 @@ def manage_forms(sheet_name, df):
                 priority = st.selectbox("الأولوية", ["منخفض", "متوسط", "عالي"])
                 complaint_date = st.date_input("تاريخ الشكوى")
                 status = st.selectbox("الحالة", ["جديد", "قيد المعالجة", "تم الحل", "مغلق"])
-                employee = st.text_input("الموظف المسؤول")
+                employee = st.text_input("الموظف المسؤول", key=f"{sheet_name}_employee")
             
             if st.button("إضافة شكوى جديدة"):
                 new_record = [complaint_id, customer_id, complaint_type, description,
                              priority, str(complaint_date), status, employee]
-                st.success("تم إضافة الشكوى بنجاح!")
+                if submit_record(sheet_name, new_record):
+                    st.success("تم إضافة الشكوى بنجاح!")
         
         elif sheet_name == "البيك أب":
             col1, col2 = st.columns(2)
             with col1:
                 pickup_id = st.text_input("رقم البيك أب")
-                customer_id = st.text_input("رقم العميل")
+                customer_id = st.text_input("رقم العميل", key=f"{sheet_name}_customer_id")
                 address = st.text_area("العنوان")
                 pickup_date = st.date_input("تاريخ البيك أب")
             with col2:
-                time_slot = st.selectbox("الوقت المطلوب", 
-                                       ["09:00-11:00", "10:00-12:00", "14:00-16:00", "16:00-18:00"])
+                time_slot = st.selectbox("الوقت المطلوب", PICKUP_SLOTS)
                 service_type = st.selectbox("نوع الخدمة", ["استلام", "تسليم", "استلام وتسليم"])
-                driver = st.text_input("السائق")
+                driver = st.text_input("السائق", help="اتركه فارغاً لتعيين السائق الأقل حملاً في الفترة").strip()
                 status = st.selectbox("الحالة", ["مجدول", "في الطريق", "مكتمل", "ملغى"])
             
+            # سعة السائقين في الفترة المختارة من فهرس الجدولة
+            suggested = None
+            if schedule_index is not None:
+                suggested = schedule_index.suggest(pickup_date, time_slot)
+                if driver:
+                    load = schedule_index.load(pickup_date, time_slot, driver)
+                    if load >= schedule_index.capacity:
+                        st.warning(f"⚠️ {driver} مشغول بالكامل في هذه الفترة ({load}/{schedule_index.capacity})")
+                    elif load:
+                        st.info(f"{driver} لديه {load} مهمة في فترات متداخلة ({load}/{schedule_index.capacity})")
+                if suggested is not None:
+                    st.caption(f"السائق المقترح: {suggested}")
+                else:
+                    st.warning("⚠️ لا يوجد سائق لديه سعة متبقية في هذه الفترة")
+                conflicts = schedule_index.conflicts(pickup_date)
+                if conflicts:
+                    st.warning("تعارضات في هذا اليوم: " + "، ".join(
+                        f"{name} ({slot}: {load})" for name, slot, load in conflicts))
+                show_dataframe(schedule_index.availability(pickup_date, time_slot), hide_index=True)
+            
             if st.button("إضافة بيك أب جديد"):
+                driver = driver or suggested or ""
                 new_record = [pickup_id, customer_id, address, str(pickup_date),
                              time_slot, service_type, driver, status]
-                st.success("تم إضافة البيك أب بنجاح!")
+                if submit_record(sheet_name, new_record):
+                    if schedule_index is not None and status not in PICKUP_INACTIVE_STATUSES:
+                        schedule_index.book(pickup_id, pickup_date, time_slot, driver)
+                    st.success("تم إضافة البيك أب بنجاح!")
 
 # الواجهة الرئيسية
 def main():
+    # بدء قياس هذه الجولة
+    metrics = get_perf_metrics()
+    ctx = get_script_run_ctx()
+    metrics.start_run(ctx.session_id if ctx is not None else None)
+    
     # الهيدر الرئيسي
     st.markdown("""
     <div class="main-header">
@@ -313,9 +3379,6 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # تحميل البيانات التجريبية
-    customers_df, call_center_df, complaints_df, pickup_df = load_sample_data()
-    
     # الشريط الجانبي للإعدادات
     st.sidebar.header("⚙️ إعدادات الاتصال")
     
@@ -329,12 +3392,23 @@ def main():
             if spreadsheet_id and credentials_file:
                 try:
                     credentials_dict = json.load(credentials_file)
-                    gs_manager = GoogleSheetsManager(credentials_dict, spreadsheet_id)
-                    st.success("تم الاتصال بنجاح!")
-                    st.session_state['gs_connected'] = True
+                    # تُحفظ البصمة حتى لو فشل الاتصال ليُفتح وضع عدم الاتصال لهذا الجدول
+                    st.session_state['offline_credentials'] = (
+                        spreadsheet_id, credentials_fingerprint(credentials_dict))
+                    gs_manager = get_manager_pool().get(credentials_dict, spreadsheet_id)
+                    if gs_manager is not None:
+                        st.success("تم الاتصال بنجاح!")
+                        st.session_state['gs_manager'] = gs_manager
+                        st.session_state['gs_connected'] = True
                 except Exception as e:
                     st.error(f"خطأ في الاتصال: {e}")
     
+    offline_mode = st.sidebar.checkbox("📴 وضع عدم الاتصال (آخر نسخة محلية)", value=False,
+                                       help="النسخة المحلية للجدول الذي أُدخل ملف اعتماده في هذه الجلسة")
+    
+    if st.session_state.get('gs_manager') is not None:
+        display_write_status()
+    
     # إعدادات العرض
     st.sidebar.header("🎨 إعدادات العرض")
     show_charts = st.sidebar.checkbox("عرض الرسوم البيانية", value=True)
@@ -343,127 +3417,272 @@ def main():
     
     if auto_refresh:
         refresh_interval = st.sidebar.slider("فترة التحديث (ثانية)", 30, 300, 60)
+    show_performance = st.sidebar.checkbox("⏱️ لوحة الأداء", value=False)
+    
+    # الأقسام الرئيسية
+    section = st.radio("القسم", SECTIONS, horizontal=True, key="active_section",
+                       label_visibility="collapsed")
     
-    # التبويبات الرئيسية
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-        "👥 العملاء", 
-        "📞 الكول سنتر", 
-        "❗ الشكاوى", 
-        "🚚 البيك أب",
-        "📈 التقارير"
-    ])
+    # تحميل أوراق القسم المختار فقط (الأوراق غير المحملة قيمتها None)
+    frames, data_version = load_data(offline=offline_mode, sheet_names=SECTION_SHEETS[section])
+    customers_df, call_center_df, complaints_df, pickup_df = (frames.get(name) for name in SHEET_NAMES)
+    aggregates = {name: get_aggregates(data_version, name, df) for name, df in frames.items()}
+    customers_agg, calls_agg, complaints_agg, pickup_agg = (aggregates.get(name) for name in SHEET_NAMES)
+    customers_idx, calls_idx, complaints_idx, pickup_idx = (
+        get_filter_index(data_version, name, frames[name]) if name in frames else None
+        for name in SHEET_NAMES
+    )
+    join_index = get_join_index(data_source(data_version))
+    join_index.sync(frames, data_version)
+    workload_index = get_workload_index(data_source(data_version))
+    workload_index.sync(frames, data_version=data_version)
+    
+    # التحديث التلقائي عبر المستطلع المشترك بدلاً من إيقاف الجلسة بالانتظار؛
+    # المستطلع يزامن الصفوف الجديدة مرة واحدة لكل جدول والجلسات تقرأ من الذاكرة المؤقتة
+    gs_manager = st.session_state.get('gs_manager')
+    if ctx is not None and gs_manager is not None:
+        data_poller = get_data_poller()
+        if auto_refresh and not offline_mode and data_poller.disabled is None:
+            sheet_names = SECTION_SHEETS[section]
+            seen_version = get_sheet_cache().sheet_versions(gs_manager.spreadsheet_id, sheet_names)
+            data_poller.subscribe(ctx.session_id, gs_manager, refresh_interval, sheet_names, seen_version)
+        else:
+            data_poller.unsubscribe(ctx.session_id)
+        if auto_refresh and data_poller.disabled is not None:
+            st.sidebar.warning(f"التحديث التلقائي متوقف: {data_poller.disabled}")
     
     # تبويب العملاء
-    with tab1:
+    if section == SECTIONS[0]:
         st.header("👥 إدارة العملاء")
         
         if show_metrics:
-            display_metrics(customers_df, "العملاء")
+            display_metrics(customers_agg, "العملاء")
         
         if show_charts:
             col1, col2 = st.columns(2)
             with col1:
-                city_counts = customers_df['المدينة'].value_counts()
-                fig = px.pie(values=city_counts.values, names=city_counts.index, 
-                           title="توزيع العملاء حسب المدينة")
-                st.plotly_chart(fig, use_container_width=True)
+                city_counts = customers_agg['counts']['المدينة']
+                show_chart("customers_by_city", data_version, lambda: px.pie(
+                    values=list(city_counts.values()), names=list(city_counts.keys()), 
+                    title="توزيع العملاء حسب المدينة"))
             
             with col2:
-                customers_df['تاريخ التسجيل'] = pd.to_datetime(customers_df['تاريخ التسجيل'])
-                monthly_reg = customers_df.groupby(customers_df['تاريخ التسجيل'].dt.to_period('M')).size()
-                fig = px.bar(x=monthly_reg.index.astype(str), y=monthly_reg.values,
-                           title="تسجيل العملاء الشهري")
-                st.plotly_chart(fig, use_container_width=True)
+                def monthly_registrations():
+                    registered = customers_df['تاريخ التسجيل']
+                    monthly_reg = registered.groupby(registered.dt.to_period('M')).size()
+                    return px.bar(x=monthly_reg.index.astype(str), y=monthly_reg.values,
+                                  title="تسجيل العملاء الشهري")
+                show_chart("customers_monthly", data_version, monthly_registrations)
         
         # فلترة البيانات
         st.subheader("🔍 فلترة البيانات")
         col1, col2 = st.columns(2)
         with col1:
-            city_filter = st.selectbox("فلترة حسب المدينة", 
-                                     ["الكل"] + list(customers_df['المدينة'].unique()))
+            city_filter = st.selectbox("فلترة حسب المدينة", customers_idx.options['المدينة'])
+        with col2:
+            search_term = st.text_input("البحث بالاسم أو رقم الهاتف أو رقم العميل",
+                                        help="ثلاثة أحرف فأكثر تبحث في أي جزء من النص؛ "
+                                             "حرف أو حرفان يطابقان بدايات الكلمات فقط")
+        
+        # تطبيق الفلاتر
+        search_positions = None
+        if search_term:
+            search_index = get_search_index(data_source(data_version))
+            search_index.sync(customers_df, data_version)
+            search_positions = search_index.search(search_term, len(customers_df))
+        filtered_positions = customers_idx.select({'المدينة': city_filter}, within=search_positions)
+        
+        display_table(customers_idx, filtered_positions, "customers_table")
+        
+        # الملف الشامل للعميل من الأوراق الأربع
+        with st.expander("👤 الملف الشامل للعميل"):
+            customer_id = st.text_input("رقم العميل", key="customer_360_id")
+            if customer_id:
+                all_frames, all_version = load_data(offline=offline_mode)
+                join_index.sync(all_frames, all_version)
+                display_customer_360(join_index.lookup(customer_id, all_frames), all_frames)
+        
+        # نموذج إدارة العملاء
+        manage_forms("العملاء", customers_df)
+    
+    # تبويب الكول سنتر
+    elif section == SECTIONS[1]:
+        st.header("📞 إدارة الكول سنتر")
+        
+        if show_metrics:
+            display_metrics(calls_agg, "المكالمات")
+        
+        if show_charts:
+            col1, col2 = st.columns(2)
+            with col1:
+                call_types = calls_agg['counts']['نوع المكالمة']
+                show_chart("calls_by_type", data_version, lambda: px.pie(
+                    values=list(call_types.values()), names=list(call_types.keys()),
+                    title="توزيع أنواع المكالمات"))
+            
+            with col2:
+                window = st.selectbox("الفترة", list(WORKLOAD_WINDOWS), index=1, key="calls_workload_window")
+                workload, end = workload_index.window("الكول سنتر", WORKLOAD_WINDOWS[window])
+                show_chart("calls_avg_duration", data_version, lambda: px.bar(
+                    workload, x='الموظف المسؤول', y='متوسط المدة', hover_data=['العدد'],
+                    title=f"متوسط مدة المكالمات لكل موظف ({window})"), filter_state=(window, end))
+        
+        # عبء العمل الحالي لكل موظف في النوافذ المتحركة
+        st.subheader("⏱️ عبء العمل لكل موظف")
+        summary, end = workload_summary(workload_index, "الكول سنتر")
+        st.caption(f"حتى {pd.Timestamp(end, unit='s'):%Y-%m-%d %H:%M}")
+        show_dataframe(summary, hide_index=True)
+        
+        # فلترة المكالمات
+        st.subheader("🔍 فلترة المكالمات")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            call_type_filter = st.selectbox("نوع المكالمة", calls_idx.options['نوع المكالمة'])
+        with col2:
+            status_filter = st.selectbox("الحالة", calls_idx.options['الحالة'])
+        with col3:
+            employee_filter = st.selectbox("الموظف", calls_idx.options['الموظف المسؤول'])
+        
+        # تطبيق الفلاتر
+        filtered_calls = calls_idx.select({
+            'نوع المكالمة': call_type_filter,
+            'الحالة': status_filter,
+            'الموظف المسؤول': employee_filter,
+        })
+        
+        display_table(calls_idx, filtered_calls, "calls_table")
+        
+        # نموذج إدارة المكالمات
+        manage_forms("الكول سنتر", call_center_df)
+    
+    # تبويب الشكاوى
+    elif section == SECTIONS[2]:
+        st.header("❗ إدارة الشكاوى")
+        
+        if show_metrics:
+            display_metrics(complaints_agg, "الشكاوى")
+        
+        if show_charts:
+            col1, col2 = st.columns(2)
+            with col1:
+                complaint_types = complaints_agg['counts']['نوع الشكوى']
+                show_chart("complaints_by_type", data_version, lambda: px.bar(
+                    x=list(complaint_types.values()), y=list(complaint_types.keys()),
+                    orientation='h', title="أنواع الشكاوى"))
+            
+            with col2:
+                def priority_by_status():
+                    priority_status = complaints_df.groupby(['الأولوية', 'الحالة'], observed=True).size().reset_index(name='العدد')
+                    return px.bar(priority_status, x='الأولوية', y='العدد', color='الحالة',
+                                  title="الشكاوى حسب الأولوية والحالة")
+                show_chart("complaints_priority_status", data_version, priority_by_status)
+        
+        # إحصائيات الشكاوى
+        st.subheader("📊 إحصائيات الشكاوى")
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            total_complaints = complaints_agg['total']
+            st.metric("إجمالي الشكاوى", total_complaints)
+        
+        with col2:
+            resolved_complaints = aggregate_count(complaints_agg, 'الحالة', 'تم الحل')
+            st.metric("تم الحل", resolved_complaints)
+        
+        with col3:
+            pending_complaints = aggregate_count(complaints_agg, 'الحالة', 'قيد المعالجة')
+            st.metric("قيد المعالجة", pending_complaints)
+        
+        with col4:
+            high_priority = aggregate_count(complaints_agg, 'الأولوية', 'عالي')
+            st.metric("أولوية عالية", high_priority)
+        
+        # فلترة الشكاوى
+        st.subheader("🔍 فلترة الشكاوى")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            complaint_type_filter = st.selectbox("نوع الشكوى", complaints_idx.options['نوع الشكوى'])
         with col2:
-            search_term = st.text_input("البحث في أسماء العملاء")
+            priority_filter = st.selectbox("الأولوية", complaints_idx.options['الأولوية'])
+        with col3:
+            complaint_status_filter = st.selectbox("حالة الشكوى", complaints_idx.options['الحالة'])
         
         # تطبيق فلاتر الشكاوى
-        filtered_complaints = complaints_df.copy()
-        if complaint_type_filter != "الكل":
-            filtered_complaints = filtered_complaints[filtered_complaints['نوع الشكوى'] == complaint_type_filter]
-        if priority_filter != "الكل":
-            filtered_complaints = filtered_complaints[filtered_complaints['الأولوية'] == priority_filter]
-        if complaint_status_filter != "الكل":
-            filtered_complaints = filtered_complaints[filtered_complaints['الحالة'] == complaint_status_filter]
+        filtered_complaints = complaints_idx.select({
+            'نوع الشكوى': complaint_type_filter,
+            'الأولوية': priority_filter,
+            'الحالة': complaint_status_filter,
+        })
         
-        st.dataframe(filtered_complaints, use_container_width=True, height=400)
+        display_table(complaints_idx, filtered_complaints, "complaints_table")
         
         # نموذج إدارة الشكاوى
         manage_forms("الشكاوى", complaints_df)
     
     # تبويب البيك أب
-    with tab4:
+    elif section == SECTIONS[3]:
         st.header("🚚 إدارة البيك أب")
         
         if show_metrics:
-            display_metrics(pickup_df, "البيك أب")
+            display_metrics(pickup_agg, "البيك أب")
         
         if show_charts:
             col1, col2 = st.columns(2)
             with col1:
-                service_types = pickup_df['نوع الخدمة'].value_counts()
-                fig = px.pie(values=service_types.values, names=service_types.index,
-                           title="توزيع أنواع الخدمات")
-                st.plotly_chart(fig, use_container_width=True)
+                service_types = pickup_agg['counts']['نوع الخدمة']
+                show_chart("pickup_by_service", data_version, lambda: px.pie(
+                    values=list(service_types.values()), names=list(service_types.keys()),
+                    title="توزيع أنواع الخدمات"))
             
             with col2:
-                driver_workload = pickup_df['السائق'].value_counts()
-                fig = px.bar(x=driver_workload.index, y=driver_workload.values,
-                           title="عدد المهام لكل سائق")
-                st.plotly_chart(fig, use_container_width=True)
+                window = st.selectbox("الفترة", list(WORKLOAD_WINDOWS), index=2, key="pickup_workload_window")
+                workload, end = workload_index.window("البيك أب", WORKLOAD_WINDOWS[window])
+                show_chart("pickup_by_driver", data_version, lambda: px.bar(
+                    workload, x='السائق', y='العدد', color='الوقت المطلوب',
+                    title=f"عدد المهام لكل سائق حسب الفترة ({window})"), filter_state=(window, end))
         
         # جدولة البيك أب
         st.subheader("📅 جدولة البيك أب")
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            scheduled_pickups = len(pickup_df[pickup_df['الحالة'] == 'مجدول'])
+            scheduled_pickups = aggregate_count(pickup_agg, 'الحالة', 'مجدول')
             st.metric("مجدول", scheduled_pickups)
         
         with col2:
-            in_progress = len(pickup_df[pickup_df['الحالة'] == 'في الطريق'])
+            in_progress = aggregate_count(pickup_agg, 'الحالة', 'في الطريق')
             st.metric("في الطريق", in_progress)
         
         with col3:
-            completed = len(pickup_df[pickup_df['الحالة'] == 'مكتمل'])
+            completed = aggregate_count(pickup_agg, 'الحالة', 'مكتمل')
             st.metric("مكتمل", completed)
         
         # فلترة البيك أب
         st.subheader("🔍 فلترة البيك أب")
         col1, col2, col3 = st.columns(3)
         with col1:
-            service_filter = st.selectbox("نوع الخدمة", 
-                                        ["الكل"] + list(pickup_df['نوع الخدمة'].unique()))
+            service_filter = st.selectbox("نوع الخدمة", pickup_idx.options['نوع الخدمة'])
         with col2:
-            driver_filter = st.selectbox("السائق", 
-                                       ["الكل"] + list(pickup_df['السائق'].unique()))
+            driver_filter = st.selectbox("السائق", pickup_idx.options['السائق'])
         with col3:
-            pickup_status_filter = st.selectbox("حالة البيك أب", 
-                                              ["الكل"] + list(pickup_df['الحالة'].unique()))
+            pickup_status_filter = st.selectbox("حالة البيك أب", pickup_idx.options['الحالة'])
         
         # تطبيق فلاتر البيك أب
-        filtered_pickup = pickup_df.copy()
-        if service_filter != "الكل":
-            filtered_pickup = filtered_pickup[filtered_pickup['نوع الخدمة'] == service_filter]
-        if driver_filter != "الكل":
-            filtered_pickup = filtered_pickup[filtered_pickup['السائق'] == driver_filter]
-        if pickup_status_filter != "الكل":
-            filtered_pickup = filtered_pickup[filtered_pickup['الحالة'] == pickup_status_filter]
+        filtered_pickup = pickup_idx.select({
+            'نوع الخدمة': service_filter,
+            'السائق': driver_filter,
+            'الحالة': pickup_status_filter,
+        })
         
-        st.dataframe(filtered_pickup, use_container_width=True, height=400)
+        display_table(pickup_idx, filtered_pickup, "pickup_table")
         
-        # نموذج إدارة البيك أب
-        manage_forms("البيك أب", pickup_df)
+        # نموذج إدارة البيك أب مع سعة السائقين
+        schedule_index = get_schedule_index(data_source(data_version))
+        schedule_index.sync(pickup_df, data_version)
+        manage_forms("البيك أب", pickup_df, schedule_index)
     
     # تبويب التقارير
-    with tab5:
+    elif section == SECTIONS[4]:
         st.header("📈 التقارير والإحصائيات")
         
         # نظرة عامة على النظام
@@ -471,13 +3690,13 @@ def main():
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("إجمالي العملاء", len(customers_df))
+            st.metric("إجمالي العملاء", customers_agg['total'])
         with col2:
-            st.metric("إجمالي المكالمات", len(call_center_df))
+            st.metric("إجمالي المكالمات", calls_agg['total'])
         with col3:
-            st.metric("إجمالي الشكاوى", len(complaints_df))
+            st.metric("إجمالي الشكاوى", complaints_agg['total'])
         with col4:
-            st.metric("إجمالي البيك أب", len(pickup_df))
+            st.metric("إجمالي البيك أب", pickup_agg['total'])
         
         # الرسوم البيانية المتقدمة
         st.subheader("📊 الرسوم البيانية المتقدمة")
@@ -486,54 +3705,37 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            # إنشاء بيانات الأداء الشهري
-            monthly_data = {
-                'الشهر': ['يناير', 'فبراير', 'مارس', 'أبريل', 'مايو', 'يونيو', 'يوليو'],
-                'المكالمات': [120, 135, 150, 165, 180, 195, 210],
-                'الشكاوى': [15, 12, 18, 20, 14, 16, 22],
-                'البيك أب': [85, 90, 95, 100, 105, 110, 115]
-            }
-            monthly_df = pd.DataFrame(monthly_data)
-            
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=monthly_df['الشهر'], y=monthly_df['المكالمات'],
-                                   mode='lines+markers', name='المكالمات'))
-            fig.add_trace(go.Scatter(x=monthly_df['الشهر'], y=monthly_df['الشكاوى'],
-                                   mode='lines+markers', name='الشكاوى'))
-            fig.add_trace(go.Scatter(x=monthly_df['الشهر'], y=monthly_df['البيك أب'],
-                                   mode='lines+markers', name='البيك أب'))
-            fig.update_layout(title='الأداء الشهري للأقسام')
-            st.plotly_chart(fig, use_container_width=True)
+            monthly_df = get_report(data_version, 'monthly', frames, aggregates)
+            if monthly_df is not None:
+                def monthly_performance():
+                    fig = go.Figure()
+                    for label in monthly_df.columns[1:]:
+                        fig.add_trace(go.Scatter(x=monthly_df['الشهر'], y=monthly_df[label],
+                                               mode='lines+markers', name=label))
+                    fig.update_layout(title='الأداء الشهري للأقسام')
+                    return fig
+                show_chart("reports_monthly", data_version, monthly_performance)
         
         with col2:
-            # تحليل معدل الرضا
-            satisfaction_data = {
-                'القسم': ['الكول سنتر', 'الشكاوى', 'البيك أب', 'خدمة العملاء'],
-                'معدل الرضا': [85, 78, 92, 88]
-            }
-            satisfaction_df = pd.DataFrame(satisfaction_data)
-            
-            fig = px.bar(satisfaction_df, x='القسم', y='معدل الرضا',
-                        title='معدل رضا العملاء حسب القسم',
-                        color='معدل الرضا',
-                        color_continuous_scale='RdYlGn')
-            st.plotly_chart(fig, use_container_width=True)
+            # معدلات الإنجاز: إكمال المكالمات والبيك أب وحل الشكاوى
+            rates_df = get_report(data_version, 'rates', frames, aggregates)
+            if rates_df is not None:
+                show_chart("reports_rates", data_version, lambda: px.bar(
+                    rates_df, x='القسم', y='معدل الإنجاز',
+                    title='معدل الإنجاز حسب القسم',
+                    color='معدل الإنجاز',
+                    color_continuous_scale='RdYlGn',
+                    range_color=[0, 100]))
         
         # تحليل الاتجاهات
         st.subheader("📈 تحليل الاتجاهات")
         
-        # مقارنة الأداء اليومي
-        daily_performance = {
-            'اليوم': ['الاثنين', 'الثلاثاء', 'الأربعاء', 'الخميس', 'الجمعة', 'السبت', 'الأحد'],
-            'المكالمات': [45, 52, 48, 55, 60, 35, 25],
-            'الشكاوى': [5, 7, 6, 8, 9, 4, 3],
-            'البيك أب': [20, 22, 25, 28, 30, 15, 12]
-        }
-        daily_df = pd.DataFrame(daily_performance)
-        
-        fig = px.line(daily_df, x='اليوم', y=['المكالمات', 'الشكاوى', 'البيك أب'],
-                     title='الأداء اليومي للأقسام')
-        st.plotly_chart(fig, use_container_width=True)
+        # مقارنة ضغط العمل حسب يوم الأسبوع
+        daily_df = get_report(data_version, 'weekday', frames, aggregates)
+        if daily_df is not None:
+            show_chart("reports_weekday", data_version, lambda: px.line(
+                daily_df, x='اليوم', y=list(daily_df.columns[1:]),
+                title='الأداء اليومي للأقسام'))
         
         # تقرير تفصيلي
         st.subheader("📋 تقرير تفصيلي")
@@ -542,46 +3744,49 @@ def main():
                                  ["تقرير شامل", "تقرير العملاء", "تقرير المكالمات", 
                                   "تقرير الشكاوى", "تقرير البيك أب"])
         
+        # التقرير المُنشأ يبقى ظاهراً عند التنقل بين صفحات الجدول
         if st.button("إنشاء التقرير"):
-            with st.spinner("جاري إنشاء التقرير..."):
-                time.sleep(2)  # محاكاة وقت المعالجة
-                
-                if report_type == "تقرير شامل":
+            st.session_state['active_report'] = report_type
+        
+        if st.session_state.get('active_report') == report_type:
+            if report_type == "تقرير شامل":
+                summary = get_report(data_version, 'summary', frames, aggregates)
+                if summary is not None:
                     st.success("تم إنشاء التقرير الشامل بنجاح!")
                     
                     # إحصائيات عامة
                     st.markdown("### الإحصائيات العامة")
+                    totals = summary['totals']
+                    rates = summary['rates']
                     col1, col2 = st.columns(2)
                     with col1:
-                        st.write(f"**إجمالي العملاء:** {len(customers_df)}")
-                        st.write(f"**إجمالي المكالمات:** {len(call_center_df)}")
-                        st.write(f"**إجمالي الشكاوى:** {len(complaints_df)}")
-                        st.write(f"**إجمالي البيك أب:** {len(pickup_df)}")
+                        st.write(f"**إجمالي العملاء:** {totals['العملاء']}")
+                        st.write(f"**إجمالي المكالمات:** {totals['الكول سنتر']}")
+                        st.write(f"**إجمالي الشكاوى:** {totals['الشكاوى']}")
+                        st.write(f"**إجمالي البيك أب:** {totals['البيك أب']}")
                     
                     with col2:
-                        resolved_complaints = len(complaints_df[complaints_df['الحالة'] == 'تم الحل'])
-                        resolution_rate = (resolved_complaints / len(complaints_df)) * 100
-                        st.write(f"**معدل حل الشكاوى:** {resolution_rate:.1f}%")
-                        
-                        completed_calls = len(call_center_df[call_center_df['الحالة'] == 'مكتمل'])
-                        completion_rate = (completed_calls / len(call_center_df)) * 100
-                        st.write(f"**معدل إكمال المكالمات:** {completion_rate:.1f}%")
-                
-                elif report_type == "تقرير العملاء":
-                    st.success("تم إنشاء تقرير العملاء بنجاح!")
-                    st.dataframe(customers_df, use_container_width=True)
-                
-                elif report_type == "تقرير المكالمات":
-                    st.success("تم إنشاء تقرير المكالمات بنجاح!")
-                    st.dataframe(call_center_df, use_container_width=True)
-                
-                elif report_type == "تقرير الشكاوى":
-                    st.success("تم إنشاء تقرير الشكاوى بنجاح!")
-                    st.dataframe(complaints_df, use_container_width=True)
-                
-                elif report_type == "تقرير البيك أب":
-                    st.success("تم إنشاء تقرير البيك أب بنجاح!")
-                    st.dataframe(pickup_df, use_container_width=True)
+                        st.write(f"**معدل حل الشكاوى:** {rates.get('الشكاوى', 0):.1f}%")
+                        st.write(f"**معدل إكمال المكالمات:** {rates.get('المكالمات', 0):.1f}%")
+                        st.write(f"**معدل إكمال البيك أب:** {rates.get('البيك أب', 0):.1f}%")
+            
+            elif report_type == "تقرير العملاء":
+                st.success("تم إنشاء تقرير العملاء بنجاح!")
+                customer_report = get_customer_report(data_version, join_index, frames)
+                display_table(get_filter_index(data_version, "تقرير العملاء", customer_report),
+                              None, "customers_report")
+            
+            elif report_type == "تقرير المكالمات":
+                st.success("تم إنشاء تقرير المكالمات بنجاح!")
+                display_table(calls_idx, None, "calls_report")
+            
+            elif report_type == "تقرير الشكاوى":
+                st.success("تم إنشاء تقرير الشكاوى بنجاح!")
+                display_table(complaints_idx, None, "complaints_report")
+            
+            elif report_type == "تقرير البيك أب":
+                st.success("تم إنشاء تقرير البيك أب بنجاح!")
+                display_table(pickup_idx, None, "pickup_report")
         
         # تصدير البيانات
         st.subheader("📤 تصدير البيانات")
@@ -595,13 +3800,20 @@ def main():
                                      ["جميع البيانات", "العملاء", "المكالمات", "الشكاوى", "البيك أب"])
         
         if st.button("تصدير البيانات"):
-            st.success(f"تم تصدير {export_data} بصيغة {export_format} بنجاح!")
-            st.info("يمكنك تحميل الملف من الرابط أعلاه.")
-    
-    # تحديث تلقائي
-    if auto_refresh:
-        time.sleep(refresh_interval)
-        st.rerun()
+            if export_data == "جميع البيانات":
+                export_frames = {label: frames[name] for label, name in EXPORT_SHEETS.items()}
+            else:
+                export_frames = {export_data: frames[EXPORT_SHEETS[export_data]]}
+            try:
+                with st.spinner("جاري تجهيز الملف..."):
+                    path, filename, mime = export_data_file(export_data, export_format, export_frames)
+                st.success(f"تم تصدير {export_data} بصيغة {export_format} بنجاح!")
+                # زر التحميل يقرأ الملف كاملاً في الذاكرة، فيُنشأ في دورة التصدير فقط
+                # ولا يُعاد فتح الملف في كل إعادة تشغيل لاحقة للصفحة
+                with open(path, 'rb') as fh:
+                    st.download_button("⬇️ تحميل الملف", fh, file_name=filename, mime=mime)
+            except Exception as e:
+                st.error(f"خطأ في التصدير: {e}")
     
     # معلومات النظام في أسفل الصفحة
     st.markdown("---")
@@ -611,121 +3823,13 @@ def main():
         <p>آخر تحديث: """ + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + """</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    # لوحة الأداء تُعرض في نهاية الجولة بعد اكتمال القياسات
+    run = metrics.finish_run()
+    if show_performance:
+        with st.sidebar.expander("⏱️ الأداء", expanded=True):
+            display_performance_panel(metrics, run)
 
 # تشغيل التطبيق
 if __name__ == "__main__":
-    main()ق الفلاتر
-        filtered_df = customers_df.copy()
-        if city_filter != "الكل":
-            filtered_df = filtered_df[filtered_df['المدينة'] == city_filter]
-        if search_term:
-            filtered_df = filtered_df[filtered_df['اسم العميل'].str.contains(search_term, na=False)]
-        
-        st.dataframe(filtered_df, use_container_width=True, height=400)
-        
-        # نموذج إدارة العملاء
-        manage_forms("العملاء", customers_df)
-    
-    # تبويب الكول سنتر
-    with tab2:
-        st.header("📞 إدارة الكول سنتر")
-        
-        if show_metrics:
-            display_metrics(call_center_df, "المكالمات")
-        
-        if show_charts:
-            col1, col2 = st.columns(2)
-            with col1:
-                call_types = call_center_df['نوع المكالمة'].value_counts()
-                fig = px.pie(values=call_types.values, names=call_types.index,
-                           title="توزيع أنواع المكالمات")
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                avg_duration = call_center_df.groupby('الموظف المسؤول')['مدة المكالمة (دقيقة)'].mean()
-                fig = px.bar(x=avg_duration.index, y=avg_duration.values,
-                           title="متوسط مدة المكالمات لكل موظف")
-                st.plotly_chart(fig, use_container_width=True)
-        
-        # فلترة المكالمات
-        st.subheader("🔍 فلترة المكالمات")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            call_type_filter = st.selectbox("نوع المكالمة", 
-                                          ["الكل"] + list(call_center_df['نوع المكالمة'].unique()))
-        with col2:
-            status_filter = st.selectbox("الحالة", 
-                                       ["الكل"] + list(call_center_df['الحالة'].unique()))
-        with col3:
-            employee_filter = st.selectbox("الموظف", 
-                                         ["الكل"] + list(call_center_df['الموظف المسؤول'].unique()))
-        
-        # تطبيق الفلاتر
-        filtered_calls = call_center_df.copy()
-        if call_type_filter != "الكل":
-            filtered_calls = filtered_calls[filtered_calls['نوع المكالمة'] == call_type_filter]
-        if status_filter != "الكل":
-            filtered_calls = filtered_calls[filtered_calls['الحالة'] == status_filter]
-        if employee_filter != "الكل":
-            filtered_calls = filtered_calls[filtered_calls['الموظف المسؤول'] == employee_filter]
-        
-        st.dataframe(filtered_calls, use_container_width=True, height=400)
-        
-        # نموذج إدارة المكالمات
-        manage_forms("الكول سنتر", call_center_df)
-    
-    # تبويب الشكاوى
-    with tab3:
-        st.header("❗ إدارة الشكاوى")
-        
-        if show_metrics:
-            display_metrics(complaints_df, "الشكاوى")
-        
-        if show_charts:
-            col1, col2 = st.columns(2)
-            with col1:
-                complaint_types = complaints_df['نوع الشكوى'].value_counts()
-                fig = px.bar(x=complaint_types.values, y=complaint_types.index,
-                           orientation='h', title="أنواع الشكاوى")
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                priority_status = complaints_df.groupby(['الأولوية', 'الحالة']).size().reset_index(name='العدد')
-                fig = px.bar(priority_status, x='الأولوية', y='العدد', color='الحالة',
-                           title="الشكاوى حسب الأولوية والحالة")
-                st.plotly_chart(fig, use_container_width=True)
-        
-        # إحصائيات الشكاوى
-        st.subheader("📊 إحصائيات الشكاوى")
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            total_complaints = len(complaints_df)
-            st.metric("إجمالي الشكاوى", total_complaints)
-        
-        with col2:
-            resolved_complaints = len(complaints_df[complaints_df['الحالة'] == 'تم الحل'])
-            st.metric("تم الحل", resolved_complaints)
-        
-        with col3:
-            pending_complaints = len(complaints_df[complaints_df['الحالة'] == 'قيد المعالجة'])
-            st.metric("قيد المعالجة", pending_complaints)
-        
-        with col4:
-            high_priority = len(complaints_df[complaints_df['الأولوية'] == 'عالي'])
-            st.metric("أولوية عالية", high_priority)
-        
-        # فلترة الشكاوى
-        st.subheader("🔍 فلترة الشكاوى")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            complaint_type_filter = st.selectbox("نوع الشكوى", 
-                                               ["الكل"] + list(complaints_df['نوع الشكوى'].unique()))
-        with col2:
-            priority_filter = st.selectbox("الأولوية", 
-                                         ["الكل"] + list(complaints_df['الأولوية'].unique()))
-        with col3:
-            complaint_status_filter = st.selectbox("حالة الشكوى", 
-                                                 ["الكل"] + list(complaints_df['الحالة'].unique()))
-        
-        # تطبي
+    main()
@@ -0,0 +1,431 @@
+"""قياس أداء المسارات الرئيسية للتطبيق ببيانات اصطناعية دون متصفح
+
+أمثلة:
+    python benchmark.py                                   # 10k و100k و1M صف
+    python benchmark.py --rows 10000 100000 --output benchmarks/baseline.json
+    python benchmark.py --baseline benchmarks/baseline.json   # مقارنة وفشل عند التراجع
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# التطبيق يستدعي st.* عند الاستيراد؛ خارج الخادم تكفي رسائل الأخطاء
+# (تحميل الإعدادات أولاً حتى لا تعيد مستوى السجل الافتراضي)
+streamlit.config.get_option("logger.level")
+streamlit.logger.set_log_level("error")
+import app  # noqa: E402
+import fake_sheets  # noqa: E402
+
+# أحجام البيانات الافتراضية وعدد مرات التكرار لكل قياس
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_REPEATS = 3
+
+# القياس الأبطأ من خط الأساس بهذه النسبة يُعد تراجعاً (الفروق الأصغر من
+# REGRESSION_MIN_SECONDS تُهمل لأنها ضمن تذبذب القياس)
+REGRESSION_THRESHOLD = 1.25
+REGRESSION_MIN_SECONDS = 0.005
+
+# التواريخ الاصطناعية تغطي هذه المدة حتى آخر تاريخ في البيانات التجريبية
+DATE_SPAN_DAYS = 730
+
+# نسبة الصفوف المضافة قبل قياس المزامنة التزايدية
+TAIL_FRACTION = 0.01
+
+# الحد الأقصى لعدد خلايا جدول Google Sheets
+SHEETS_MAX_CELLS = 10_000_000
+
+# إعدادات اختبار الحمل الافتراضية: زمن الطلب وتذبذبه (ثانية)، وانتظار المستخدم بين
+# الجولات، ومهلة صلاحية الذاكرة المؤقتة التي تطلبها كل جولة
+LOAD_LATENCY = 0.2
+LOAD_JITTER = 0.5
+LOAD_THINK_TIME = 1.0
+LOAD_MAX_AGE = 30
+
+# كلمات البحث المقاسة (جزئي وبادئة ورقم)
+SEARCH_TERMS = ["أحمد", "مح", "C00012", "0112"]
+
+
+# مولد البيانات الاصطناعية
+def id_values(prefix, rows):
+    """معرفات متسلسلة بنفس بادئة البيانات التجريبية (C000001، CC000002...)"""
+    width = max(3, len(str(rows)))
+    return np.char.add(prefix, np.char.zfill(np.arange(1, rows + 1).astype(str), width))
+
+def name_values(rng, vocabulary, rows):
+    """أسماء من تركيب الأسماء الأولى والأخيرة في البيانات التجريبية"""
+    parts = [name.split(' ', 1) for name in vocabulary]
+    first = np.array([p[0] for p in parts])
+    last = np.array([p[-1] for p in parts])
+    return np.char.add(np.char.add(rng.choice(first, rows), ' '), rng.choice(last, rows))
+
+def phone_values(rng, rows):
+    """أرقام هواتف من 11 رقماً تبدأ بـ 01"""
+    return np.char.add('01', np.char.zfill(rng.integers(0, 10 ** 9, rows).astype(str), 9))
+
+def time_values(rng, rows):
+    """أوقات HH:MM خلال ساعات العمل"""
+    hours = np.char.zfill(rng.integers(8, 21, rows).astype(str), 2)
+    minutes = np.char.zfill(rng.integers(0, 60, rows).astype(str), 2)
+    return np.char.add(np.char.add(hours, ':'), minutes)
+
+def date_values(rng, vocabulary, rows):
+    """تواريخ بصيغة DATE_FORMAT خلال DATE_SPAN_DAYS حتى آخر تاريخ تجريبي"""
+    end = pd.to_datetime(vocabulary).max().to_datetime64().astype('datetime64[D]')
+    days = end - rng.integers(0, DATE_SPAN_DAYS, rows).astype('timedelta64[D]')
+    return np.datetime_as_string(days, unit='D')
+
+def generate_frames(rows, seed=0):
+    """بيانات اصطناعية بنفس مخططات ومفردات load_sample_data، rows صف لكل ورقة
+
+    المعرفات متسلسلة، وأرقام العملاء في باقي الأوراق تشير إلى عملاء موجودين، والقيم
+    الفئوية والنصوص من مفردات البيانات التجريبية. النتيجة ثابتة لنفس (rows، seed).
+    """
+    rng = np.random.default_rng(seed)
+    sample = dict(zip(app.SHEET_NAMES, app.load_sample_data()))
+    customer_ids = id_values(re.match(r'\D*', sample["العملاء"][app.JOIN_COLUMN].iloc[0]).group(), rows)
+
+    frames = {}
+    for sheet_name, sample_df in sample.items():
+        data = {}
+        for column, kind in app.SHEET_SCHEMAS[sheet_name].items():
+            vocabulary = sample_df[column].astype(str).unique()
+            if column == app.ID_COLUMNS[sheet_name]:
+                data[column] = id_values(re.match(r'\D*', vocabulary[0]).group(), rows)
+            elif column == app.JOIN_COLUMN:
+                data[column] = rng.choice(customer_ids, rows)
+            elif kind == 'date':
+                data[column] = date_values(rng, sample_df[column], rows)
+            elif kind == 'int16':
+                data[column] = rng.integers(1, 61, rows)
+            elif column == 'اسم العميل':
+                data[column] = name_values(rng, vocabulary, rows)
+            elif column == 'رقم الهاتف':
+                data[column] = phone_values(rng, rows)
+            elif column == 'البريد الإلكتروني':
+                data[column] = np.char.add(np.char.add('user', np.arange(rows).astype(str)), '@email.com')
+            elif column == 'وقت المكالمة':
+                data[column] = time_values(rng, rows)
+            else:
+                data[column] = rng.choice(vocabulary, rows)
+        frames[sheet_name] = app.apply_schema(pd.DataFrame(data), sheet_name)
+    return frames
+
+def frame_to_values(df):
+    """قيم الورقة كما يرجعها Sheets: صف العناوين ثم الصفوف كنصوص"""
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns[column] = values.dt.strftime(app.DATE_FORMAT)
+        else:
+            columns[column] = values.astype(str)
+    return [list(df.columns)] + pd.DataFrame(columns).values.tolist()
+
+
+def fake_manager(backend, spreadsheet_id="benchmark"):
+    """GoogleSheetsManager متصل بجدول FakeSheetsBackend بدلاً من gspread"""
+    return app.GoogleSheetsManager({}, spreadsheet_id, client=fake_sheets.FakeClient(backend))
+
+def pin_singletons(root, quota_per_minute=10 ** 9):
+    """تثبيت الكائنات المشتركة للقياس بـ app.pin_singletons
+
+    المخازن المحلية تُوجه إلى مجلد مؤقت ولا تكتب في الخلفية (تُقاس منفصلة في
+    local_stores)، والمجدول بحصة غير محدودة افتراضياً حتى لا يُقاس الانتظار.
+    """
+    singletons = app.pin_singletons(
+        get_sheet_cache=app.SheetCache(),
+        get_perf_metrics=app.PerfMetrics(log_path=None),
+        get_request_scheduler=app.RequestScheduler(quota_per_minute=quota_per_minute),
+        get_snapshot_store=app.SnapshotStore(root=os.path.join(root, "snapshots")),
+        get_history_store=app.HistoryStore(root=os.path.join(root, "history")),
+    )
+    for store in ('get_snapshot_store', 'get_history_store'):
+        singletons[store].save_async = lambda *args, **kwargs: None
+    return singletons
+
+
+# القياسات
+def measure(fn, repeats):
+    """أزمنة fn عبر repeats تكراراً"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'repeats': repeats}
+
+def run_suite(rows, repeats, seed=0, only=None):
+    """تشغيل كل القياسات على بيانات بحجم rows وإرجاع {اسم القياس: الأزمنة}
+
+    قيم Sheets النصية تُبنى فقط للقياسات التي تحتاجها لأنها أكبر بكثير من الإطارات.
+    """
+    frames = generate_frames(rows, seed)
+    customers, calls = frames["العملاء"], frames["الكول سنتر"]
+    calls_index = app.FilterIndex(calls, app.FILTER_COLUMNS["الكول سنتر"])
+    aggregates = app.get_aggregates.__wrapped__("benchmark", "الكول سنتر", calls)
+    report_aggregates = {name: app.get_aggregates.__wrapped__("benchmark", name, df) for name, df in frames.items()}
+    first = lambda column: calls[column].cat.categories[0]
+    results = {}
+
+    def record(name, fn):
+        results[name] = measure(fn, repeats)
+        print(f"  {name:<20} {results[name]['median'] * 1000:>10.1f} ms", flush=True)
+
+    def selected(name):
+        return not only or name in only
+
+    def search():
+        index = app.CustomerSearchIndex()
+        index.sync(customers)
+        for term in SEARCH_TERMS:
+            index.search(term)
+
+    def export(export_format):
+        return lambda: app.write_export({"المكالمات": calls}, export_format, io.BytesIO())
+
+    def round_trip(values, root):
+        """مزامنة كاملة ثم تزايدية بعد إضافة صفوف ثم قراءة من الذاكرة المؤقتة"""
+        pin_singletons(root)
+        backend = fake_sheets.FakeSheetsBackend(values)
+        manager = fake_manager(backend)
+        manager.get_worksheets_data(app.SHEET_NAMES)
+        for name in app.SHEET_NAMES:
+            backend.append(name, values[name][-max(1, int(rows * TAIL_FRACTION)):])
+            app.get_sheet_cache().expire(manager.spreadsheet_id, name)
+        manager.get_worksheets_data(app.SHEET_NAMES)
+        manager.get_worksheets_data(app.SHEET_NAMES)
+
+    def local_stores(root):
+        """كتابة النسخة المحلية وملخصات السجل الشهرية لكل الأوراق"""
+        app.SnapshotStore(root=os.path.join(root, "snapshots")).save("benchmark", frames)
+        app.HistoryStore(root=os.path.join(root, "history")).save(
+            "benchmark", {name: frames[name] for name in app.PARTITIONED_SHEETS})
+
+    if selected('ingest'):
+        values = frame_to_values(calls)
+        record('ingest', lambda: app.values_to_dataframe(values, sheet_name="الكول سنتر"))
+        del values
+
+    cases = {
+        'aggregates': lambda: [app.get_aggregates.__wrapped__("benchmark", name, df)
+                               for name, df in frames.items()],
+        'display_metrics': lambda: app.display_metrics(aggregates, "المكالمات"),
+        'filter_index': lambda: app.FilterIndex(calls, app.FILTER_COLUMNS["الكول سنتر"]),
+        'filter_select': lambda: calls_index.select({
+            'نوع المكالمة': first('نوع المكالمة'),
+            'الحالة': first('الحالة'),
+            'الموظف المسؤول': app.ALL_OPTION,
+        }),
+        'sort_order': lambda: app.FilterIndex(calls, []).sort_order('تاريخ المكالمة'),
+        'search': search,
+        'create_charts': lambda: [app.create_charts(df, chart_type, name)
+                                  for name, df in frames.items() for chart_type in ("pie", "bar")],
+        'reports': lambda: [build(frames, report_aggregates) for build in app.REPORT_BUILDERS.values()],
+        'join_index': lambda: app.CustomerJoinIndex().sync(frames),
+        'workload_index': lambda: app.WorkloadIndex().sync(frames),
+        'schedule_index': lambda: app.ScheduleIndex().sync(frames["البيك أب"]),
+        'export_csv': export("CSV"),
+        'export_jsonl': export("JSON"),
+        'export_excel': export("Excel"),
+    }
+    for name, fn in cases.items():
+        if selected(name) and not (name == 'export_excel' and rows >= app.EXCEL_MAX_ROWS):
+            record(name, fn)
+    if selected('local_stores'):
+        with tempfile.TemporaryDirectory() as root:
+            record('local_stores', lambda: local_stores(root))
+
+    # جدول أكبر من حد خلايا Sheets لا يمكن جلبه من الأساس
+    cells = rows * sum(len(df.columns) for df in frames.values())
+    if selected('sheets_round_trip') and cells <= SHEETS_MAX_CELLS:
+        values = {name: frame_to_values(df) for name, df in frames.items()}
+        with tempfile.TemporaryDirectory() as root:
+            record('sheets_round_trip', lambda: round_trip(values, root))
+    return results
+
+def run_load_test(rows, sessions, duration, seed=0, latency=LOAD_LATENCY, jitter=LOAD_JITTER,
+                  quota_per_minute=app.SHEETS_QUOTA_PER_MINUTE, edit_interval=None,
+                  max_age=LOAD_MAX_AGE, write_ratio=0.0, think_time=LOAD_THINK_TIME, request_log=None):
+    """sessions جلسة متزامنة على جدول FakeSheetsBackend لمدة duration ثانية
+
+    كل جولة تحمّل أوراق قسم عشوائي كما تفعل load_data (مع التحميل المسبق لباقي الأوراق)
+    وتضيف سجلاً باحتمال write_ratio. الجلسات تتشارك المدير والذاكرة المؤقتة والمجدول
+    كما في خادم واحد، وتعديلات المستخدمين الآخرين تُحاكى كل edit_interval ثانية.
+    """
+    frames = generate_frames(rows, seed)
+    values = {name: frame_to_values(df) for name, df in frames.items()}
+    del frames
+    backend = fake_sheets.FakeSheetsBackend(values, latency=latency, jitter=jitter,
+                                            quota_per_minute=quota_per_minute, seed=seed)
+    runs = []
+
+    with tempfile.TemporaryDirectory() as root:
+        pin_singletons(root, quota_per_minute=app.SHEETS_QUOTA_PER_MINUTE)
+        manager = fake_manager(backend, "load-test")
+        if edit_interval:
+            backend.start_editor(edit_interval)
+        deadline = time.monotonic() + duration
+
+        def session(number):
+            rng = random.Random(seed + number)
+            metrics = app.get_perf_metrics()
+            while time.monotonic() < deadline:
+                metrics.start_run(f"session-{number}")
+                sheets = app.SECTION_SHEETS[rng.choice(app.SECTIONS)]
+                manager.get_worksheets_data(sheets, max_age=max_age)
+                manager.prefetch([name for name in app.SHEET_NAMES if name not in sheets])
+                if rng.random() < write_ratio:
+                    sheet_name = rng.choice(app.SHEET_NAMES)
+                    record = list(values[sheet_name][rng.randrange(1, len(values[sheet_name]))])
+                    record[0] = f"W{number}-{len(runs)}"
+                    manager.add_record(sheet_name, record)
+                runs.append(metrics.finish_run())
+                time.sleep(rng.uniform(0, 2 * think_time))
+
+        threads = [threading.Thread(target=session, args=(i,), name=f"session-{i}")
+                   for i in range(sessions)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        backend.stop_editor()
+        manager._prefetcher.shutdown(wait=True)
+
+    if request_log:
+        backend.save_log(request_log)
+    durations = sorted(run['duration'] for run in runs)
+    api_calls = [sum(v for k, v in run['counters'].items() if k.startswith('sheets_api_calls'))
+                 for run in runs]
+    stats = backend.stats()
+    by_method = {}
+    for (method, status), count in stats.items():
+        by_method.setdefault(method, {})[str(status)] = count
+    requests_made = sum(count for (_, status), count in stats.items() if status == 200)
+    return {
+        'sessions': sessions,
+        'elapsed': elapsed,
+        'reruns': len(runs),
+        'reruns_per_second': len(runs) / elapsed,
+        'rerun_p50': statistics.median(durations),
+        'rerun_p95': durations[int(0.95 * (len(durations) - 1))],
+        'rerun_max': durations[-1],
+        'api_calls_per_rerun': statistics.mean(api_calls),
+        'requests': requests_made,
+        'requests_per_minute': requests_made * 60 / elapsed,
+        'throttled': sum(count for (_, status), count in stats.items() if status == 429),
+        'by_method': by_method,
+    }
+
+def environment():
+    """بيانات البيئة المحفوظة مع النتائج لتفسير الفروق بين الأجهزة"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+    }
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """القياسات الأبطأ من خط الأساس بأكثر من threshold كقائمة (الحجم، القياس، النسبة)
+
+    المقارنة بأقل زمن لأنه الأقل تأثراً بالعمليات الأخرى على الجهاز.
+    """
+    regressions = []
+    for rows, cases in results['results'].items():
+        for name, timing in cases.items():
+            base = baseline.get('results', {}).get(rows, {}).get(name)
+            if base is None or base['min'] <= 0:
+                continue
+            ratio = timing['min'] / base['min']
+            if ratio > threshold and timing['min'] - base['min'] > REGRESSION_MIN_SECONDS:
+                regressions.append((rows, name, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء التطبيق ببيانات اصطناعية")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS,
+                        help="عدد الصفوف لكل ورقة (يمكن تحديد عدة أحجام)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="تشغيل قياسات محددة فقط")
+    parser.add_argument("--output", help="حفظ النتائج في ملف JSON (مثل benchmarks/baseline.json)")
+    parser.add_argument("--baseline", help="ملف نتائج سابق للمقارنة؛ يفشل التشغيل عند التراجع")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    load = parser.add_argument_group("اختبار الحمل على جدول بديل (fake_sheets)")
+    load.add_argument("--sessions", type=int, help="عدد الجلسات المتزامنة؛ يشغّل اختبار الحمل بدلاً من القياسات")
+    load.add_argument("--duration", type=float, default=60, help="مدة الاختبار (ثانية)")
+    load.add_argument("--latency", type=float, default=LOAD_LATENCY, help="زمن كل طلب (ثانية)")
+    load.add_argument("--jitter", type=float, default=LOAD_JITTER, help="تذبذب الزمن كنسبة منه")
+    load.add_argument("--quota", type=int, default=app.SHEETS_QUOTA_PER_MINUTE,
+                      help="حصة الجدول البديل من الطلبات في الدقيقة")
+    load.add_argument("--edit-interval", type=float, help="تعديل من مستخدم آخر كل N ثانية")
+    load.add_argument("--max-age", type=float, default=LOAD_MAX_AGE,
+                      help="مهلة صلاحية الذاكرة المؤقتة في كل جولة (ثانية)")
+    load.add_argument("--write-ratio", type=float, default=0.0, help="احتمال إضافة سجل في كل جولة")
+    load.add_argument("--think-time", type=float, default=LOAD_THINK_TIME,
+                      help="متوسط الانتظار بين جولات الجلسة (ثانية)")
+    load.add_argument("--request-log", help="حفظ سجل طلبات الجدول البديل بصيغة JSON Lines")
+    args = parser.parse_args(argv)
+
+    results = {'environment': environment(), 'seed': args.seed}
+    if args.sessions:
+        results['load_test'] = {}
+        for rows in args.rows:
+            print(f"{rows:,} صف لكل ورقة، {args.sessions} جلسة، {args.duration:g} ثانية", flush=True)
+            summary = run_load_test(rows, args.sessions, args.duration, args.seed, args.latency,
+                                    args.jitter, args.quota, args.edit_interval, args.max_age,
+                                    args.write_ratio, args.think_time, args.request_log)
+            results['load_test'][str(rows)] = summary
+            print(f"  جولات: {summary['reruns']} ({summary['reruns_per_second']:.2f}/ث)، "
+                  f"الزمن p50/p95: {summary['rerun_p50'] * 1000:.0f}/{summary['rerun_p95'] * 1000:.0f} ms")
+            print(f"  طلبات Sheets: {summary['requests']} ({summary['requests_per_minute']:.1f}/دقيقة)، "
+                  f"لكل جولة: {summary['api_calls_per_rerun']:.2f}، 429: {summary['throttled']}")
+    else:
+        results['results'] = {}
+        for rows in args.rows:
+            print(f"{rows:,} صف لكل ورقة", flush=True)
+            results['results'][str(rows)] = run_suite(rows, args.repeats, args.seed, args.only)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+        print(f"تم حفظ النتائج في {args.output}")
+
+    if args.baseline and not args.sessions:
+        with open(args.baseline, encoding='utf-8') as fh:
+            regressions = compare(results, json.load(fh), args.threshold)
+        for rows, name, ratio in regressions:
+            print(f"تراجع: {name} ({rows} صف) أبطأ {ratio:.2f}x من خط الأساس")
+        if regressions:
+            return 1
+        print("لا يوجد تراجع عن خط الأساس")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
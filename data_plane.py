@@ -0,0 +1,87 @@
+"""عامل تحميل مستوى البيانات المشترك لتشغيل عدة عمليات Streamlit خلف موازن حمل
+
+العامل وحده يزامن جدول Google Sheets وينشر الأوراق بصيغة Arrow IPC في DATA_PLANE_DIR،
+وكل عملية عرض تعيّن الملفات في الذاكرة بدلاً من جلب البيانات ونسخها لكل جلسة:
+
+    export DATA_PLANE_DIR=/dev/shm/callcenter
+    python data_plane.py --credentials credentials.json --spreadsheet-id <ID>
+    streamlit run app.py --server.port 8501
+    streamlit run app.py --server.port 8502
+
+للتجربة دون Google Sheets: python data_plane.py --fake-rows 100000
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+import streamlit.config
+import streamlit.logger
+
+# العامل يعمل خارج خادم Streamlit؛ تكفي رسائل الأخطاء
+streamlit.config.get_option("logger.level")
+streamlit.logger.set_log_level("error")
+import app  # noqa: E402
+
+logger = logging.getLogger("data_plane")
+
+
+def connect(args):
+    """مدير الجدول: Google Sheets بملف الاعتماد، أو جدول بديل ببيانات اصطناعية"""
+    if args.fake_rows:
+        import benchmark
+        import fake_sheets
+        frames = benchmark.generate_frames(args.fake_rows)
+        backend = fake_sheets.FakeSheetsBackend(
+            {name: benchmark.frame_to_values(df) for name, df in frames.items()})
+        if args.fake_edit_interval:
+            backend.start_editor(args.fake_edit_interval)
+        return app.GoogleSheetsManager({}, "fake", client=fake_sheets.FakeClient(backend))
+    with open(args.credentials, encoding='utf-8') as f:
+        return app.GoogleSheetsManager(json.load(f), args.spreadsheet_id)
+
+def run(manager, plane, interval, once=False):
+    """مزامنة الأوراق كل interval ثانية ونشر نسخة جديدة عند تغيّر البيانات فقط"""
+    cache = app.get_sheet_cache()
+    published = None
+    while True:
+        started = time.monotonic()
+        frames = manager.get_worksheets_data(app.SHEET_NAMES, max_age=interval)
+        version = cache.data_version(manager.spreadsheet_id)
+        if version != published and all(len(df.columns) for df in frames.values()):
+            plane_version = plane.publish(manager.spreadsheet_id, frames)
+            published = version
+            logger.info("نُشرت النسخة %s (%s صف) في %.2f ثانية", plane_version,
+                        sum(len(df) for df in frames.values()), time.monotonic() - started)
+        if once:
+            return
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="عامل تحميل مستوى البيانات المشترك")
+    parser.add_argument("--credentials", help="ملف اعتماد حساب الخدمة JSON")
+    parser.add_argument("--spreadsheet-id", help="معرف الجدول")
+    parser.add_argument("--root", default=app.DATA_PLANE_DIR,
+                        help="مجلد النشر (افتراضياً DATA_PLANE_DIR)")
+    parser.add_argument("--interval", type=float, default=app.DATA_PLANE_INTERVAL,
+                        help="الثواني بين المزامنات")
+    parser.add_argument("--once", action="store_true", help="مزامنة ونشر مرة واحدة ثم الخروج")
+    parser.add_argument("--fake-rows", type=int, help="جدول بديل بهذا العدد من الصفوف بدلاً من Google Sheets")
+    parser.add_argument("--fake-edit-interval", type=float, help="تعديلات محاكاة على الجدول البديل كل N ثانية")
+    args = parser.parse_args(argv)
+    if not args.root:
+        parser.error("حدد مجلد النشر بـ --root أو متغير البيئة DATA_PLANE_DIR")
+    if not args.fake_rows and not (args.credentials and args.spreadsheet_id):
+        parser.error("حدد --credentials و --spreadsheet-id أو --fake-rows")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    app.pin_singletons()
+    manager = connect(args)
+    if manager.workbook is None:
+        return 1
+    run(manager, app.DataPlane(args.root), args.interval, args.once)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""جدول Google Sheets بديل داخل العملية لاختبار GoogleSheetsManager دون استهلاك الحصة
+
+يحاكي تأخير الشبكة، وحصة الطلبات في الدقيقة (خطأ 429 عند تجاوزها)، وتعديلات المستخدمين
+الآخرين المتزامنة، ويسجل كل طلب. الاستخدام:
+
+    backend = FakeSheetsBackend(values, latency=0.2, quota_per_minute=60)
+    manager = app.GoogleSheetsManager({}, "fake", client=FakeClient(backend))
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+import gspread
+import requests
+
+# طول نافذة حساب الحصة (ثانية)
+QUOTA_WINDOW = 60
+
+
+def api_error(status_code, message):
+    """خطأ gspread.exceptions.APIError كما يرفعه gspread لاستجابة Sheets بهذا الرمز"""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps({'error': {'code': status_code, 'message': message}}).encode('utf-8')
+    return gspread.exceptions.APIError(response)
+
+def parse_range(a1_range):
+    """(اسم الورقة أو None، أول صف، آخر صف أو None) من نطاق A1 مثل 'ورقة'!A5:H أو A5:H7"""
+    sheet_name, _, cells = a1_range.rpartition('!')
+    if not sheet_name and cells.startswith("'"):
+        sheet_name, cells = cells, ""
+    sheet_name = sheet_name.strip("'").replace("''", "'") or None
+    first, _, last = cells.partition(':') if ':' in cells else (cells, '', cells)
+    first_row = re.sub(r'\D', '', first)
+    last_row = re.sub(r'\D', '', last)
+    return sheet_name, int(first_row) if first_row else 1, int(last_row) if last_row else None
+
+
+# الخادم البديل
+class FakeSheetsBackend:
+    """قيم أوراق جدول واحد في الذاكرة مع تأخير وحصة وسجل طلبات
+
+    sheets: {اسم الورقة: صفوف القيم النصية، أولها صف العناوين}.
+    """
+    def __init__(self, sheets, latency=0.0, jitter=0.0, quota_per_minute=None, seed=0):
+        # نسخة سطحية: الصفوف لا تُعدل في مكانها بل تُستبدل
+        self.sheets = {name: list(rows) for name, rows in sheets.items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_per_minute = quota_per_minute
+        self.modified_time = self._timestamp()
+        self.log = []
+        self._window = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._editor = None
+        self._stop = threading.Event()
+
+    def _timestamp(self):
+        return datetime.utcnow().isoformat(timespec='microseconds') + 'Z'
+
+    def request(self, method, detail, fn):
+        """تنفيذ طلب API مع الحصة والتأخير وتسجيله"""
+        start = time.perf_counter()
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] > QUOTA_WINDOW:
+                self._window.popleft()
+            throttled = (self.quota_per_minute is not None
+                         and len(self._window) >= self.quota_per_minute)
+            if not throttled:
+                self._window.append(now)
+            delay = max(0.0, self._random.gauss(self.latency, self.latency * self.jitter))
+        if throttled:
+            self._record(method, detail, 429, start)
+            raise api_error(429, "Quota exceeded for quota metric 'Read requests' (fake)")
+        time.sleep(delay)
+        with self._lock:
+            result = fn()
+        self._record(method, detail, 200, start)
+        return result
+
+    def _record(self, method, detail, status, start):
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'method': method,
+            'detail': detail,
+            'status': status,
+            'duration': round(time.perf_counter() - start, 6),
+            'thread': threading.current_thread().name,
+        }
+        with self._lock:
+            self.log.append(entry)
+
+    def read(self, a1_range):
+        """قيم النطاق (الصفوف الفارغة في النهاية لا تُرجع، كما في Sheets)"""
+        sheet_name, first, last = parse_range(a1_range)
+        rows = self.worksheet_rows(sheet_name)
+        return [list(row) for row in rows[first - 1:last]]
+
+    def worksheet_rows(self, sheet_name):
+        rows = self.sheets.get(sheet_name)
+        if rows is None:
+            raise gspread.exceptions.WorksheetNotFound(sheet_name)
+        return rows
+
+    def append(self, sheet_name, rows):
+        self.worksheet_rows(sheet_name).extend([str(v) for v in row] for row in rows)
+        self.modified_time = self._timestamp()
+
+    def update(self, sheet_name, data):
+        """تطبيق batch_update: قائمة {'range': 'A5:H7', 'values': [...]}"""
+        rows = self.worksheet_rows(sheet_name)
+        for item in data:
+            _, first, _ = parse_range(item['range'])
+            for offset, values in enumerate(item['values']):
+                index = first - 1 + offset
+                while len(rows) <= index:
+                    rows.append([])
+                rows[index] = [str(v) for v in values]
+        self.modified_time = self._timestamp()
+
+    def start_editor(self, interval=1.0, edit_ratio=0.2):
+        """محاكاة مستخدمين آخرين: كل interval ثانية تُضاف صف أو يُعدل صف سابق
+
+        تعديلات المحرر لا تُحسب من الحصة ولا تُسجل لأنها لا تصدر من التطبيق.
+        """
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                with self._lock:
+                    sheet_name = self._random.choice(list(self.sheets))
+                    rows = self.sheets[sheet_name]
+                    if len(rows) < 2:
+                        continue
+                    row = list(self._random.choice(rows[1:]))
+                    if self._random.random() < edit_ratio:
+                        index = self._random.randrange(1, len(rows))
+                        column = self._random.randrange(1, len(row))
+                        edited = list(rows[index])
+                        edited[column] = row[column]
+                        rows[index] = edited
+                    else:
+                        row[0] = f"E{len(rows)}"
+                        rows.append(row)
+                    self.modified_time = self._timestamp()
+
+        self._editor = threading.Thread(target=run, daemon=True, name="fake-editor")
+        self._editor.start()
+
+    def stop_editor(self):
+        self._stop.set()
+        if self._editor is not None:
+            self._editor.join()
+            self._editor = None
+
+    def stats(self):
+        """عدد الطلبات حسب (الطريقة، الرمز)"""
+        with self._lock:
+            return Counter((entry['method'], entry['status']) for entry in self.log)
+
+    def save_log(self, path):
+        """كتابة سجل الطلبات بصيغة JSON Lines"""
+        with self._lock:
+            entries = list(self.log)
+        with open(path, 'w', encoding='utf-8') as fh:
+            for entry in entries:
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# واجهة gspread البديلة (الطرق التي يستخدمها GoogleSheetsManager فقط)
+class FakeWorksheet:
+    def __init__(self, backend, title):
+        self.backend = backend
+        self.title = title
+
+    def append_row(self, values, **kwargs):
+        return self.backend.request('values.append', self.title,
+                                    lambda: self.backend.append(self.title, [values]))
+
+    def append_rows(self, values, **kwargs):
+        return self.backend.request('values.append', f"{self.title} ({len(values)})",
+                                    lambda: self.backend.append(self.title, values))
+
+    def batch_update(self, data, **kwargs):
+        return self.backend.request('values.batchUpdate', f"{self.title} ({len(data)})",
+                                    lambda: self.backend.update(self.title, data))
+
+class FakeWorkbook:
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.id = key
+        self.lastUpdateTime = backend.modified_time
+
+    def refresh_lastUpdateTime(self):
+        self.lastUpdateTime = self.backend.request('files.get', 'modifiedTime',
+                                                   lambda: self.backend.modified_time)
+
+    def worksheet(self, title):
+        def lookup():
+            self.backend.worksheet_rows(title)
+            return FakeWorksheet(self.backend, title)
+        return self.backend.request('spreadsheets.get', title, lookup)
+
+    def values_batch_get(self, ranges, params=None):
+        return self.backend.request('values.batchGet', ", ".join(ranges), lambda: {
+            'spreadsheetId': self.id,
+            'valueRanges': [{'range': r, 'values': self.backend.read(r)} for r in ranges],
+        })
+
+class FakeCredentials:
+    def __init__(self):
+        self.token = "fake"
+        self.expiry = datetime.utcnow() + timedelta(days=365)
+
+class FakeClient:
+    """بديل gspread.Client يفتح جداول FakeSheetsBackend"""
+    def __init__(self, backend):
+        self.backend = backend
+        self.auth = FakeCredentials()
+
+    def login(self):
+        self.auth = FakeCredentials()
+
+    def open_by_key(self, key):
+        return self.backend.request('spreadsheets.get', key, lambda: FakeWorkbook(self.backend, key))
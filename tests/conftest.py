@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+import streamlit.config
+import streamlit.logger
+
+# الاختبارات تعمل خارج خادم Streamlit؛ تكفي رسائل الأخطاء
+streamlit.config.get_option("logger.level")
+streamlit.logger.set_log_level("error")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import benchmark  # noqa: E402
+import fake_sheets  # noqa: E402
+
+
+@pytest.fixture
+def sheets(tmp_path):
+    """(جدول بديل ببيانات العينة، مدير متصل به) مع كائنات مشتركة جديدة لكل اختبار"""
+    benchmark.pin_singletons(str(tmp_path))
+    frames = dict(zip(app.SHEET_NAMES, app.load_sample_data()))
+    backend = fake_sheets.FakeSheetsBackend(
+        {name: benchmark.frame_to_values(df) for name, df in frames.items()})
+    return backend, benchmark.fake_manager(backend, "S")
@@ -0,0 +1,32 @@
+import app
+
+
+def test_group_row_ranges_merges_consecutive_rows():
+    records = {2: ["a", "1"], 3: ["b", "2", "x"], 5: ["c", "3"]}
+    ranges = app.group_row_ranges(sorted(records), records)
+    assert [item['range'] for item in ranges] == ["A2:C3", "A5:B5"]
+    # الصف الأقصر يُكمل بقيم فارغة حتى عرض النطاق
+    assert ranges[0]['values'] == [["a", "1", None], ["b", "2", "x"]]
+    assert ranges[1]['values'] == [["c", "3"]]
+
+
+def test_update_records_sends_one_batch_per_chunk(sheets):
+    backend, manager = sheets
+    rows = backend.sheets["العملاء"]
+    records = {row: [f"C10{row}"] + list(rows[row - 1][1:]) for row in (2, 3, 4, 6)}
+    backend.log.clear()
+    assert manager.update_records("العملاء", records, chunk_size=3)
+    batches = [entry['detail'] for entry in backend.log if entry['method'] == 'values.batchUpdate']
+    assert batches == ["العملاء (1)", "العملاء (1)"]
+    assert [row[0] for row in backend.sheets["العملاء"][1:]] == ["C102", "C103", "C104", "C004", "C106"]
+
+
+def test_append_records_in_chunks(sheets):
+    backend, manager = sheets
+    template = backend.sheets["الكول سنتر"][1]
+    new_rows = [[f"CC{n}"] + list(template[1:]) for n in range(5)]
+    backend.log.clear()
+    assert manager.append_records("الكول سنتر", new_rows, chunk_size=2)
+    appends = [entry['detail'] for entry in backend.log if entry['method'] == 'values.append']
+    assert appends == ["الكول سنتر (2)", "الكول سنتر (2)", "الكول سنتر (1)"]
+    assert [row[0] for row in backend.sheets["الكول سنتر"][-5:]] == [f"CC{n}" for n in range(5)]
@@ -0,0 +1,57 @@
+import io
+import json
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.fixture
+def frames():
+    customers, calls, _, _ = app.load_sample_data()
+    return {"العملاء": customers, "المكالمات": calls}
+
+
+def read_csv(data):
+    assert data.startswith(b'\xef\xbb\xbf')
+    return pd.read_csv(io.BytesIO(data), encoding='utf-8-sig')
+
+
+def test_csv_single_frame_in_chunks(frames, monkeypatch):
+    monkeypatch.setattr(app, "EXPORT_CHUNK_ROWS", 2)
+    fh = io.BytesIO()
+    app.write_export({"العملاء": frames["العملاء"]}, "CSV", fh)
+    result = read_csv(fh.getvalue())
+    assert list(result.columns) == list(frames["العملاء"].columns)
+    assert result['رقم العميل'].tolist() == frames["العملاء"]['رقم العميل'].tolist()
+
+
+def test_text_formats_bundle_several_frames_in_zip(frames):
+    fh = io.BytesIO()
+    app.write_export(frames, "JSON", fh)
+    with zipfile.ZipFile(io.BytesIO(fh.getvalue())) as bundle:
+        assert sorted(bundle.namelist()) == sorted(f"{name}.jsonl" for name in frames)
+        lines = bundle.read("العملاء.jsonl").decode('utf-8').splitlines()
+    assert len(lines) == len(frames["العملاء"])
+    assert json.loads(lines[0])['رقم العميل'] == "C001"
+
+
+def test_excel_writes_one_sheet_per_frame(frames):
+    fh = io.BytesIO()
+    app.write_export(frames, "Excel", fh)
+    sheets = pd.read_excel(io.BytesIO(fh.getvalue()), sheet_name=None)
+    assert list(sheets) == list(frames)
+    assert len(sheets["المكالمات"]) == len(frames["المكالمات"])
+
+
+def test_export_file_is_reused_for_same_content(frames, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "EXPORT_DIR", str(tmp_path))
+    path, filename, mime = app.export_data_file("جميع البيانات", "CSV", frames)
+    assert filename.endswith(".zip") and mime == "application/zip"
+    mtime = os.path.getmtime(path)
+    assert app.export_data_file("جميع البيانات", "CSV", frames)[0] == path
+    assert os.path.getmtime(path) == mtime
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
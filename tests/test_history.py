@@ -0,0 +1,66 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import app
+
+
+def calls(dates, durations):
+    n = len(dates)
+    return app.apply_schema(pd.DataFrame({
+        'رقم المكالمة': [f"CC{i}" for i in range(n)],
+        'تاريخ المكالمة': dates,
+        'الموظف المسؤول': ["سارة"] * n,
+        'الحالة': ["مكتملة"] * n,
+        'مدة المكالمة (دقيقة)': durations,
+    }), "الكول سنتر")
+
+
+def test_rollup_counts_recorded_durations_and_keeps_undated_rows():
+    df = calls(["2024-01-15", "2024-01-15", "2024-02-01", ""], ["4", "", "6", "3"])
+    daily = app.build_rollup(df, "الكول سنتر", 'D')
+    assert daily['العدد'].sum() == len(df)
+    day = daily[daily['الفترة'] == pd.Timestamp("2024-01-15")].iloc[0]
+    assert (day['العدد'], day['مجموع المدة'], day['عدد المدد']) == (2, 4.0, 1)
+    undated = daily[daily['الفترة'].isna()].iloc[0]
+    assert (undated['العدد'], undated['عدد المدد']) == (1, 1)
+    monthly = app.build_rollup(df, "الكول سنتر", 'M')
+    assert sorted(monthly['الفترة'].dropna()) == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-01")]
+
+
+def test_history_store_rewrites_only_changed_months(tmp_path):
+    store = app.HistoryStore(root=str(tmp_path))
+    now = datetime(2024, 3, 10)
+    df = calls(["2024-01-15", "2024-02-01", "2024-03-05", ""], ["4", "6", "2", "3"])
+    store.save("S", {"الكول سنتر": df}, now=now)
+    manifest = store._read_manifest("S")['sheets']["الكول سنتر"]
+    assert sorted(manifest['months']) == ["2024-01", "2024-02", "2024-03", "undated"]
+    directory = tmp_path / "S" / manifest['directory']
+    assert sorted(os.listdir(directory)) == sorted(
+        f"{key}{suffix}.arrow" for key in manifest['months'] for suffix in (".daily", ".monthly"))
+
+    january = manifest['months']["2024-01"]['saved_at']
+    march = manifest['months']["2024-03"]['saved_at']
+    store.save("S", {"الكول سنتر": df}, now=now)
+    months = store._read_manifest("S")['sheets']["الكول سنتر"]['months']
+    assert months["2024-01"]['saved_at'] == january
+    assert months["2024-03"]['saved_at'] > march
+
+    daily, monthly = store.rollups("S", "الكول سنتر", rows=len(df))
+    expected = app.build_rollup(df, "الكول سنتر", 'M')
+    assert monthly['العدد'].sum() == expected['العدد'].sum() == len(df)
+    assert np.isclose(daily['مجموع المدة'].sum(), 15.0)
+    assert store.rollups("S", "الكول سنتر", rows=len(df) + 1) is None
+
+
+def test_history_store_drops_removed_months(tmp_path):
+    store = app.HistoryStore(root=str(tmp_path))
+    now = datetime(2024, 3, 10)
+    store.save("S", {"الكول سنتر": calls(["2024-01-15", "2024-02-01"], ["4", "6"])}, now=now)
+    store.save("S", {"الكول سنتر": calls(["2024-02-01"], ["6"])}, now=now)
+    manifest = store._read_manifest("S")['sheets']["الكول سنتر"]
+    assert sorted(manifest['months']) == ["2024-02"]
+    directory = tmp_path / "S" / manifest['directory']
+    assert sorted(os.listdir(directory)) == ["2024-02.daily.arrow", "2024-02.monthly.arrow"]
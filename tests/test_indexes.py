@@ -0,0 +1,185 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.fixture
+def frames():
+    return dict(zip(app.SHEET_NAMES, app.load_sample_data()))
+
+
+def test_filter_index_intersects_filters():
+    df = pd.DataFrame({'الحالة': ['مكتمل', 'قيد المعالجة', 'مكتمل', 'مكتمل'],
+                       'الموظف المسؤول': ['أ', 'أ', 'ب', 'أ']})
+    index = app.FilterIndex(df, ['الحالة', 'الموظف المسؤول'])
+    assert index.select({'الحالة': app.ALL_OPTION}) is None
+    assert index.select({'الحالة': 'مكتمل', 'الموظف المسؤول': 'أ'}).tolist() == [0, 3]
+    assert index.select({'الحالة': 'مكتمل'}, within=np.array([2, 3])).tolist() == [2, 3]
+    assert index.select({'الحالة': 'ملغى'}).tolist() == []
+
+
+def test_changed_positions():
+    old = pd.DataFrame({'الحالة': pd.Categorical(['مجدول', 'مكتمل', 'مجدول']),
+                        'المدة': [1.0, np.nan, 3.0], 'السائق': ['أ', None, 'ب']})
+    new = old.copy()
+    new['الحالة'] = pd.Categorical(['مجدول', 'مكتمل', 'ملغى'])
+    new.loc[1, 'المدة'] = 2.0
+    assert app.changed_positions(old, old.copy()).tolist() == []
+    assert app.changed_positions(old, new).tolist() == [1, 2]
+
+
+def test_search_index_substring_and_prefix(frames):
+    customers = frames["العملاء"]
+    index = app.CustomerSearchIndex()
+    index.sync(customers)
+    assert index.search("احمد").tolist() == [0, 1]
+    assert index.search("خ").tolist() == [2]
+    assert index.search("C003").tolist() == [2]
+    assert index.search("غير موجود").tolist() == []
+
+
+def test_search_index_shared_with_shorter_frame(frames):
+    customers = frames["العملاء"]
+    index = app.CustomerSearchIndex()
+    index.sync(customers)
+    keys = index.keys
+    index.sync(customers.iloc[:1])
+    assert index.keys is keys
+    assert index.search("احمد", rows=1).tolist() == [0]
+    changed = customers.copy()
+    changed.loc[4, 'رقم العميل'] = "C999"
+    index.sync(changed)
+    assert index.ids[-1] == "C999"
+
+
+def test_search_index_reindexes_rows_edited_in_place(frames):
+    customers = frames["العملاء"]
+    index = app.CustomerSearchIndex()
+    index.sync(customers, "v1")
+    edited = customers.copy()
+    edited.loc[2, 'اسم العميل'] = "يوسف منير"
+    index.sync(edited, "v2")
+    assert index.search("يوسف").tolist() == [2]
+    assert index.search("خالد").tolist() == []
+    assert index.search("احمد").tolist() == [0, 1]
+    rebuilt = app.CustomerSearchIndex()
+    rebuilt.sync(edited)
+    assert index._grams == rebuilt._grams
+    assert index._prefixes == rebuilt._prefixes
+
+
+def test_join_index_counts_and_lookup(frames):
+    index = app.CustomerJoinIndex()
+    index.sync(frames)
+    merged = index.merged_frame(frames)
+    calls = frames["الكول سنتر"]
+    expected = calls['رقم العميل'].astype(str).value_counts()
+    actual = merged.set_index(merged['رقم العميل'].astype(str))['عدد المكالمات']
+    assert all(actual[key] == count for key, count in expected.items())
+    found = index.lookup("C001")
+    assert (calls.iloc[found["الكول سنتر"]]['رقم العميل'].astype(str) == "C001").all()
+
+
+def test_join_index_moves_rows_edited_in_place(frames):
+    index = app.CustomerJoinIndex()
+    index.sync(frames, "v1")
+    edited = dict(frames)
+    edited["الكول سنتر"] = frames["الكول سنتر"].copy()
+    edited["الكول سنتر"].loc[0, 'رقم العميل'] = "C002"
+    index.sync(edited, "v2")
+    assert index.lookup("C002")["الكول سنتر"].tolist() == [0, 1]
+    assert index.lookup("C001")["الكول سنتر"].tolist() == []
+    reference = app.CustomerJoinIndex()
+    reference.sync(edited)
+    pd.testing.assert_frame_equal(index.merged_frame(edited), reference.merged_frame(edited))
+
+
+def test_join_index_clips_to_shorter_frames(frames):
+    index = app.CustomerJoinIndex()
+    index.sync(frames)
+    short = {name: df.iloc[:2] for name, df in frames.items()}
+    index.sync(short)
+    reference = app.CustomerJoinIndex()
+    reference.sync(short)
+    pd.testing.assert_frame_equal(index.merged_frame(short), reference.merged_frame(short))
+    for name, positions in index.lookup("C003", short).items():
+        assert (positions < len(short[name])).all()
+
+
+def workload_table(index, sheet_name, seconds, now):
+    frame, _ = index.window(sheet_name, seconds, now)
+    keys = app.WORKLOAD_SHEETS[sheet_name]['keys']
+    return frame.sort_values(keys, ignore_index=True)
+
+
+def test_workload_index_matches_rebuild_after_edits(frames):
+    now = app.local_seconds()
+    index = app.WorkloadIndex()
+    index.sync(frames, now, data_version="v1")
+    edited = {name: df.copy() for name, df in frames.items()}
+    calls = edited["الكول سنتر"]
+    calls['مدة المكالمة (دقيقة)'] = calls['مدة المكالمة (دقيقة)'].astype(float)
+    calls.loc[0, 'مدة المكالمة (دقيقة)'] = np.nan
+    calls.loc[1, 'الموظف المسؤول'] = "سارة أحمد"
+    index.sync({name: df.iloc[:2] for name, df in edited.items()}, now, data_version="old")
+    index.sync(edited, now, data_version="v2")
+    reference = app.WorkloadIndex()
+    reference.sync(edited, now)
+    for sheet_name in app.WORKLOAD_SHEETS:
+        for seconds in app.WORKLOAD_WINDOWS.values():
+            pd.testing.assert_frame_equal(workload_table(index, sheet_name, seconds, now),
+                                          workload_table(reference, sheet_name, seconds, now))
+
+
+def test_workload_average_ignores_missing_durations():
+    calls = pd.DataFrame({
+        'رقم المكالمة': ['1', '2', '3'],
+        'الموظف المسؤول': ['أ', 'أ', 'أ'],
+        'تاريخ المكالمة': pd.to_datetime(['2024-07-10'] * 3),
+        'وقت المكالمة': ['10:00', '11:00', '12:00'],
+        'مدة المكالمة (دقيقة)': [10.0, np.nan, 20.0],
+    })
+    index = app.WorkloadIndex()
+    index.sync({"الكول سنتر": calls})
+    frame, _ = index.window("الكول سنتر", None)
+    assert frame.loc[0, 'العدد'] == 3
+    assert frame.loc[0, 'متوسط المدة'] == 15.0
+
+
+def test_schedule_index_edits_and_pending_bookings(frames):
+    pickups = frames["البيك أب"]
+    day, slot, driver = pickups.loc[0, ['تاريخ البيك أب', 'الوقت المطلوب', 'السائق']]
+    index = app.ScheduleIndex(pending_ttl=60)
+    index.sync(pickups, "v1")
+    assert index.load(day, slot, driver) == 1
+
+    cancelled = pickups.copy()
+    cancelled['الحالة'] = cancelled['الحالة'].cat.add_categories(['ملغى'])
+    cancelled.loc[0, 'الحالة'] = 'ملغى'
+    index.sync(cancelled, "v2")
+    assert index.load(day, slot, driver) == 0
+
+    index.book(f" {pickups.iloc[1, 0]} ", day, slot, driver)
+    assert index.load(day, slot, driver) == 0
+    index.book(" P100 ", day, slot, driver)
+    assert index.load(day, slot, driver) == 1
+    arrived = pd.concat([cancelled, cancelled.iloc[[1]].assign(**{
+        cancelled.columns[0]: "P100", 'تاريخ البيك أب': day, 'الوقت المطلوب': slot, 'السائق': driver})],
+        ignore_index=True)
+    index.sync(arrived, "v3")
+    assert index.load(day, slot, driver) == 1
+    assert not index._pending
+
+
+def test_schedule_index_expires_unsettled_bookings(frames):
+    pickups = frames["البيك أب"]
+    day, slot = pickups.loc[0, ['تاريخ البيك أب', 'الوقت المطلوب']]
+    index = app.ScheduleIndex(pending_ttl=0.01)
+    index.sync(pickups, "v1")
+    index.book("P100", day, slot, "سائق جديد")
+    time.sleep(0.05)
+    assert index.load(day, slot, "سائق جديد") == 0
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+import app
+import fake_sheets
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(app, 'SCHEDULER_RETRY_BASE', 0.001)
+    monkeypatch.setattr(app, 'SCHEDULER_RETRY_MAX', 0.002)
+
+
+def test_higher_priority_takes_next_token():
+    scheduler = app.RequestScheduler(quota_per_minute=600)
+    scheduler.tokens, scheduler._updated = 0.0, time.monotonic()
+    order = []
+
+    def request(priority):
+        scheduler.call(order.append, priority, priority=priority)
+
+    threads = []
+    for priority in (app.PRIORITY_BULK, app.PRIORITY_BACKGROUND, app.PRIORITY_INTERACTIVE):
+        threads.append(threading.Thread(target=request, args=(priority,)))
+        threads[-1].start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    assert order == [app.PRIORITY_INTERACTIVE, app.PRIORITY_BACKGROUND, app.PRIORITY_BULK]
+
+
+def failing(errors, result="ok"):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return fn, calls
+
+
+def test_retries_retryable_errors_with_backoff():
+    fn, calls = failing([fake_sheets.api_error(503, "unavailable"), fake_sheets.api_error(429, "quota")])
+    assert app.RequestScheduler(quota_per_minute=60_000).call(fn) == "ok"
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    fn, calls = failing([fake_sheets.api_error(503, "unavailable")] * (app.SCHEDULER_MAX_RETRIES + 1))
+    with pytest.raises(Exception):
+        app.RequestScheduler(quota_per_minute=60_000).call(fn)
+    assert len(calls) == app.SCHEDULER_MAX_RETRIES + 1
+
+
+def test_non_idempotent_requests_retry_only_on_quota():
+    fn, calls = failing([fake_sheets.api_error(503, "unavailable")])
+    with pytest.raises(Exception):
+        app.RequestScheduler(quota_per_minute=60_000).call(fn, idempotent=False)
+    assert len(calls) == 1
+    fn, calls = failing([fake_sheets.api_error(429, "quota")])
+    assert app.RequestScheduler(quota_per_minute=60_000).call(fn, idempotent=False) == "ok"
+
+
+def test_client_errors_are_not_retried():
+    fn, calls = failing([fake_sheets.api_error(400, "bad request")])
+    with pytest.raises(Exception):
+        app.RequestScheduler(quota_per_minute=60_000).call(fn)
+    assert len(calls) == 1
+
+
+def test_concurrent_identical_requests_share_one_call():
+    scheduler = app.RequestScheduler()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return len(calls)
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(scheduler.call(slow, key=('k',))))
+    owner.start()
+    started.wait(1)
+    joiner = threading.Thread(target=lambda: results.append(scheduler.call(slow, key=('k',))))
+    joiner.start()
+    time.sleep(0.02)
+    release.set()
+    owner.join()
+    joiner.join()
+    assert results == [1, 1] and len(calls) == 1
+
+
+def test_request_keys_separate_credentials(sheets):
+    backend, _ = sheets
+    keys = []
+    scheduler = app.get_request_scheduler()
+    call = scheduler.call
+    scheduler.call = lambda fn, *args, key=None, **kwargs: keys.append(key) or call(fn, *args, key=key, **kwargs)
+    managers = [app.GoogleSheetsManager({'client_email': email, 'private_key_id': "1", 'private_key': email}, "S",
+                                        client=fake_sheets.FakeClient(backend))
+                for email in ("a@example.com", "b@example.com")]
+    for manager in managers:
+        manager.get_worksheet("الكول سنتر")
+        assert manager.get_modified_time() == backend.modified_time
+    worksheet_keys = [key for key in keys if key and 'worksheet' in key]
+    assert len(worksheet_keys) == 2 and worksheet_keys[0] != worksheet_keys[1]
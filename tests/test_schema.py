@@ -0,0 +1,47 @@
+import pandas as pd
+
+import app
+
+
+def calls_values():
+    header = ["رقم المكالمة", "رقم العميل", "نوع المكالمة", "تاريخ المكالمة",
+              "مدة المكالمة (دقيقة)", "الحالة", "ملاحظات"]
+    return [header,
+            ["CC001", "0101", "استفسار", "2024-01-15", "5", "مكتملة", "7"],
+            ["CC002", "0102", "شكوى", "15/01/2024 10:30", "", "جديدة", "نص"],
+            ["CC003", "0103", "استفسار", "", "12", "مكتملة", ""]]
+
+
+def test_values_to_dataframe_applies_sheet_schema():
+    df = app.values_to_dataframe(calls_values(), sheet_name="الكول سنتر")
+    # النصوص تبقى كما هي (الأصفار في البداية لا تضيع)
+    assert df['رقم العميل'].tolist() == ["0101", "0102", "0103"]
+    assert isinstance(df['نوع المكالمة'].dtype, pd.CategoricalDtype)
+    assert str(df['مدة المكالمة (دقيقة)'].dtype) == 'Int16'
+    assert df['مدة المكالمة (دقيقة)'].isna().tolist() == [False, True, False]
+    dates = df['تاريخ المكالمة']
+    assert pd.api.types.is_datetime64_any_dtype(dates)
+    assert dates.iloc[0] == pd.Timestamp("2024-01-15")
+    assert dates.iloc[1].date() == pd.Timestamp("2024-01-15").date()
+    assert pd.isna(dates.iloc[2])
+    # الأعمدة خارج المخطط تُحوّل إلى أرقام حيثما أمكن كما في get_all_records
+    assert df['ملاحظات'].tolist() == [7, "نص", ""]
+
+
+def test_apply_schema_is_idempotent():
+    df = app.values_to_dataframe(calls_values(), sheet_name="الكول سنتر")
+    again = app.apply_schema(df, "الكول سنتر")
+    pd.testing.assert_frame_equal(again, df)
+    assert (again.dtypes == df.dtypes).all()
+
+
+def test_int16_falls_back_to_numbers_out_of_range():
+    df = pd.DataFrame({'مدة المكالمة (دقيقة)': ["5", "40000", "2.5"]})
+    result = app.apply_schema(df, "الكول سنتر")['مدة المكالمة (دقيقة)']
+    assert result.tolist() == [5, 40000, 2.5]
+    assert result.dtype == float
+
+
+def test_sheet_without_schema_is_unchanged():
+    df = pd.DataFrame({'a': ["1"]})
+    assert app.apply_schema(df, "غير معروفة") is df
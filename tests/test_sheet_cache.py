@@ -0,0 +1,54 @@
+import pandas as pd
+
+import app
+
+
+def frame(rows):
+    return pd.DataFrame({'رقم': range(rows)})
+
+
+def test_get_respects_ttl_and_max_age():
+    cache = app.SheetCache(ttl=60)
+    cache.put("S", "الكول سنتر", frame(3))
+    assert len(cache.get("S", "الكول سنتر")) == 3
+    assert cache.get("S", "الكول سنتر", max_age=-1) is None
+    assert cache.get("S", "الشكاوى") is None
+
+
+def test_expired_entry_is_kept_for_incremental_sync():
+    cache = app.SheetCache()
+    cache.put("S", "الكول سنتر", frame(3), modified_time="t1")
+    cache.expire("S", "الكول سنتر")
+    assert cache.get("S", "الكول سنتر") is None
+    df, synced_at = cache.peek("S", "الكول سنتر")
+    assert len(df) == 3 and synced_at is not None
+
+
+def test_revalidate_only_when_modified_time_matches():
+    cache = app.SheetCache(ttl=0)
+    cache.put("S", "الكول سنتر", frame(3), modified_time="t1")
+    assert cache.revalidate("S", "الكول سنتر", "t2") is None
+    assert len(cache.revalidate("S", "الكول سنتر", "t1")) == 3
+
+
+def test_lru_eviction_by_size():
+    size = int(frame(100).memory_usage(deep=True).sum())
+    cache = app.SheetCache(max_bytes=size * 2)
+    cache.put("S", "a", frame(100))
+    cache.put("S", "b", frame(100))
+    cache.get("S", "a")
+    cache.put("S", "c", frame(100))
+    assert cache.peek("S", "b")[0] is None
+    assert cache.peek("S", "a")[0] is not None
+    assert cache.total_bytes <= cache.max_bytes
+
+
+def test_sheet_versions_ignore_other_sheets():
+    cache = app.SheetCache()
+    cache.put("S", "العملاء", frame(1))
+    before = cache.sheet_versions("S", ["العملاء"])
+    cache.put("S", "الكول سنتر", frame(1))
+    cache.invalidate("S", "الشكاوى")
+    assert cache.sheet_versions("S", ["العملاء"]) == before
+    cache.invalidate("S")
+    assert cache.sheet_versions("S", ["العملاء"]) != before
@@ -0,0 +1,31 @@
+import app
+
+
+def test_in_place_edit_is_seen_when_another_sheet_gains_rows(sheets):
+    backend, manager = sheets
+    manager.get_worksheets_data(app.SHEET_NAMES)
+    # شكوى تُحل في مكانها بينما تُسجل مكالمة جديدة
+    header = backend.sheets["الشكاوى"][0]
+    complaint = list(backend.sheets["الشكاوى"][1])
+    complaint[header.index("الحالة")] = "تم الحل"
+    backend.update("الشكاوى", [{'range': "A2", 'values': [complaint]}])
+    call = list(backend.sheets["الكول سنتر"][1])
+    call[0] = "CC100"
+    backend.append("الكول سنتر", [call])
+
+    frames = manager.get_worksheets_data(app.SHEET_NAMES, max_age=-1)
+    assert frames["الكول سنتر"]["رقم المكالمة"].iloc[-1] == "CC100"
+    assert frames["الشكاوى"]["الحالة"].iloc[0] == "تم الحل"
+
+
+def test_append_only_change_syncs_tail(sheets):
+    backend, manager = sheets
+    manager.get_worksheets_data(app.SHEET_NAMES)
+    call = list(backend.sheets["الكول سنتر"][1])
+    call[0] = "CC100"
+    backend.append("الكول سنتر", [call])
+    backend.log.clear()
+
+    frames = manager.get_worksheets_data(["الكول سنتر"], max_age=-1)
+    assert len(frames["الكول سنتر"]) == 6
+    assert not any(entry['detail'] == ["'الكول سنتر'"] for entry in backend.log)
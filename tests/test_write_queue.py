@@ -0,0 +1,106 @@
+import json
+
+import gspread
+import pytest
+
+import app
+import fake_sheets
+
+
+class Manager:
+    fingerprint = "fp"
+    spreadsheet_id = "S"
+
+    def __init__(self, column=(), error=None):
+        self.column = list(column)
+        self.error = error
+        self.written = []
+
+    def column_values(self, worksheet_name, first_row):
+        return self.column[first_row - 2:]
+
+    def write_rows(self, worksheet_name, rows):
+        if self.error is not None:
+            raise self.error
+        if any(row[0] == "BAD" for row in rows):
+            raise fake_sheets.api_error(400, "Invalid values[0]")
+        self.written.extend(rows)
+
+
+def journal_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_enqueue_survives_restart(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    queue = app.WriteBehindQueue(journal_path=path)
+    queue.enqueue(Manager(), "الكول سنتر", ["CALL1", "C001"])
+    restarted = app.WriteBehindQueue(journal_path=path)
+    assert restarted.pending_count() == 1
+    assert restarted._pending[0]['record'] == ["CALL1", "C001"]
+    assert restarted._pending[0]['credentials'] == "fp"
+
+
+def test_torn_journal_line_is_skipped_and_rewritten(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    entry = {'id': "a", 'credentials': "fp", 'spreadsheet_id': "S",
+             'worksheet': "الكول سنتر", 'record': ["CALL1"]}
+    path.write_text(json.dumps(entry) + "\n" + '{"id": "b", "rec', encoding='utf-8')
+    queue = app.WriteBehindQueue(journal_path=str(path))
+    assert [entry['id'] for entry in queue._pending] == ["a"]
+    assert [entry['id'] for entry in journal_lines(path)] == ["a"]
+
+
+def test_drop_written_after_ambiguous_failure(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    queue = app.WriteBehindQueue(journal_path=path)
+    manager = Manager()
+    for record_id in ("CALL1", "CALL2", ""):
+        queue.enqueue(manager, "الكول سنتر", [record_id])
+    entries = list(queue._pending)
+    for entry in entries:
+        entry['attempted_from'] = 2
+    # الطلب السابق أضاف CALL1 فقط قبل أن تنقطع الاستجابة
+    manager.column = ["CALL1"]
+    remaining = queue._drop_written(manager, "الكول سنتر", entries)
+    assert [entry['record'][0] for entry in remaining] == ["CALL2", ""]
+    assert [entry['record'][0] for entry in journal_lines(path)] == ["CALL2", ""]
+
+
+def test_rejected_record_is_isolated_and_dead_lettered(tmp_path):
+    dead_path = str(tmp_path / "dead.jsonl")
+    queue = app.WriteBehindQueue(journal_path=str(tmp_path / "journal.jsonl"), dead_letter_path=dead_path)
+    manager = Manager()
+    for record_id in ("CALL1", "BAD", "CALL2"):
+        queue.enqueue(manager, "الكول سنتر", [record_id])
+    queue._send(manager, "الكول سنتر", list(queue._pending))
+    assert manager.written == [["CALL1"], ["CALL2"]]
+    assert queue.pending_count() == 0
+    dead = journal_lines(dead_path)
+    assert [entry['record'] for entry in dead] == [["BAD"]]
+    assert "400" in dead[0]['error']
+    restarted = app.WriteBehindQueue(journal_path=str(tmp_path / "journal.jsonl"), dead_letter_path=dead_path)
+    assert [entry['record'] for entry in restarted.dead_letters()] == [["BAD"]]
+
+
+def test_deleted_worksheet_dead_letters_whole_chunk(tmp_path):
+    dead_path = str(tmp_path / "dead.jsonl")
+    queue = app.WriteBehindQueue(journal_path=str(tmp_path / "journal.jsonl"), dead_letter_path=dead_path)
+    manager = Manager(error=gspread.exceptions.WorksheetNotFound("الكول سنتر"))
+    for record_id in ("CALL1", "CALL2"):
+        queue.enqueue(manager, "الكول سنتر", [record_id])
+    queue._send(manager, "الكول سنتر", list(queue._pending))
+    assert queue.pending_count() == 0
+    assert len(queue.dead_letters()) == 2
+
+
+def test_retryable_error_keeps_records_pending(tmp_path):
+    queue = app.WriteBehindQueue(journal_path=str(tmp_path / "journal.jsonl"),
+                                 dead_letter_path=str(tmp_path / "dead.jsonl"))
+    manager = Manager(error=fake_sheets.api_error(429, "Quota exceeded"))
+    queue.enqueue(manager, "الكول سنتر", ["CALL1"])
+    with pytest.raises(gspread.exceptions.APIError):
+        queue._send(manager, "الكول سنتر", list(queue._pending))
+    assert queue.pending_count() == 1
+    assert queue.dead_letters() == []